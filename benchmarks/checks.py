@@ -0,0 +1,381 @@
+""" Offline regression checks for the labelboxbigquery Client, run against the in-process stand-ins in fakes.py
+
+Each check raises AssertionError when the behavior it covers regresses. Examples:
+    python benchmarks/checks.py                                 # every check
+    python benchmarks/checks.py --checks export_merge_columns
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import traceback
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import labelbox
+import requests
+from google.cloud import bigquery
+from google.auth.credentials import AnonymousCredentials
+from labelbox.schema.data_row_metadata import DataRowMetadataKind
+from labelboxbigquery.batching import AdaptiveBatcher
+from labelboxbigquery.client import Client
+from labelboxbigquery.connector import add_column_function
+from labelboxbigquery.metrics import report_run
+from labelboxbigquery.writer import LoadJobWriter
+from labelboxbigquery.async_client import AsyncClient, _limit_bq_client, _limit_lb_client
+from benchmarks.run import CASES
+from benchmarks.fakes import FakeBigQueryClient, FakeDataset, FakeLabelboxClient, FakeTask, make_client, schema_id
+
+def check_export_merge_columns():
+    """ A column first seen in a chunk with no new or changed labels is left out of the MERGE instead of failing it """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    client = make_client(bq_client, lb_client, state_path=":memory:")
+    updated_at = datetime(2024, 1, 1, tzinfo=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+0000")
+    newer_updated_at = (datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S.%f+0000")
+    columns = ["label_id", "data_row_id", "updated_at"]
+    bq_client.add_table(f"{bq_client.project}.bench.labels", [bigquery.SchemaField(column, "STRING") for column in columns], [(schema_id("label_1"), schema_id("data_row_1"), updated_at)])
+    labels = [
+        # New, so it is staged
+        {"label_id" : schema_id("label_0"), "data_row_id" : schema_id("data_row_0"), "updated_at" : newer_updated_at},
+        # Unchanged, so nothing is staged for the chunk that brings the extra column
+        {"label_id" : schema_id("label_1"), "data_row_id" : schema_id("data_row_1"), "updated_at" : updated_at, "extra" : "value"},
+    ]
+    with mock.patch("labelbase.downloader.export_and_flatten_labels", lambda **kwargs: [dict(label) for label in labels]):
+        errors = client.export_to_BigQuery(None, "bench", "labels", chunk_size=1, verbose=False)
+    assert not errors, errors
+    table = bq_client.tables[f"{bq_client.project}.bench.labels"]
+    label_ids = sorted(table.value(row, table.column_index()["label_id"]) for row in table.rows)
+    assert label_ids == sorted([schema_id("label_0"), schema_id("label_1")]), label_ids
+    assert not [table_id for table_id in bq_client.tables if table_id.startswith(f"{bq_client.project}.bench.labels_lb_staging_")], "staging table was not deleted"
+
+def check_metadata_compare_by_kind():
+    """ Only number fields compare as numbers - string values that look like the same number are still pushed """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    client = make_client(bq_client, lb_client, state_path=":memory:")
+    metadata_index = {"zip_code" : "string", "score" : "number"}
+    for name, kind in metadata_index.items():
+        lb_client.execute("upsertCustomMetadataSchema", {"data" : {"name" : name, "kind" : DataRowMetadataKind[kind].value}})
+    table_rows = [("same-number", "02134", 5), ("leading-zero", "2134", 5), ("exponent", "1e3", 1000), ("new-score", "02134", 6)]
+    bq_client.add_table(f"{bq_client.project}.bench.images", [bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("zip_code", "STRING"), bigquery.SchemaField("score", "FLOAT")], table_rows)
+    dataset = lb_client.create_dataset()
+    lb_client.add_data_rows(dataset.uid, [{
+        "row_data" : f"https://storage.googleapis.com/bench/{global_key}.jpg", "global_key" : global_key,
+        "metadata_fields" : [{"schema_id" : schema_id("zip_code"), "value" : zip_code}, {"schema_id" : schema_id("score"), "value" : score}]
+    } for global_key, zip_code, score in [("same-number", "02134", 5.0), ("leading-zero", "02134", 5.0), ("exponent", "1000", 1000.0), ("new-score", "02134", 5.0)]])
+    with open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+        summary = client.upsert_labelbox_metadata(f"{bq_client.project}.bench.images", "global_key", metadata_index=metadata_index)
+    assert (summary["unchanged"], summary["updated"]) == (1, 3), summary
+    metadata = lb_client.data_rows_by_key["leading-zero"].metadata
+    assert metadata[schema_id("zip_code")] == "2134", metadata
+
+def check_async_close_does_not_block():
+    """ Leaving an AsyncClient context waits for running calls without blocking the event loop """
+    async def run():
+        ticks = []
+        async def tick():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+        ticker = asyncio.ensure_future(tick())
+        async with AsyncClient(lb_api_key="bench", google_project_name="bench-project", state_path=":memory:") as async_client:
+            async_client._executor.submit(time.sleep, 0.3)
+            await asyncio.sleep(0)
+            closing_at = time.monotonic()
+        ticker.cancel()
+        return len([tick_at for tick_at in ticks if tick_at > closing_at])
+    ticks_while_closing = asyncio.run(run())
+    assert ticks_while_closing >= 10, f"event loop ran {ticks_while_closing} times while closing"
+
+def check_limited_requests():
+    """ AsyncClient holds a semaphore slot for each BigQuery and Labelbox request, such as every page a RowIterator fetches, and for none of the time in between """
+    semaphore = threading.BoundedSemaphore(1)
+    def slot_free():
+        # Taking the only slot succeeds when no request holds it, it is handed back so the check fails instead of hanging
+        if semaphore.acquire(blocking=False):
+            semaphore.release()
+            return True
+        return False
+    requests_holding_slot = []
+    def call_api(retry, **kwargs):
+        requests_holding_slot.append(not slot_free())
+        page = int((kwargs.get("query_params") or {}).get("pageToken") or 0)
+        return {"rows" : [{"f" : [{"v" : str(page)}]}], "pageToken" : str(page + 1) if page < 2 else None, "totalRows" : "3"}
+    bq_client = bigquery.Client(project="bench-project", credentials=AnonymousCredentials())
+    bq_client._call_api = call_api
+    _limit_bq_client(bq_client, semaphore)
+    rows = bq_client.list_rows(bigquery.Table("bench-project.bench.images", schema=[bigquery.SchemaField("page", "STRING")]))
+    slot_free_between_pages = [slot_free() for row in rows]
+    assert requests_holding_slot == [True] * 3, requests_holding_slot
+    assert slot_free_between_pages == [True] * 3, slot_free_between_pages
+    def execute(*args, **kwargs):
+        requests_holding_slot.append(not slot_free())
+        return {"uploadFile" : {"url" : "https://storage.googleapis.com/bench/upload"}}
+    lb_client = labelbox.Client(api_key="bench")
+    lb_client.execute = execute
+    _limit_lb_client(lb_client, semaphore)
+    lb_client.upload_data(b"bench")
+    assert requests_holding_slot == [True] * 4, requests_holding_slot
+
+def check_absent_global_keys_recheck():
+    """ A global key found absent is looked up again on the next call, since another upload may have taken it since """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    client = make_client(bq_client, lb_client, state_path=":memory:")
+    check_global_keys = client._Client__check_global_keys
+    assert check_global_keys(lb_client, ["taken-later"])["not_found"] == {"taken-later"}
+    dataset = lb_client.create_dataset()
+    lb_client.add_data_rows(dataset.uid, [{"row_data" : "https://storage.googleapis.com/bench/taken-later.jpg", "global_key" : "taken-later"}])
+    assert check_global_keys(lb_client, ["taken-later"])["found"] == {"taken-later"}
+    lookups = lb_client.service.calls["labelbox.dataRowsForGlobalKeys"]
+    assert check_global_keys(lb_client, ["taken-later"])["found"] == {"taken-later"}
+    assert lb_client.service.calls["labelbox.dataRowsForGlobalKeys"] == lookups, "a key in use was looked up again"
+
+def check_upload_polling_retry():
+    """ A failed poll of a data row creation task polls the same task again instead of submitting the batch twice """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    client = make_client(bq_client, lb_client, state_path=":memory:")
+    table_id = f"{bq_client.project}.bench.images"
+    bq_client.add_table(table_id, [bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("row_data", "STRING")], [(f"poll-{i}", f"https://storage.googleapis.com/bench/poll-{i}.jpg") for i in range(10)])
+    dataset = lb_client.create_dataset()
+    polls = []
+    def wait_till_done(task):
+        polls.append(task)
+        if len(polls) == 1:
+            raise ConnectionError("connection reset while polling the task")
+    with mock.patch.object(FakeTask, "wait_till_done", wait_till_done), mock.patch("labelboxbigquery.batching.BACKOFF_BASE_SECONDS", 0.01), open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+        client.create_data_rows_from_table(bq_table_id=table_id, lb_dataset=dataset, row_data_col="row_data", global_key_col="global_key")
+    assert lb_client.service.calls["labelbox.create_data_rows"] == 1, dict(lb_client.service.calls)
+    assert len(polls) == 2 and polls[0] is polls[1], polls
+    assert len(lb_client.data_rows_by_id) == 10, len(lb_client.data_rows_by_id)
+
+def check_sharded_partial_failure():
+    """ Sharded uploads validate their arguments before starting any shard, and a failed shard does not discard what the other shards created """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    table_id = f"{bq_client.project}.bench.images"
+    bq_client.add_table(table_id, [bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("row_data", "STRING")], [(f"shard-{i}", f"https://storage.googleapis.com/bench/shard-{i}.jpg") for i in range(300)])
+    dataset = lb_client.create_dataset()
+    create_data_rows_from_table = Client.create_data_rows_from_table
+    def fail_shard_one(self, **kwargs):
+        return None if kwargs["shard_index"] == 1 else create_data_rows_from_table(self, **kwargs)
+    # Worker processes are forked, so they inherit the fake services and the patched method
+    with mock.patch.object(Client, "_create_bq_client", lambda self: bq_client), mock.patch.object(Client, "_create_lb_client", lambda self: lb_client), \
+            mock.patch.object(Client, "create_data_rows_from_table", fail_shard_one), open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+        client = make_client(bq_client, lb_client, state_path=":memory:")
+        assert client.create_data_rows_from_table_sharded(3, dataset, bq_table_id=table_id, row_data_col="missing", global_key_col="global_key") is None
+        assert "rows_uploaded" not in client.last_run_report.counters, "a shard started despite invalid arguments"
+        errors = client.create_data_rows_from_table_sharded(3, dataset, bq_table_id=table_id, row_data_col="row_data", global_key_col="global_key", skip_duplicates=True)
+    assert [error["shard_index"] for error in errors] == [1], errors
+    rows_uploaded = client.last_run_report.counters.get("rows_uploaded", 0)
+    assert 0 < rows_uploaded < 300, rows_uploaded
+
+def check_api_call_counting():
+    """ Run reports count every Labelbox GraphQL request, BigQuery request and BigQuery load job at the SDK transport """
+    class LoadResponse:
+        def json(self):
+            return {"jobReference" : {"projectId" : "bench-project", "jobId" : "bench-load"}, "configuration" : {"load" : {}}, "status" : {"state" : "DONE"}}
+    with mock.patch("labelboxbigquery.client._get_bq_session", lambda google_key: (AnonymousCredentials(), requests.Session())):
+        client = Client(lb_api_key="bench", google_project_name="bench-project", state_path=":memory:")
+        bq_client, lb_client = client.bq_client, client.lb_client
+    bq_client._connection.api_request = lambda **kwargs: {"tableReference" : {"projectId" : "bench-project", "datasetId" : "bench", "tableId" : "images"}, "schema" : {"fields" : []}}
+    bq_client._do_multipart_upload = lambda *args, **kwargs: LoadResponse()
+    lb_client._request_client.execute = lambda *args, **kwargs: {"uploadFile" : {"url" : "https://storage.googleapis.com/bench/upload"}}
+    with report_run("check") as report:
+        bq_client.get_table("bench-project.bench.images")
+        bq_client.load_table_from_json([{"page" : "0"}], "bench-project.bench.images", job_config=bigquery.LoadJobConfig(schema=[bigquery.SchemaField("page", "STRING")]))
+        lb_client.upload_data(b"bench")
+        lb_client.upload_data(b"bench")
+    assert report.counters == {"bq_api_calls" : 2, "bq_load_jobs" : 1, "lb_api_calls" : 2}, report.counters
+
+def check_metadata_schema_names_trimmed():
+    """ Enum options are trimmed before schemas are created, and options Labelbox would reject are dropped """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    client = make_client(bq_client, lb_client, state_path=":memory:")
+    table_rows = [(f"key-{index}", color) for index, color in enumerate([" red", "red ", "blue", "", "   ", "x" * 101])]
+    bq_client.add_table(f"{bq_client.project}.bench.images", [bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("color", "STRING")], table_rows)
+    payloads, execute = [], lb_client.execute
+    def record(query, params=None, **kwargs):
+        if "upsertCustomMetadataSchema" in query:
+            payloads.append(params["data"])
+        return execute(query, params, **kwargs)
+    lb_client.execute = record
+    with open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+        assert client._sync_metadata_fields(f"{bq_client.project}.bench.images", {"color" : "enum"})
+    color = next(data for data in payloads if data["name"] == "color")
+    assert sorted(option["name"] for option in color["options"]) == ["blue", "red"], color
+
+def check_load_job_chunking():
+    """ LoadJobWriter keeps every load job under its byte and row caps, and a failed chunk is reported without losing the others """
+    bq_client = FakeBigQueryClient()
+    fake_table = bq_client.add_table(f"{bq_client.project}.bench.labels", [bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("caption", "STRING")], [])
+    rows = ({"global_key" : f"key-{index:04d}", "caption" : "x" * (index % 50)} for index in range(1000))
+    loads, load_table_from_file = [], bq_client.load_table_from_file
+    def record(file_obj, destination, **kwargs):
+        data = file_obj.getvalue()
+        loads.append((len(data.splitlines()), len(data)))
+        if len(loads) == 2:
+            raise RuntimeError("load failed")
+        return load_table_from_file(file_obj, destination, **kwargs)
+    bq_client.load_table_from_file = record
+    with report_run("check") as report:
+        errors = LoadJobWriter(max_chunk_bytes=8000, max_chunk_rows=150, max_workers=1).write(bq_client, fake_table.to_table(), rows)
+    assert len(loads) > 1000 // 150 and all(lines <= 150 and size <= 8000 for lines, size in loads), loads
+    assert sum(lines for lines, _ in loads) == 1000, loads
+    assert [(error["chunk"], error["rows"]) for error in errors] == [(1, loads[1][0])], errors
+    assert len(fake_table.rows) == report.counters["rows_written"] == 1000 - loads[1][0], (len(fake_table.rows), report.counters)
+
+def check_watermark_incremental_reads():
+    """ A watermarked create_data_rows_from_table run only reads and uploads rows above the watermark left by the last run """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    client = make_client(bq_client, lb_client, state_path=":memory:")
+    table_id = f"{bq_client.project}.bench.images"
+    fake_table = bq_client.add_table(table_id, [bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("row_data", "STRING"), bigquery.SchemaField("ingested_id", "INTEGER")],
+        [(f"key-{index}", f"https://storage.googleapis.com/bench/{index}.jpg", index) for index in range(100)])
+    dataset = lb_client.create_dataset()
+    rows_read = []
+    for new_rows in [0, 30, 0]:
+        fake_table.append_dicts([{"global_key" : f"key-{index}", "row_data" : f"https://storage.googleapis.com/bench/{index}.jpg", "ingested_id" : index} for index in range(len(fake_table.rows), len(fake_table.rows) + new_rows)])
+        with open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+            client.create_data_rows_from_table(table_id, dataset, row_data_col="row_data", global_key_col="global_key", watermark_col="ingested_id")
+        rows_read.append(client.last_run_report.counters.get("bq_rows_read", 0))
+    assert rows_read == [100, 30, 0], rows_read
+    assert len(lb_client.data_rows_by_key) == 130, len(lb_client.data_rows_by_key)
+    assert client._get_state_store().get_watermark(table_id, dataset.uid, "ingested_id")[1] == 129
+
+def check_checkpoint_resume():
+    """ Rerunning a failed checkpointed create_data_rows_from_table call reuses its query job and only uploads the rows it had not uploaded """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    table_id = f"{bq_client.project}.bench.images"
+    bq_client.add_table(table_id, [bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("row_data", "STRING")],
+        [(f"key-{index}", f"https://storage.googleapis.com/bench/{index}.jpg") for index in range(100)])
+    dataset = lb_client.create_dataset()
+    create_data_rows, uploads = FakeDataset.create_data_rows, []
+    def fail_after_two_batches(self, items):
+        uploads.append(len(items))
+        if len(uploads) > 2:
+            raise RuntimeError("upload failed")
+        return create_data_rows(self, items)
+    kwargs = {"row_data_col" : "row_data", "global_key_col" : "global_key", "stream" : True, "page_size" : 25, "checkpoint" : True}
+    with tempfile.TemporaryDirectory() as state_dir, open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+        state_path = os.path.join(state_dir, "state.db")
+        with mock.patch.object(FakeDataset, "create_data_rows", fail_after_two_batches), mock.patch("labelboxbigquery.batching.BACKOFF_BASE_SECONDS", 0):
+            make_client(bq_client, lb_client, state_path=state_path).create_data_rows_from_table(table_id, dataset, **kwargs)
+        assert len(lb_client.data_rows_by_key) == 50, len(lb_client.data_rows_by_key)
+        client = make_client(bq_client, lb_client, state_path=state_path)
+        client.create_data_rows_from_table(table_id, dataset, **kwargs)
+    assert len(lb_client.data_rows_by_key) == 100, len(lb_client.data_rows_by_key)
+    assert bq_client.service.calls["bigquery.jobs.insert.query"] == 1, dict(bq_client.service.calls)
+    counters = client.last_run_report.counters
+    assert (counters["bq_rows_read"], counters["rows_uploaded"]) == (50, 50), counters
+
+def check_batcher_retry_backoff():
+    """ AdaptiveBatcher backs off exponentially on rate limits, gives up on other errors sooner, and shrinks batches after them """
+    class RateLimited(Exception):
+        code = 429
+    def failing(errors):
+        calls = []
+        def send_function(batch):
+            calls.append(len(batch))
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return len(batch)
+        return send_function, calls
+    sleeps = []
+    with mock.patch("labelboxbigquery.batching.time.sleep", sleeps.append), mock.patch("labelboxbigquery.batching.random.uniform", lambda low, high: high):
+        batcher = AdaptiveBatcher(batch_rows=400, min_rows=100, max_retries=3, max_error_retries=1)
+        send_function, calls = failing([RateLimited(), RateLimited(), RateLimited()])
+        with report_run("check") as report:
+            assert batcher.send(list(range(400)), send_function) == 400
+        assert len(calls) == 4 and report.counters["rate_limited"] == 3, (calls, report.counters)
+        assert len(sleeps) >= 3 and sleeps[0] < sleeps[1] < sleeps[2] and sleeps[2] >= 3.5, sleeps
+        assert batcher.send_interval > 0, batcher.send_interval
+        send_function, calls = failing([RateLimited()] * 4)
+        try:
+            batcher.send([0], send_function)
+            raise AssertionError("rate limits past max_retries were not raised")
+        except RateLimited:
+            pass
+        assert len(calls) == 4, calls
+        batcher = AdaptiveBatcher(batch_rows=400, min_rows=100, max_retries=3, max_error_retries=1)
+        send_function, calls = failing([ValueError("payload too large")] * 2)
+        try:
+            batcher.send(list(range(400)), send_function)
+            raise AssertionError("errors past max_error_retries were not raised")
+        except ValueError:
+            pass
+        assert len(calls) == 2 and batcher.batch_rows == 200, (calls, batcher.batch_rows)
+    assert [len(batch) for batch in AdaptiveBatcher(batch_rows=1000, max_bytes=100).batches(["x" * 30] * 10, size_of=len)] == [4, 4, 2]
+
+def check_fingerprint_skipping():
+    """ Fingerprinted metadata syncs skip rows whose table values did not change since the last sync, and still pick up rows that did """
+    for case in ["upsert_labelbox_metadata", "upsert_table_metadata"]:
+        bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+        client = make_client(bq_client, lb_client, state_path=":memory:")
+        kwargs = dict(CASES[case](bq_client, lb_client, 500), use_fingerprints=True)
+        fake_table = bq_client.tables[kwargs["bq_table_id"]]
+        with open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+            getattr(client, case)(**kwargs)
+            lb_client.service.calls.clear()
+            summary = getattr(client, case)(**kwargs)
+            assert sum(lb_client.service.calls.values()) <= 1, (case, dict(lb_client.service.calls))
+            assert summary.get("updated", summary.get("rows_updated")) == 0, (case, summary)
+            caption_index = fake_table.column_index()["caption"]
+            for index in range(5):
+                row = list(fake_table.rows[index])
+                row[caption_index] = f"edited {index}"
+                fake_table.rows[index] = tuple(row)
+            fake_table.version += 1
+            summary = getattr(client, case)(**kwargs)
+        # Edited table rows are pushed to Labelbox, or overwritten with the Labelbox values when the table is the one being synced
+        assert summary.get("updated", summary.get("rows_updated")) == 5, (case, summary)
+        assert client.last_run_report.counters["bq_rows_read"] < 2 * 500, (case, client.last_run_report.counters)
+
+def check_legacy_global_key():
+    """ Data rows are keyed by global_key_col, and legacy_global_key=True keeps the row_data keys datasets created by 0.1.8 and earlier have """
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    client = make_client(bq_client, lb_client, state_path=":memory:")
+    table_id = f"{bq_client.project}.bench.images"
+    bq_client.add_table(table_id, [bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("row_data", "STRING")],
+        [(f"key-{index}", f"https://storage.googleapis.com/bench/{index}.jpg") for index in range(10)])
+    with open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+        client.create_data_rows_from_table(table_id, lb_client.create_dataset(), row_data_col="row_data", global_key_col="global_key")
+        assert sorted(lb_client.data_rows_by_key) == sorted(f"key-{index}" for index in range(10)), sorted(lb_client.data_rows_by_key)
+        legacy_dataset = lb_client.create_dataset()
+        for _ in range(2):
+            client.create_data_rows_from_table(table_id, legacy_dataset, row_data_col="row_data", global_key_col="global_key", legacy_global_key=True, skip_duplicates=True)
+    assert len(lb_client.data_rows_by_key) == 20 and "https://storage.googleapis.com/bench/0.jpg" in lb_client.data_rows_by_key, sorted(lb_client.data_rows_by_key)
+
+def check_add_column_without_dml():
+    """ add_column_function only backfills default_value with a billed UPDATE when fill_existing_rows is True """
+    bq_client = FakeBigQueryClient()
+    table_id = f"{bq_client.project}.bench.images"
+    bq_client.add_table(table_id, [bigquery.SchemaField("global_key", "STRING")], [(f"key-{index}",) for index in range(10)])
+    add_column_function(table_id, "source", bq_client, default_value="BigQuery")
+    assert not bq_client.queries and "source" in bq_client.tables[table_id].columns, bq_client.queries
+    with mock.patch.object(bq_client, "query", side_effect=RuntimeError("UPDATE sent")) as query:
+        try:
+            add_column_function(table_id, "origin", bq_client, default_value="BigQuery", fill_existing_rows=True)
+        except RuntimeError:
+            pass
+    assert query.call_count == 1 and query.call_args[0][0].startswith("UPDATE"), query.call_args_list
+
+CHECKS = {name[len("check_"):] : check for name, check in globals().items() if name.startswith("check_")}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run offline regression checks for labelboxbigquery Client entry points")
+    parser.add_argument("--checks", nargs="+", choices=list(CHECKS.keys()), default=list(CHECKS.keys()))
+    args = parser.parse_args()
+    failed = 0
+    for name in args.checks:
+        try:
+            CHECKS[name]()
+            print(f"{name:<40} ok", flush=True)
+        except Exception:
+            failed += 1
+            print(f"{name:<40} FAILED\n{traceback.format_exc()}", flush=True)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,627 @@
+""" In-process stand-ins for bigquery.Client and labelbox.Client, so the connector can be benchmarked without network access
+
+Only the calls the connector makes are implemented. Queries are interpreted from the SQL shapes the connector generates,
+not parsed as general SQL - when the connector starts generating a new query shape, teach FakeBigQueryClient.query about it.
+"""
+import io
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import Counter
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Row
+from google.api_core.exceptions import NotFound, Conflict, TooManyRequests
+from labelbox.schema.data_row_metadata import DataRowMetadata, DataRowMetadataField, DataRowMetadataKind
+try:
+    from lbox.exceptions import ApiLimitError
+except ImportError:
+    from labelbox.exceptions import ApiLimitError
+
+class ServiceModel:
+    """ Latency, rate limit and call accounting shared by every call to one fake service
+    Args:
+        latency             :   Optional (float) - Seconds added to every call
+        row_latency         :   Optional (float) - Seconds added per row a call reads or writes
+        rate_limit          :   Optional (float) - Calls per second allowed across all threads - None for no limit
+        raise_on_limit      :   Optional (bool) - If True, calls over the rate limit raise limit_error, otherwise they wait for a free slot
+        limit_error         :   Optional (Exception class) - Error raised when raise_on_limit is True
+    """
+    def __init__(self, latency=0.0, row_latency=0.0, rate_limit=None, raise_on_limit=False, limit_error=RuntimeError):
+        self.latency = latency
+        self.row_latency = row_latency
+        self.rate_limit = rate_limit
+        self.raise_on_limit = raise_on_limit
+        self.limit_error = limit_error
+        self.calls = Counter()
+        self.rate_limited = 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def call(self, name, rows=0):
+        """ Records a call, then sleeps for its latency and any rate limit wait
+        Args:
+            name            :   Required (str) - Name of the API being called
+            rows            :   Optional (int) - Number of rows the call reads or writes
+        """
+        wait = 0.0
+        with self._lock:
+            self.calls[name] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                if self.raise_on_limit and now < self._next_slot:
+                    self.rate_limited += 1
+                    raise self.limit_error(f"Rate limit of {self.rate_limit} calls per second exceeded calling {name}")
+                slot = max(now, self._next_slot)
+                self._next_slot = slot + 1.0 / self.rate_limit
+                wait = slot - now
+        delay = wait + self.latency + self.row_latency * rows
+        if delay > 0:
+            time.sleep(delay)
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+def _table_key(table):
+    """ Returns "project.dataset.table" for a table ID string, TableReference or Table """
+    if hasattr(table, "table_id") and hasattr(table, "dataset_id"):
+        return f"{table.project}.{table.dataset_id}.{table.table_id}"
+    return str(table).strip("`")
+
+def _fingerprint(value):
+    return int.from_bytes(hashlib.md5(str(value).encode("utf-8")).digest()[:8], "little", signed=True)
+
+def _ident(name):
+    return name.strip().strip("`")
+
+class FakeTable:
+    """ Rows of one fake BigQuery table, stored as tuples in schema order - columns added later read as None """
+    def __init__(self, table_id, schema, rows=None):
+        self.table_id = table_id
+        self.schema = list(schema)
+        self.rows = list(rows) if rows is not None else []
+        self.expires = None
+        # Bumped on every schema or data change, and reported as the table's etag
+        self.version = 0
+
+    @property
+    def columns(self):
+        return [schema_field.name for schema_field in self.schema]
+
+    def column_index(self):
+        return {schema_field.name.lower() : i for i, schema_field in enumerate(self.schema)}
+
+    def value(self, row, i):
+        return row[i] if i < len(row) else None
+
+    def to_table(self):
+        table = bigquery.Table(self.table_id, schema=self.schema)
+        table._properties["numRows"] = str(len(self.rows))
+        table._properties["etag"] = f"bench-{self.version}"
+        return table
+
+    def append_dicts(self, dict_rows):
+        self.version += 1
+        index = self.column_index()
+        width = len(self.schema)
+        for dict_row in dict_rows:
+            values = [None] * width
+            for name, value in dict_row.items():
+                values[index[name.lower()]] = value
+            self.rows.append(tuple(values))
+
+class FakeQueryJob:
+    """ Finished query job with paged results and the statistics the connector reads """
+    def __init__(self, service, job_id, columns=None, rows=None, destination=None, bytes_processed=0, num_dml_affected_rows=None):
+        self._service = service
+        self.job_id = job_id
+        self.location = "US"
+        self.errors = None
+        self.destination = destination
+        self.total_bytes_processed = bytes_processed
+        self.slot_millis = int(bytes_processed / 1e6) + 1
+        self.num_dml_affected_rows = num_dml_affected_rows
+        self._columns = columns or []
+        self._rows = rows or []
+
+    def result(self, page_size=None, start_index=None, **kwargs):
+        return FakeRowIterator(self._service, self._columns, self._rows[start_index or 0:], page_size)
+
+    def done(self):
+        return True
+
+class FakeRowIterator:
+    """ Mirrors google.cloud.bigquery.table.RowIterator - iterating or reading pages fetches one page per service call """
+    def __init__(self, service, columns, rows, page_size=None):
+        self._service = service
+        self._field_to_index = {name : i for i, name in enumerate(columns)}
+        self._rows = rows
+        self._page_size = page_size or 100000
+        self.total_rows = len(rows)
+
+    @property
+    def pages(self):
+        for i in range(0, len(self._rows), self._page_size):
+            page = self._rows[i:i+self._page_size]
+            self._service.call("bigquery.tabledata.list", rows=len(page))
+            yield [Row(row, self._field_to_index) for row in page]
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page
+
+class FakeLoadJob:
+    def __init__(self):
+        self.errors = None
+
+    def result(self):
+        return self
+
+class FakeBigQueryClient:
+    """ Stand-in for bigquery.Client holding tables in memory
+    Args:
+        project             :   Optional (str) - Google project name
+        service             :   Optional (ServiceModel) - Latency and rate limit of BigQuery API calls
+    """
+    def __init__(self, project="bench-project", service=None):
+        self.project = project
+        self.service = service or ServiceModel(limit_error=TooManyRequests)
+        self.tables = {}
+        self.jobs = {}
+        self.queries = []
+        self._job_ids = iter(range(1, 1 << 62))
+        self._lock = threading.RLock()
+
+    def add_table(self, table_id, schema, rows):
+        """ Creates a table filled with rows given as tuples in schema order, without counting an API call """
+        self.tables[table_id] = FakeTable(table_id, schema, rows)
+        return self.tables[table_id]
+
+    def _get(self, table):
+        key = _table_key(table)
+        if key not in self.tables:
+            raise NotFound(f"Not found: Table {key}")
+        return self.tables[key]
+
+    def get_table(self, table):
+        self.service.call("bigquery.tables.get")
+        return self._get(table).to_table()
+
+    def create_table(self, table, exists_ok=False, **kwargs):
+        self.service.call("bigquery.tables.insert")
+        key = _table_key(table)
+        with self._lock:
+            if key in self.tables and not exists_ok:
+                raise Conflict(f"Already Exists: Table {key}")
+            if key not in self.tables:
+                self.tables[key] = FakeTable(key, table.schema)
+                self.tables[key].expires = getattr(table, "expires", None)
+        return self.tables[key].to_table()
+
+    def update_table(self, table, fields, **kwargs):
+        self.service.call("bigquery.tables.patch")
+        fake_table = self._get(table)
+        if "schema" in fields:
+            fake_table.schema = list(table.schema)
+            fake_table.version += 1
+        return fake_table.to_table()
+
+    def delete_table(self, table, not_found_ok=False, **kwargs):
+        self.service.call("bigquery.tables.delete")
+        with self._lock:
+            if _table_key(table) not in self.tables and not not_found_ok:
+                raise NotFound(f"Not found: Table {_table_key(table)}")
+            self.tables.pop(_table_key(table), None)
+
+    def get_job(self, job_id, location=None, **kwargs):
+        self.service.call("bigquery.jobs.get")
+        if job_id not in self.jobs:
+            raise NotFound(f"Not found: Job {job_id}")
+        return self.jobs[job_id]
+
+    def insert_rows_json(self, table, json_rows, **kwargs):
+        json_rows = list(json_rows)
+        self.service.call("bigquery.tabledata.insertAll", rows=len(json_rows))
+        with self._lock:
+            self._get(table).append_dicts(json_rows)
+        return []
+
+    def load_table_from_json(self, json_rows, destination, job_config=None, **kwargs):
+        json_rows = list(json_rows)
+        self.service.call("bigquery.jobs.insert.load", rows=len(json_rows))
+        with self._lock:
+            fake_table = self._get(destination)
+            if job_config is not None and job_config.write_disposition == "WRITE_TRUNCATE":
+                fake_table.rows = []
+            fake_table.append_dicts(json_rows)
+        return FakeLoadJob()
+
+    def load_table_from_file(self, file_obj, destination, job_config=None, rewind=False, **kwargs):
+        if rewind:
+            file_obj.seek(0)
+        data = file_obj.read()
+        if job_config is not None and job_config.source_format == "PARQUET":
+            import pyarrow.parquet
+            json_rows = pyarrow.parquet.read_table(io.BytesIO(data)).to_pylist()
+        else:
+            json_rows = [json.loads(line) for line in data.splitlines() if line]
+        self.service.call("bigquery.jobs.insert.load", rows=len(json_rows))
+        with self._lock:
+            self._get(destination).append_dicts(json_rows)
+        return FakeLoadJob()
+
+    def query(self, query, job_config=None, **kwargs):
+        self.service.call("bigquery.jobs.insert.query")
+        self.queries.append(query)
+        params = {parameter.name : getattr(parameter, "values", None) if hasattr(parameter, "values") else parameter.value for parameter in (job_config.query_parameters if job_config else [])}
+        job_id = f"bench_job_{next(self._job_ids)}"
+        sql = " ".join(query.split())
+        with self._lock:
+            if sql.startswith("MERGE"):
+                job = self._merge(job_id, sql)
+            elif sql.startswith("UPDATE"):
+                job = self._update(job_id, sql)
+            elif sql.startswith("SELECT COUNT(*)"):
+                job = self._count_join(job_id, sql)
+            elif "ARRAY_AGG(DISTINCT" in sql or "APPROX_TOP_COUNT(" in sql:
+                job = self._distinct_values(job_id, sql)
+            elif "FARM_FINGERPRINT(TO_JSON_STRING(STRUCT(" in sql:
+                job = self._fingerprints(job_id, sql, params)
+            elif sql.startswith("SELECT"):
+                job = self._select(job_id, sql, params)
+            else:
+                raise NotImplementedError(f"FakeBigQueryClient cannot run this query shape:\n{query}")
+        self.jobs[job_id] = job
+        return job
+
+    def _bytes(self, fake_table, indexes, row_count):
+        sample = fake_table.rows[:100]
+        if not sample:
+            return 0
+        return int(sum(len(str(fake_table.value(row, i))) for row in sample for i in indexes) / len(sample) * row_count)
+
+    def _where(self, fake_table, where_str, params):
+        """ Builds a row filter from AND-ed "col > @param" and "col IN UNNEST(@param)" conditions """
+        index = fake_table.column_index()
+        checks = []
+        for condition in re.split(r"\s+AND\s+", where_str) if where_str else []:
+            match = re.fullmatch(r"`?([^`\s]+)`?\s+IN UNNEST\(@(\w+)\)", condition.strip())
+            if match:
+                column_i, allowed = index[match.group(1).lower()], set(params[match.group(2)])
+                checks.append(lambda row, i=column_i, allowed=allowed: fake_table.value(row, i) in allowed)
+                continue
+            match = re.fullmatch(r"ABS\(MOD\(FARM_FINGERPRINT\(CAST\(`?([^`\s]+)`? AS STRING\)\), @(\w+)\)\) = @(\w+)", condition.strip())
+            if match:
+                # Any stable hash splits rows into the same disjoint shards, it does not need to match BigQuery's fingerprints
+                column_i, shard_count, shard_index = index[match.group(1).lower()], params[match.group(2)], params[match.group(3)]
+                checks.append(lambda row, i=column_i, shard_count=shard_count, shard_index=shard_index: _fingerprint(fake_table.value(row, i)) % shard_count == shard_index)
+                continue
+            match = re.fullmatch(r"`?([^`\s]+)`?\s*>\s*@(\w+)", condition.strip())
+            if match:
+                column_i, bound = index[match.group(1).lower()], params[match.group(2)]
+                checks.append(lambda row, i=column_i, bound=bound: fake_table.value(row, i) is not None and fake_table.value(row, i) > bound)
+                continue
+            raise NotImplementedError(f"FakeBigQueryClient cannot evaluate WHERE condition {condition}")
+        return lambda row: all(check(row) for check in checks)
+
+    def _select(self, job_id, sql, params):
+        match = re.fullmatch(r"SELECT (.+?) FROM `?([\w.\-]+)`?(?: WHERE (.+))?", sql)
+        if not match:
+            raise NotImplementedError(f"FakeBigQueryClient cannot run this SELECT:\n{sql}")
+        fake_table = self._get(match.group(2))
+        index = fake_table.column_index()
+        columns = [_ident(column) for column in match.group(1).split(",")]
+        indexes = [index[column.lower()] for column in columns]
+        keep = self._where(fake_table, match.group(3), params)
+        rows = [tuple(fake_table.value(row, i) for i in indexes) for row in fake_table.rows if keep(row)]
+        destination = f"{self.project}._bench_anonymous.{job_id}"
+        self.tables[destination] = FakeTable(destination, [bigquery.SchemaField(column, "STRING") for column in columns], rows)
+        return FakeQueryJob(self.service, job_id, columns, rows, destination=destination, bytes_processed=self._bytes(fake_table, indexes, len(fake_table.rows)))
+
+    def _fingerprints(self, job_id, sql, params):
+        match = re.fullmatch(r"SELECT (`?[^`\s,]+`?), FARM_FINGERPRINT\(TO_JSON_STRING\(STRUCT\((.+?)\)\)\) AS (\w+) FROM `?([\w.\-]+)`?(?: WHERE (.+))?", sql)
+        if not match:
+            raise NotImplementedError(f"FakeBigQueryClient cannot run this fingerprint SELECT:\n{sql}")
+        fake_table = self._get(match.group(4))
+        index = fake_table.column_index()
+        key_i = index[_ident(match.group(1)).lower()]
+        struct_indexes = [index[_ident(column).lower()] for column in match.group(2).split(",")]
+        keep = self._where(fake_table, match.group(5), params)
+        # Any stable hash of the values stands in for FARM_FINGERPRINT, fingerprints are only compared with each other
+        rows = [
+            (fake_table.value(row, key_i), _fingerprint(json.dumps([fake_table.value(row, i) for i in struct_indexes], default=str)))
+            for row in fake_table.rows if keep(row)
+        ]
+        return FakeQueryJob(self.service, job_id, [_ident(match.group(1)), match.group(3)], rows, bytes_processed=self._bytes(fake_table, [key_i] + struct_indexes, len(fake_table.rows)))
+
+    def _distinct_values(self, job_id, sql):
+        """ Runs column profile queries - exact distinct values, and approximate top counts and cardinality, computed exactly over the whole table """
+        fake_table = self._get(re.search(r"FROM `?([\w.\-]+)`?", sql).group(1))
+        index = fake_table.column_index()
+        aggregates = re.findall(r"(ARRAY_AGG\(DISTINCT CAST|APPROX_TOP_COUNT\(CAST|APPROX_COUNT_DISTINCT)\(`([^`]+)`(?: AS STRING\)(?: IGNORE NULLS|, (\d+)))?\) AS (\w+)", sql)
+        columns, values = [], []
+        for function, column, top_count, alias in aggregates:
+            column_values = [fake_table.value(row, index[column.lower()]) for row in fake_table.rows]
+            if function.startswith("ARRAY_AGG"):
+                values.append(sorted({str(value) for value in column_values if value is not None}))
+            elif function.startswith("APPROX_TOP_COUNT"):
+                counts = Counter(None if value is None else str(value) for value in column_values)
+                values.append([{"value" : value, "count" : count} for value, count in counts.most_common(int(top_count))])
+            else:
+                values.append(len({value for value in column_values if value is not None}))
+            columns.append(alias)
+        return FakeQueryJob(self.service, job_id, columns, [tuple(values)],
+                            bytes_processed=self._bytes(fake_table, sorted({index[column.lower()] for _, column, _, _ in aggregates}), len(fake_table.rows)))
+
+    def _count_join(self, job_id, sql):
+        match = re.search(r"FROM `([^`]+)` AS target JOIN `([^`]+)` AS source ON target\.`([^`]+)` = source\.`([^`]+)`", sql)
+        target, source = self._get(match.group(1)), self._get(match.group(2))
+        target_i, source_i = target.column_index()[match.group(3).lower()], source.column_index()[match.group(4).lower()]
+        source_keys = Counter(source.value(row, source_i) for row in source.rows)
+        count = sum(source_keys[target.value(row, target_i)] for row in target.rows)
+        return FakeQueryJob(self.service, job_id, ["f0_"], [(count,)], bytes_processed=self._bytes(target, [target_i], len(target.rows)))
+
+    def _update(self, job_id, sql):
+        match = re.fullmatch(r"UPDATE `?([\w.\-]+)`? SET (.+) WHERE `?([^`\s]+)`? = \"(.*)\";?", sql)
+        fake_table = self._get(match.group(1))
+        index = fake_table.column_index()
+        assignments = {index[column.lower()] : value for column, value in re.findall(r"`?([^`\s=,]+)`? = \"([^\"]*)\"", match.group(2))}
+        key_i, key = index[match.group(3).lower()], match.group(4)
+        affected = 0
+        for row_i, row in enumerate(fake_table.rows):
+            if str(fake_table.value(row, key_i)) == key:
+                values = list(row) + [None] * (len(fake_table.schema) - len(row))
+                for i, value in assignments.items():
+                    values[i] = value
+                fake_table.rows[row_i] = tuple(values)
+                fake_table.version += 1
+                affected += 1
+        return FakeQueryJob(self.service, job_id, bytes_processed=self._bytes(fake_table, [key_i], len(fake_table.rows)), num_dml_affected_rows=affected)
+
+    def _merge(self, job_id, sql):
+        """ Runs the two MERGE shapes the connector generates - a keyed upsert of whole rows, and a keyed update that keeps current values where the source is NULL """
+        target = self._get(re.search(r"MERGE `([^`]+)` AS target", sql).group(1))
+        source = self._get(re.search(r"USING `([^`]+)` AS source", sql).group(1))
+        target_key, source_key = re.search(r"ON target\.`?([^`\s]+)`? = source\.`?([^`\s]+)`?", sql).groups()
+        target_index, source_index = target.column_index(), source.column_index()
+        set_str = re.search(r"THEN UPDATE SET (.+?)(?: WHEN NOT MATCHED|$)", sql).group(1)
+        assignments = []
+        for column, coalesce_column, source_column in re.findall(r"`([^`]+)` = (?:COALESCE\(source\.`([^`]+)`, target\.`[^`]+`\)|source\.`([^`]+)`)", set_str):
+            assignments.append((target_index[column.lower()], source_index[(coalesce_column or source_column).lower()], bool(coalesce_column)))
+        only_changed = "WHEN MATCHED AND" in sql
+        insert_match = re.search(r"WHEN NOT MATCHED THEN INSERT \((.+?)\) VALUES", sql)
+        insert_columns = [_ident(column) for column in insert_match.group(1).split(",")] if insert_match else []
+        target_key_i, source_key_i = target_index[target_key.lower()], source_index[source_key.lower()]
+        key_to_rows = {}
+        for row_i, row in enumerate(target.rows):
+            key_to_rows.setdefault(target.value(row, target_key_i), []).append(row_i)
+        affected = 0
+        width = len(target.schema)
+        for source_row in source.rows:
+            row_indexes = key_to_rows.get(source.value(source_row, source_key_i))
+            if row_indexes:
+                for row_i in row_indexes:
+                    values = list(target.rows[row_i]) + [None] * (width - len(target.rows[row_i]))
+                    new_values = list(values)
+                    for target_i, source_i, coalesce in assignments:
+                        source_value = source.value(source_row, source_i)
+                        if not coalesce or source_value is not None:
+                            new_values[target_i] = source_value
+                    if only_changed and new_values == values:
+                        continue
+                    target.rows[row_i] = tuple(new_values)
+                    target.version += 1
+                    affected += 1
+            elif insert_columns:
+                values = [None] * width
+                for column in insert_columns:
+                    values[target_index[column.lower()]] = source.value(source_row, source_index[column.lower()])
+                target.rows.append(tuple(values))
+                target.version += 1
+                affected += 1
+        return FakeQueryJob(self.service, job_id, bytes_processed=self._bytes(target, list(range(width)), len(target.rows)), num_dml_affected_rows=affected)
+
+def schema_id(name):
+    """ Returns a deterministic 25-character ID, the length Labelbox IDs are validated against """
+    return "c" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:24]
+
+class FakeSchema:
+    def __init__(self, name, kind, parent=None):
+        self.name = name
+        self.kind = kind
+        self.uid = schema_id(f"{parent}///{name}" if parent else name)
+        self.parent = schema_id(parent) if parent else None
+
+class FakeMetadataOntology:
+    """ Stand-in for DataRowMetadataOntology - exports and upserts data row metadata held by FakeLabelboxClient """
+    def __init__(self, lb_client):
+        self._lb_client = lb_client
+        self.reserved_by_name = {"lb_integration_source" : FakeSchema("lb_integration_source", DataRowMetadataKind.string)}
+        self.custom_by_name = {}
+
+    def add_schema(self, name, kind, options=None):
+        if kind == DataRowMetadataKind.enum:
+            self.custom_by_name[name] = {option : FakeSchema(option, DataRowMetadataKind.option, parent=name) for option in options or []}
+        else:
+            self.custom_by_name[name] = FakeSchema(name, kind)
+
+    @property
+    def fields_by_id(self):
+        fields_by_id = {}
+        for name, schema in {**self.reserved_by_name, **self.custom_by_name}.items():
+            if isinstance(schema, dict):
+                fields_by_id[schema_id(name)] = FakeSchema(name, DataRowMetadataKind.enum)
+                fields_by_id.update({option.uid : option for option in schema.values()})
+            else:
+                fields_by_id[schema.uid] = schema
+        return fields_by_id
+
+    def bulk_export(self, data_row_ids):
+        self._lb_client.service.call("labelbox.bulk_export", rows=len(data_row_ids))
+        data_rows = self._lb_client.data_rows_by_id
+        return [
+            DataRowMetadata(data_row_id=data_row_id, fields=[DataRowMetadataField(schema_id=field_id, value=value) for field_id, value in data_rows[data_row_id].metadata.items()])
+            for data_row_id in data_row_ids if data_row_id in data_rows
+        ]
+
+    def bulk_upsert(self, metadata):
+        self._lb_client.service.call("labelbox.bulk_upsert", rows=len(metadata))
+        data_rows = self._lb_client.data_rows_by_id
+        for data_row_metadata in metadata:
+            for field in data_row_metadata.fields:
+                data_rows[data_row_metadata.data_row_id].metadata[field.schema_id] = field.value
+        return []
+
+class FakeDataRow:
+    __slots__ = ("uid", "dataset_id", "row_data", "external_id", "global_key", "metadata")
+
+    def __init__(self, uid, dataset_id, row_data, external_id=None, global_key=None, metadata=None):
+        self.uid = uid
+        self.dataset_id = dataset_id
+        self.row_data = row_data
+        self.external_id = external_id
+        self.global_key = global_key
+        self.metadata = metadata or {}
+
+class FakeExportedDataRow:
+    """ Data row as returned by Dataset.export_data_rows(include_metadata=True) """
+    __slots__ = ("uid", "row_data", "external_id", "global_key", "metadata_fields")
+
+    def __init__(self, data_row, schema_names):
+        self.uid = data_row.uid
+        self.row_data = data_row.row_data
+        self.external_id = data_row.external_id
+        self.global_key = data_row.global_key
+        self.metadata_fields = [{"schema_id" : field_id, "name" : schema_names.get(field_id, field_id), "value" : value} for field_id, value in data_row.metadata.items()]
+
+class FakeTask:
+    def __init__(self, result):
+        self.errors = None
+        self.result = result
+
+    def wait_till_done(self):
+        pass
+
+class FakeDataset:
+    """ Stand-in for labelbox.schema.dataset.Dataset """
+    def __init__(self, lb_client, uid):
+        self._lb_client = lb_client
+        self.uid = uid
+
+    def create_data_rows(self, items):
+        self._lb_client.service.call("labelbox.create_data_rows", rows=len(items))
+        return FakeTask([{"id" : data_row.uid, "global_key" : data_row.global_key} for data_row in self._lb_client.add_data_rows(self.uid, items)])
+
+    def export_data_rows(self, include_metadata=False, **kwargs):
+        self._lb_client.service.call("labelbox.export_data_rows")
+        schema_names = self._lb_client.schema_names() if include_metadata else {}
+        for data_row in list(self._lb_client.data_rows_by_id.values()):
+            if data_row.dataset_id == self.uid:
+                yield FakeExportedDataRow(data_row, schema_names)
+
+class FakeLabelboxClient:
+    """ Stand-in for labelbox.Client holding data rows and the metadata ontology in memory
+    Args:
+        service             :   Optional (ServiceModel) - Latency and rate limit of Labelbox API calls
+    """
+    def __init__(self, service=None):
+        self.service = service or ServiceModel(limit_error=ApiLimitError)
+        self.ontology = FakeMetadataOntology(self)
+        self.data_rows_by_id = {}
+        self.data_rows_by_key = {}
+        self.datasets = {}
+        self._key_jobs = {}
+        self._ids = iter(range(1, 1 << 62))
+        self._lock = threading.Lock()
+
+    def schema_names(self):
+        """ Returns {key=schema_id : value=field name} - enum options map to their parent field name """
+        names = {}
+        for name, schema in list(self.ontology.reserved_by_name.items()) + list(self.ontology.custom_by_name.items()):
+            if isinstance(schema, dict):
+                names[schema_id(name)] = name
+                names.update({option.uid : name for option in schema.values()})
+            else:
+                names[schema.uid] = name
+        return names
+
+    def add_data_rows(self, dataset_id, items):
+        """ Stores data row dictionaries in Labelbox upload format without counting an API call """
+        created = []
+        with self._lock:
+            for item in items:
+                uid = schema_id(f"data_row_{next(self._ids)}")
+                metadata = {field["schema_id"] : field["value"] for field in item.get("metadata_fields", [])}
+                data_row = FakeDataRow(uid, dataset_id, item["row_data"], item.get("external_id"), item.get("global_key"), metadata)
+                self.data_rows_by_id[uid] = data_row
+                if data_row.global_key is not None:
+                    self.data_rows_by_key[data_row.global_key] = data_row
+                created.append(data_row)
+        return created
+
+    def create_dataset(self, name="bench-dataset"):
+        dataset = FakeDataset(self, schema_id(f"dataset_{name}"))
+        self.datasets[dataset.uid] = dataset
+        return dataset
+
+    def get_dataset(self, dataset_id):
+        self.service.call("labelbox.get_dataset")
+        return self.datasets[dataset_id]
+
+    def get_data_row_metadata_ontology(self):
+        self.service.call("labelbox.get_data_row_metadata_ontology")
+        return self.ontology
+
+    def get_data_row_ids_for_global_keys(self, global_keys, **kwargs):
+        self.service.call("labelbox.get_data_row_ids_for_global_keys", rows=len(global_keys))
+        return {"results" : [self.data_rows_by_key[global_key].uid if global_key in self.data_rows_by_key else "" for global_key in global_keys], "errors" : []}
+
+    def clear_global_keys(self, global_keys, **kwargs):
+        self.service.call("labelbox.clear_global_keys", rows=len(global_keys))
+        with self._lock:
+            for global_key in global_keys:
+                data_row = self.data_rows_by_key.pop(global_key, None)
+                if data_row:
+                    data_row.global_key = None
+        return {"results" : list(global_keys), "errors" : []}
+
+    def execute(self, query, params=None, **kwargs):
+        params = params or {}
+        if "dataRowsForGlobalKeysResult" in query:
+            self.service.call("labelbox.dataRowsForGlobalKeysResult")
+            global_keys = self._key_jobs.pop(params["job_id"])
+            found = [self.data_rows_by_key[global_key].uid for global_key in global_keys if global_key in self.data_rows_by_key]
+            not_found = [global_key for global_key in global_keys if global_key not in self.data_rows_by_key]
+            return {"dataRowsForGlobalKeysResult" : {"jobStatus" : "COMPLETE", "data" : {
+                "accessDeniedGlobalKeys" : [], "deletedDataRowGlobalKeys" : [], "fetchedDataRows" : [{"id" : uid} for uid in found], "notFoundGlobalKeys" : not_found
+            }}}
+        if "dataRowsForGlobalKeys" in query:
+            self.service.call("labelbox.dataRowsForGlobalKeys", rows=len(params["global_keys"]))
+            job_id = schema_id(f"key_job_{next(self._ids)}")
+            self._key_jobs[job_id] = list(params["global_keys"])
+            return {"dataRowsForGlobalKeys" : {"jobId" : job_id}}
+        if "upsertCustomMetadataSchema" in query:
+            self.service.call("labelbox.upsertCustomMetadataSchema")
+            data = params["data"]
+            with self._lock:
+                self.ontology.add_schema(data["name"], DataRowMetadataKind(data["kind"]), [option["name"] for option in data.get("options", [])])
+            return {"upsertCustomMetadataSchema" : {"id" : schema_id(data["name"]), "name" : data["name"]}}
+        raise NotImplementedError(f"FakeLabelboxClient cannot execute this query:\n{query}")
+
+def make_client(bq_client, lb_client, **kwargs):
+    """ Builds a labelboxbigquery Client wired to fake services
+    Args:
+        bq_client           :   Required (FakeBigQueryClient) - BigQuery stand-in
+        lb_client           :   Required (FakeLabelboxClient) - Labelbox stand-in
+        kwargs              :   Optional - Other labelboxbigquery.Client arguments
+    Returns:
+        labelboxbigquery.Client object
+    """
+    from labelboxbigquery import Client
+    # SDK clients are created on first use, setting them first means the real ones are never built
+    client = Client(lb_api_key="bench", google_project_name=bq_client.project, **kwargs)
+    client.bq_client = bq_client
+    client.lb_client = lb_client
+    return client
@@ -0,0 +1,85 @@
+""" Startup benchmark for labelboxbigquery - import time and Client construction time, each measured in fresh interpreters
+
+Examples:
+    python benchmarks/import_time.py                            # median of 5 runs, with the slowest imports
+    python benchmarks/import_time.py --runs 10 --top 20
+    python benchmarks/import_time.py --max-import-ms 300        # exits with status 1 if the median import is slower
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each snippet runs in a new interpreter and prints the seconds taken by the step being measured
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import labelboxbigquery
+print(time.perf_counter() - start)
+"""
+CLIENT_SNIPPET = """
+import time
+import labelboxbigquery
+start = time.perf_counter()
+labelboxbigquery.Client(lb_api_key="bench", google_project_name="bench", state_path=":memory:")
+print(time.perf_counter() - start)
+"""
+# Modules that should stay unloaded until a Client call needs them
+HEAVY_MODULES = ["labelbox", "google.cloud.bigquery", "pandas", "labelbase"]
+LOADED_SNIPPET = f"""
+import sys
+import labelboxbigquery
+print(",".join(name for name in {HEAVY_MODULES!r} if name in sys.modules))
+"""
+
+def _run(snippet, *python_args):
+    result = subprocess.run([sys.executable, *python_args, "-c", snippet], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result
+
+def _median_ms(snippet, runs):
+    return statistics.median(float(_run(snippet).stdout.strip()) for _ in range(runs)) * 1000
+
+def _slowest_imports(top):
+    """ Returns the top-level imports with the largest cumulative time from python -X importtime """
+    entries = []
+    for line in _run("import labelboxbigquery", "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if cumulative.isdigit() and not name.startswith(" "):
+            entries.append((int(cumulative) / 1000, name))
+    return sorted(entries, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement, the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Exit with status 1 if the median import time is above this")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = {
+        "import_ms" : round(_median_ms(IMPORT_SNIPPET, args.runs), 1),
+        "client_init_ms" : round(_median_ms(CLIENT_SNIPPET, args.runs), 1),
+        "heavy_modules_loaded" : [name for name in _run(LOADED_SNIPPET).stdout.strip().split(",") if name],
+        "slowest_imports" : [{"module" : name, "cumulative_ms" : round(ms, 1)} for ms, name in _slowest_imports(args.top)]
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"import labelboxbigquery    : {results['import_ms']:.1f} ms (median of {args.runs})")
+        print(f"Client() construction      : {results['client_init_ms']:.1f} ms (median of {args.runs})")
+        print(f"heavy modules loaded       : {', '.join(results['heavy_modules_loaded']) or 'none'}")
+        print("slowest imports (cumulative):")
+        for entry in results["slowest_imports"]:
+            print(f"    {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+    if args.max_import_ms is not None and results["import_ms"] > args.max_import_ms:
+        print(f"Import time {results['import_ms']:.1f} ms is above the {args.max_import_ms:.1f} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
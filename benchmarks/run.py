@@ -0,0 +1,189 @@
+""" Offline benchmarks for the labelboxbigquery Client entry points
+
+Every case runs in its own subprocess, so peak RSS is measured per case. Examples:
+    python benchmarks/run.py                                    # every case at 10k, 100k and 1M rows
+    python benchmarks/run.py --rows 10000                       # quick run at a single size
+    python benchmarks/run.py --cases upsert_labelbox_metadata --lb-latency 0.05 --lb-rate-limit 20
+    python benchmarks/run.py --cases create_data_rows_from_table --kwargs '{"stream": true}' --json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from google.cloud import bigquery
+from labelbox.schema.data_row_metadata import DataRowMetadataKind
+from benchmarks.fakes import FakeBigQueryClient, FakeLabelboxClient, ServiceModel, make_client, schema_id
+
+# Row counts every case runs at unless --rows is given, large enough to show how each entry point scales
+DEFAULT_ROWS = [10000, 100000, 1000000]
+# Share of rows whose metadata or labels differ between the two sides in the upsert and export cases
+CHANGED_SHARE = 0.1
+# Metadata columns every synthetic table and dataset carries
+COLORS = ["red", "green", "blue", "yellow", "black"]
+METADATA_INDEX = {"color" : "enum", "caption" : "string"}
+TABLE_SCHEMA = [
+    bigquery.SchemaField("global_key", "STRING"), bigquery.SchemaField("row_data", "STRING"), bigquery.SchemaField("external_id", "STRING"),
+    bigquery.SchemaField("color", "STRING"), bigquery.SchemaField("caption", "STRING"), bigquery.SchemaField("ingested_id", "INTEGER")
+]
+
+def _table_row(i, changed=False):
+    color = COLORS[(i + 1) % len(COLORS)] if changed else COLORS[i % len(COLORS)]
+    return (f"bench-{i:08d}", f"https://storage.googleapis.com/bench/images/{i:08d}.jpg", f"external-{i:08d}", color, f"caption {i}{' v2' if changed else ''}", i)
+
+def _fill_dataset(lb_client, dataset, rows):
+    """ Creates data rows matching the synthetic table, with metadata schemas for every METADATA_INDEX column """
+    for name, kind in METADATA_INDEX.items():
+        options = [{"name" : color} for color in COLORS] if kind == "enum" else []
+        lb_client.execute("upsertCustomMetadataSchema", {"data" : {"name" : name, "kind" : DataRowMetadataKind[kind].value, "options" : options}})
+    color_options = lb_client.ontology.custom_by_name["color"]
+    lb_client.add_data_rows(dataset.uid, [{
+        "row_data" : row_data, "external_id" : external_id, "global_key" : global_key,
+        "metadata_fields" : [{"schema_id" : schema_id("color"), "value" : color_options[color].uid}, {"schema_id" : lb_client.ontology.custom_by_name["caption"].uid, "value" : caption}]
+    } for global_key, row_data, external_id, color, caption, _ in rows])
+
+def setup_create_data_rows_from_table(bq_client, lb_client, rows):
+    table_id = f"{bq_client.project}.bench.images"
+    bq_client.add_table(table_id, TABLE_SCHEMA, [_table_row(i) for i in range(rows)])
+    dataset = lb_client.create_dataset()
+    return dict(bq_table_id=table_id, lb_dataset=dataset, row_data_col="row_data", global_key_col="global_key", external_id_col="external_id", metadata_index=METADATA_INDEX, skip_duplicates=True)
+
+def setup_create_table_from_dataset(bq_client, lb_client, rows):
+    dataset = lb_client.create_dataset()
+    _fill_dataset(lb_client, dataset, [_table_row(i) for i in range(rows)])
+    return dict(bq_dataset_id=f"{bq_client.project}.bench", bq_table_name="exported_images", lb_dataset=dataset, metadata_index=METADATA_INDEX)
+
+def setup_upsert_table_metadata(bq_client, lb_client, rows):
+    table_id = f"{bq_client.project}.bench.images"
+    bq_client.add_table(table_id, TABLE_SCHEMA, [_table_row(i) for i in range(rows)])
+    dataset = lb_client.create_dataset()
+    _fill_dataset(lb_client, dataset, [_table_row(i, changed=random.random() < CHANGED_SHARE) for i in range(rows)])
+    return dict(bq_table_id=table_id, lb_dataset=dataset, global_key_col="global_key", metadata_index=METADATA_INDEX)
+
+def setup_upsert_labelbox_metadata(bq_client, lb_client, rows):
+    table_id = f"{bq_client.project}.bench.images"
+    bq_client.add_table(table_id, TABLE_SCHEMA, [_table_row(i, changed=random.random() < CHANGED_SHARE) for i in range(rows)])
+    dataset = lb_client.create_dataset()
+    _fill_dataset(lb_client, dataset, [_table_row(i) for i in range(rows)])
+    return dict(bq_table_id=table_id, global_key_col="global_key", metadata_index=METADATA_INDEX)
+
+def setup_export_to_BigQuery(bq_client, lb_client, rows):
+    """ Exports rows labels into a table that already holds most of them - CHANGED_SHARE of the labels are newer and CHANGED_SHARE are new """
+    columns = ["label_id", "data_row_id", "global_key", "row_data", "updated_at", "created_by", "annotations|||bbox|||count", "annotations|||class|||name"]
+    updated_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    def label(i, newer=False):
+        return {
+            "label_id" : schema_id(f"label_{i}"), "data_row_id" : schema_id(f"data_row_{i}"), "global_key" : f"bench-{i:08d}",
+            "row_data" : f"https://storage.googleapis.com/bench/images/{i:08d}.jpg", "updated_at" : (updated_at + timedelta(days=1 if newer else 0)).strftime("%Y-%m-%dT%H:%M:%S.%f+0000"),
+            "created_by" : "bench@labelbox.com", "annotations|||bbox|||count" : str(i % 7), "annotations|||class|||name" : COLORS[i % len(COLORS)]
+        }
+    existing_rows = int(rows * (1 - CHANGED_SHARE))
+    bq_client.add_table(f"{bq_client.project}.bench.labels", [bigquery.SchemaField(column, "STRING") for column in columns], [tuple(label(i).values()) for i in range(existing_rows)])
+    labels = [label(i, newer=random.random() < CHANGED_SHARE) for i in range(rows)]
+    def export_and_flatten_labels(**kwargs):
+        lb_client.service.call("labelbox.export_labels", rows=len(labels))
+        return [dict(flattened_label) for flattened_label in labels]
+    return dict(project=None, bq_dataset_id="bench", bq_table_name="labels"), mock.patch("labelbase.downloader.export_and_flatten_labels", export_and_flatten_labels)
+
+CASES = {
+    "create_data_rows_from_table" : setup_create_data_rows_from_table,
+    "create_table_from_dataset" : setup_create_table_from_dataset,
+    "upsert_table_metadata" : setup_upsert_table_metadata,
+    "upsert_labelbox_metadata" : setup_upsert_labelbox_metadata,
+    "export_to_BigQuery" : setup_export_to_BigQuery,
+}
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_case(case, rows, args, kwargs):
+    """ Sets up one case, runs its entry point once and returns the measurements """
+    random.seed(0)
+    bq_client, lb_client = FakeBigQueryClient(), FakeLabelboxClient()
+    bq_client.service = ServiceModel(args.bq_latency, args.bq_row_latency, args.bq_rate_limit, args.raise_on_limit, limit_error=bq_client.service.limit_error)
+    lb_client.service = ServiceModel(args.lb_latency, args.lb_row_latency, args.lb_rate_limit, args.raise_on_limit, limit_error=lb_client.service.limit_error)
+    client = make_client(bq_client, lb_client, state_path=":memory:")
+    setup = CASES[case](bq_client, lb_client, rows)
+    call_kwargs, patch = setup if isinstance(setup, tuple) else (setup, nullcontext())
+    call_kwargs.update(kwargs)
+    # Setup calls are not part of the measurement
+    bq_client.service.calls.clear()
+    lb_client.service.calls.clear()
+    setup_rss = _peak_rss_mb()
+    with patch, open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+        started_at = time.perf_counter()
+        getattr(client, case)(**call_kwargs)
+        seconds = time.perf_counter() - started_at
+    report = client.last_run_report.to_dict() if getattr(client, "last_run_report", None) else {}
+    return {
+        "case" : case, "rows" : rows, "seconds" : round(seconds, 3), "rows_per_second" : round(rows / seconds, 1) if seconds else None,
+        "setup_rss_mb" : round(setup_rss, 1), "peak_rss_mb" : round(_peak_rss_mb(), 1),
+        "lb_api_calls" : lb_client.service.total_calls, "bq_api_calls" : bq_client.service.total_calls,
+        "lb_calls" : dict(lb_client.service.calls), "bq_calls" : dict(bq_client.service.calls), "rate_limited" : lb_client.service.rate_limited + bq_client.service.rate_limited,
+        "stages" : {stage : round(stage_seconds, 3) for stage, stage_seconds in report.get("stages", {}).items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark labelboxbigquery Client entry points against in-process BigQuery and Labelbox stand-ins")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES.keys()), default=list(CASES.keys()))
+    parser.add_argument("--rows", nargs="+", type=int, default=DEFAULT_ROWS, help="Synthetic row counts, defaults to 10000 100000 1000000")
+    parser.add_argument("--kwargs", default="{}", help="JSON object of extra keyword arguments for the entry point")
+    parser.add_argument("--bq-latency", type=float, default=0.0, help="Seconds added to every BigQuery call")
+    parser.add_argument("--bq-row-latency", type=float, default=0.0, help="Seconds added per row a BigQuery call reads or writes")
+    parser.add_argument("--bq-rate-limit", type=float, default=None, help="BigQuery calls per second")
+    parser.add_argument("--lb-latency", type=float, default=0.0, help="Seconds added to every Labelbox call")
+    parser.add_argument("--lb-row-latency", type=float, default=0.0, help="Seconds added per row a Labelbox call reads or writes")
+    parser.add_argument("--lb-rate-limit", type=float, default=None, help="Labelbox calls per second")
+    parser.add_argument("--raise-on-limit", action="store_true", help="Calls over a rate limit raise the service's rate limit error instead of waiting")
+    parser.add_argument("--json", action="store_true", help="Print one JSON result per line instead of a table")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    kwargs = json.loads(args.kwargs)
+    if args.in_process:
+        print(json.dumps(run_case(args.cases[0], args.rows[0], args, kwargs)))
+        return
+    for rows in args.rows:
+        for case in args.cases:
+            # Each case gets a fresh interpreter so peak RSS belongs to that case alone
+            command = [sys.executable, os.path.abspath(__file__), "--in-process", "--cases", case, "--rows", str(rows), "--kwargs", args.kwargs] + _service_arguments(args)
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode:
+                result = {"case" : case, "rows" : rows, "error" : completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit code {completed.returncode}"}
+            else:
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+            if args.json:
+                print(json.dumps(result), flush=True)
+            else:
+                _print_result(result)
+
+def _service_arguments(args):
+    """ Returns the latency and rate limit options to pass on to a case subprocess """
+    arguments = []
+    for name in ["bq_latency", "bq_row_latency", "bq_rate_limit", "lb_latency", "lb_row_latency", "lb_rate_limit"]:
+        if getattr(args, name) is not None:
+            arguments += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    return arguments + (["--raise-on-limit"] if args.raise_on_limit else [])
+
+def _print_result(result):
+    if "error" in result:
+        print(f"{result['case']:<28} {result['rows']:>9}  ERROR {result['error']}", flush=True)
+        return
+    stages = ", ".join([f"{stage}={seconds}s" for stage, seconds in result["stages"].items()])
+    print(
+        f"{result['case']:<28} {result['rows']:>9} rows  {result['seconds']:>9.2f}s  {result['rows_per_second']:>10.0f} rows/s  "
+        f"peak {result['peak_rss_mb']:>7.0f}MB (setup {result['setup_rss_mb']:.0f}MB)  lb calls {result['lb_api_calls']:>6}  bq calls {result['bq_api_calls']:>5}  [{stages}]",
+        flush=True
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,8 @@
 from labelboxbigquery.client import Client
+
+def __getattr__(name):
+    # AsyncClient pulls in asyncio, so it is imported the first time it is used
+    if name == "AsyncClient":
+        from labelboxbigquery.async_client import AsyncClient
+        return AsyncClient
+    raise AttributeError(f"module 'labelboxbigquery' has no attribute {name!r}")
@@ -0,0 +1,173 @@
+import copy
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from labelboxbigquery.client import Client, ONTOLOGY_CACHE_TTL
+from labelboxbigquery.metrics import report_run
+
+# Default number of Client calls (table or dataset syncs) running at once
+SYNC_WORKERS = 8
+# Default number of BigQuery and Labelbox API calls in flight at once, across every running sync
+BQ_CONCURRENCY = 16
+LB_CONCURRENCY = 8
+
+# Labelbox objects passed to a call are rebound to the shared Labelbox client, so their API calls are limited too
+# The SDK is imported when the first argument is checked, not when this module is imported
+@functools.lru_cache(maxsize=None)
+def _lb_object_type():
+    from labelbox.orm.db_object import DbObject
+    return DbObject
+
+def _limit_calls(function, semaphore):
+    """ Wraps an SDK method that sends one HTTP request per call so each call holds a slot of a shared semaphore while it runs
+    - only requests are limited, the waits between them such as Task.wait_till_done and QueryJob.result polling hold no slot
+    Args:
+        function            :   Required (callable) - SDK method, such as labelbox.Client.execute or bigquery.Client._call_api
+        semaphore           :   Required (threading.BoundedSemaphore) - Slots shared by every request to the same service
+    Returns:
+        Callable that runs function while holding a slot
+    """
+    @functools.wraps(function)
+    def call(*args, **kwargs):
+        with semaphore:
+            return function(*args, **kwargs)
+    return call
+
+def _limit_lb_client(lb_client, semaphore):
+    """ Limits a labelbox.Client - every SDK object it returns sends its GraphQL requests, uploads included, through its execute method
+    Args:
+        lb_client           :   Required (labelbox.Client) - Labelbox Client
+        semaphore           :   Required (threading.BoundedSemaphore) - Slots shared by every Labelbox request
+    Returns:
+        The same labelbox.Client object
+    """
+    lb_client.execute = _limit_calls(lb_client.execute, semaphore)
+    return lb_client
+
+def _limit_bq_client(bq_client, semaphore):
+    """ Limits a bigquery.Client - jobs, tables and row iterators send their REST requests through its _call_api method, load jobs upload through load_table_from_file
+    Args:
+        bq_client           :   Required (bigquery.Client) - BigQuery Client
+        semaphore           :   Required (threading.BoundedSemaphore) - Slots shared by every BigQuery request
+    Returns:
+        The same bigquery.Client object
+    """
+    bq_client._call_api = _limit_calls(bq_client._call_api, semaphore)
+    bq_client.load_table_from_file = _limit_calls(bq_client.load_table_from_file, semaphore)
+    return bq_client
+
+class AsyncClient:
+    """ An asyncio LabelBigQuery Client - runs Client calls in a shared, bounded executor so one process can drive many syncs at once
+    Args:
+        lb_api_key                  :   Required (str) - Labelbox API Key
+        google_key                  :   Required (dict) - Google Service Account Permissions dict, how to create one here: https://cloud.google.com/iam/docs/creating-managing-service-account-keys#creating
+        google_project_name         :   Required (str) - Google Project ID / Name
+        lb_endpoint                 :   Optinoal (bool) - Labelbox GraphQL endpoint
+        lb_enable_experimental      :   Optional (bool) - If `True` enables experimental Labelbox SDK features
+        lb_app_url                  :   Optional (str) - Labelbox web app URL
+        ontology_ttl                :   Optional (int) - Seconds a fetched Labelbox metadata ontology is reused before it is fetched again
+        state_path                  :   Optional (str) - SQLite file that stores sync state such as incremental watermarks, defaults to ~/.labelboxbigquery/state.db
+        metrics_sink                :   Optional (callable) - Called as metrics_sink(metric_name, value, tags) with stage timings and counters from every call
+        max_syncs                   :   Optional (int) - Number of Client calls run at once, further calls wait for a free worker
+        max_bq_calls                :   Optional (int) - Number of BigQuery API calls in flight at once across all syncs
+        max_lb_calls                :   Optional (int) - Number of Labelbox API calls in flight at once across all syncs
+
+    Attributes:
+        client                      :   labelboxbigquery.Client object shared by every call, each HTTP request of its SDK clients holds a max_bq_calls or max_lb_calls slot
+        last_run_report             :   labelboxbigquery.metrics.RunReport object from the most recently finished call
+
+    Key Functions:
+        create_data_rows_from_table :   Creates Labelbox data rows (and metadata) given a BigQuery table
+        create_table_from_dataset   :   Creates a BigQuery table given a Labelbox dataset
+        upsert_table_metadata       :   Updates BigQuery table metadata columns given a Labelbox dataset
+        upsert_labelbox_metadata    :   Updates Labelbox metadata given a BigQuery table
+        export_to_BigQuery          :   Exports and flattens the labels of a Labelbox project into a BigQuery table
+    """
+    def __init__(
+        self,
+        lb_api_key=None,
+        google_project_name=None,
+        google_key=None,
+        lb_endpoint='https://api.labelbox.com/graphql',
+        lb_enable_experimental=False,
+        lb_app_url="https://app.labelbox.com",
+        ontology_ttl=ONTOLOGY_CACHE_TTL,
+        state_path=None,
+        metrics_sink=None,
+        max_syncs=SYNC_WORKERS,
+        max_bq_calls=BQ_CONCURRENCY,
+        max_lb_calls=LB_CONCURRENCY):
+
+        self.client = Client(
+            lb_api_key=lb_api_key, google_project_name=google_project_name, google_key=google_key, lb_endpoint=lb_endpoint,
+            lb_enable_experimental=lb_enable_experimental, lb_app_url=lb_app_url, ontology_ttl=ontology_ttl, state_path=state_path, metrics_sink=metrics_sink
+        )
+        self._bq_semaphore = threading.BoundedSemaphore(max(1, max_bq_calls))
+        self._lb_semaphore = threading.BoundedSemaphore(max(1, max_lb_calls))
+        # SDK clients are still created on first use, limited as they are created
+        create_bq_client, create_lb_client = self.client._create_bq_client, self.client._create_lb_client
+        self.client._create_bq_client = lambda: _limit_bq_client(create_bq_client(), self._bq_semaphore)
+        self.client._create_lb_client = lambda: _limit_lb_client(create_lb_client(), self._lb_semaphore)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_syncs), thread_name_prefix="labelboxbigquery")
+        self.last_run_report = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def close(self):
+        """ Waits for running calls to finish and shuts down the executor - blocks, so from a coroutine await aclose instead """
+        self._executor.shutdown(wait=True)
+
+    async def aclose(self):
+        """ Coroutine version of close, waits for running calls to finish without blocking the event loop """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def _run(self, method, *args, **kwargs):
+        """ Runs a Client method in the shared executor with its own RunReport
+        Args:
+            method          :   Required (str) - Client method name
+            args, kwargs    :   Optional - Arguments passed to the Client method - Labelbox objects are rebound to the shared Labelbox client so their API calls count against max_lb_calls
+        Returns:
+            The Client method's return value
+        """
+        def run():
+            call_args = [self.__rebind(arg) for arg in args]
+            call_kwargs = {key : self.__rebind(value) for key, value in kwargs.items()}
+            # Concurrent calls share one Client, so each gets its own report instead of racing on Client.last_run_report
+            with report_run(method, sink=self.client.metrics_sink) as report:
+                result = getattr(self.client, method)(*call_args, **call_kwargs)
+            return result, report
+        result, report = await asyncio.get_running_loop().run_in_executor(self._executor, run)
+        self.last_run_report = report
+        return result
+
+    def __rebind(self, value):
+        if type(value).__module__.startswith("labelbox.") and isinstance(value, _lb_object_type()):
+            # A copy, so the caller's object keeps its own client
+            value = copy.copy(value)
+            value.client = self.client.lb_client
+        return value
+
+    async def create_data_rows_from_table(self, *args, **kwargs):
+        """ Coroutine version of Client.create_data_rows_from_table, takes the same arguments and returns the same value """
+        return await self._run("create_data_rows_from_table", *args, **kwargs)
+
+    async def create_table_from_dataset(self, *args, **kwargs):
+        """ Coroutine version of Client.create_table_from_dataset, takes the same arguments and returns the same value """
+        return await self._run("create_table_from_dataset", *args, **kwargs)
+
+    async def upsert_table_metadata(self, *args, **kwargs):
+        """ Coroutine version of Client.upsert_table_metadata, takes the same arguments and returns the same value """
+        return await self._run("upsert_table_metadata", *args, **kwargs)
+
+    async def upsert_labelbox_metadata(self, *args, **kwargs):
+        """ Coroutine version of Client.upsert_labelbox_metadata, takes the same arguments and returns the same value """
+        return await self._run("upsert_labelbox_metadata", *args, **kwargs)
+
+    async def export_to_BigQuery(self, *args, **kwargs):
+        """ Coroutine version of Client.export_to_BigQuery, takes the same arguments and returns the same value """
+        return await self._run("export_to_BigQuery", *args, **kwargs)
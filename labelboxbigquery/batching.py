@@ -0,0 +1,134 @@
+import time
+import random
+import threading
+from labelboxbigquery.metrics import current_report
+
+# Rows in the first batch, and the range later batches are resized within
+BATCH_START_ROWS = 20000
+BATCH_MIN_ROWS = 100
+BATCH_MAX_ROWS = 100000
+# Estimated payload bytes per batch, batches are cut early once they reach it
+BATCH_MAX_BYTES = 32 * 1024 * 1024
+# Seconds a batch should take end to end, faster batches grow and slower ones shrink
+BATCH_TARGET_SECONDS = 30
+# Attempts per batch after the first - rate limits always clear, other errors may be permanent so they get fewer - and the backoff bounds in seconds between them
+BATCH_MAX_RETRIES = 8
+BATCH_MAX_ERROR_RETRIES = 2
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# Rate limits space out every later send, the spacing starts here, doubles on each rate limit and shrinks by this factor on each success
+PACING_START_SECONDS = 0.1
+PACING_DECAY = 0.9
+
+def is_rate_limit_error(error):
+    """ Checks whether an exception raised by an SDK call is a rate limit response
+    Args:
+        error               :   Required (Exception) - Exception raised by a Labelbox or BigQuery call
+    Returns:
+        True if the call should be retried after backing off, False if not
+    """
+    if type(error).__name__ in ("ApiLimitError", "TooManyRequests", "ResourceExhausted"):
+        return True
+    return getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429
+
+class AdaptiveBatcher:
+    """ Sizes write batches by estimated payload bytes and observed latency, and retries failed batches with backoff - one batcher is shared by every thread writing to the same API
+    Args:
+        batch_rows          :   Optional (int) - Rows in the first batch
+        min_rows            :   Optional (int) - Smallest batch size the batcher shrinks to
+        max_rows            :   Optional (int) - Largest batch size the batcher grows to
+        max_bytes           :   Optional (int) - Estimated payload bytes per batch, only applies when batches() is given size_of
+        target_seconds      :   Optional (float) - Seconds a batch should take, batch sizes move toward this
+        max_retries         :   Optional (int) - Times a rate limited batch is sent again before the rate limit error is raised
+        max_error_retries   :   Optional (int) - Times a batch that failed for any other reason is sent again before its error is raised
+    """
+    def __init__(
+            self, batch_rows=BATCH_START_ROWS, min_rows=BATCH_MIN_ROWS, max_rows=BATCH_MAX_ROWS, max_bytes=BATCH_MAX_BYTES, 
+            target_seconds=BATCH_TARGET_SECONDS, max_retries=BATCH_MAX_RETRIES, max_error_retries=BATCH_MAX_ERROR_RETRIES):
+        self.min_rows = max(1, min(min_rows, batch_rows))
+        self.max_rows = max(self.min_rows, max_rows)
+        self.batch_rows = min(max(batch_rows, self.min_rows), self.max_rows)
+        self.max_bytes = max_bytes
+        self.target_seconds = target_seconds
+        self.max_retries = max_retries
+        self.max_error_retries = max_error_retries
+        self._lock = threading.Lock()
+        # Sends are spaced send_interval seconds apart, each thread reserves the next free slot - both stay at zero until a rate limit
+        self.send_interval = 0.0
+        self._next_send_at = 0.0
+
+    def batches(self, items, size_of=None):
+        """ Splits items into batches, reading the current batch size as each batch starts so later batches follow what earlier ones observed
+        Args:
+            items           :   Required (iterable) - Items to send
+            size_of         :   Optional (callable) - Returns the estimated payload bytes of an item, if None batches are sized by rows only
+        Returns:
+            Generator of lists of items
+        """
+        batch, batch_bytes = [], 0
+        for item in items:
+            batch.append(item)
+            if size_of:
+                batch_bytes += size_of(item)
+            if len(batch) >= self.batch_rows or (size_of and batch_bytes >= self.max_bytes):
+                yield batch
+                batch, batch_bytes = [], 0
+        if batch:
+            yield batch
+
+    def send(self, batch, send_function):
+        """ Sends one batch, retrying only this batch on failure - rate limits slow down every thread sharing the batcher, other errors also shrink later batches
+        Args:
+            batch           :   Required (list) - Batch from batches()
+            send_function   :   Required (callable) - Called as send_function(batch), raises on failure
+        Returns:
+            The return value of send_function
+        """
+        report = current_report()
+        attempt = 0
+        error_attempt = 0
+        while True:
+            self.__wait_for_slot()
+            started_at = time.monotonic()
+            try:
+                result = send_function(batch)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                if attempt >= self.max_retries or (not rate_limited and error_attempt >= self.max_error_retries):
+                    raise
+                attempt += 1
+                error_attempt += 0 if rate_limited else 1
+                report.count("batch_retries")
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                if rate_limited:
+                    report.count("rate_limited")
+                    with self._lock:
+                        self.send_interval = min(BACKOFF_MAX_SECONDS, max(self.send_interval * 2, PACING_START_SECONDS))
+                        self._next_send_at = max(self._next_send_at, time.monotonic() + delay)
+                else:
+                    # Oversized payloads and timeouts fail the same way, smaller batches avoid both
+                    with self._lock:
+                        self.batch_rows = max(self.min_rows, self.batch_rows // 2)
+                    time.sleep(delay)
+                continue
+            self.__record_latency(len(batch), time.monotonic() - started_at)
+            return result
+
+    def __wait_for_slot(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_send_at)
+            self._next_send_at = slot + self.send_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def __record_latency(self, rows, seconds):
+        # Move halfway toward the size that would have taken target_seconds, growing at most 2x per batch
+        ideal_rows = rows * self.target_seconds / seconds if seconds > 0 else rows * 2
+        with self._lock:
+            self.send_interval = self.send_interval * PACING_DECAY if self.send_interval * PACING_DECAY >= PACING_START_SECONDS / 10 else 0.0
+            # Batches cut short by max_bytes or the end of the input say little about larger sizes, they only shrink the target
+            if rows < self.batch_rows and ideal_rows > self.batch_rows:
+                return
+            next_rows = (self.batch_rows + min(ideal_rows, self.batch_rows * 2)) / 2
+            self.batch_rows = int(min(max(next_rows, self.min_rows), self.max_rows))
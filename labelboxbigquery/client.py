@@ -1,16 +1,145 @@
-import labelbox
-from labelbox import Client as labelboxClient
-from labelbox.schema.data_row_metadata import DataRowMetadataKind
-from labelbase.downloader import export_and_flatten_labels
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from __future__ import annotations
+from labelboxbigquery.lazy import lazy_import
+from labelboxbigquery.writer import get_writer
+from labelboxbigquery.connector import get_column_profiles_function, add_columns_function
+from labelboxbigquery.transform import DataRowPlan, CompactDataRow, metadata_approx_bytes
+from labelboxbigquery.schema import TYPE_ALIASES, parse_timestamp, get_column_types, infer_column_types, convert_value, new_table
+from labelboxbigquery.batching import AdaptiveBatcher, BATCH_START_ROWS
+from labelboxbigquery.state import StateStore, DEFAULT_STATE_PATH, WATERMARK_DECODERS, fingerprint_values
+from labelboxbigquery.metrics import instrumented, current_report, bind_report, report_run
 from uuid import uuid4
-import pandas as pd
-from datetime import datetime
+import os
+import time
+import threading
+import functools
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import itertools
+
+# The Labelbox SDK and BigQuery SDK take most of the package's import time, they load on first use instead
+labelbox = lazy_import("labelbox")
+bigquery = lazy_import("google.cloud.bigquery")
+service_account = lazy_import("google.oauth2.service_account")
+google_auth = lazy_import("google.auth")
+google_auth_transport = lazy_import("google.auth.transport.requests")
+api_exceptions = lazy_import("google.api_core.exceptions")
+requests_adapters = lazy_import("requests.adapters")
+downloader = lazy_import("labelbase.downloader")
+# Only sharded runs start worker processes, and multiprocessing is the slowest standard library import left
+process_pool = lazy_import("concurrent.futures.process")
 
 
 # BigQuery limits special characters that can be used in column names and they have to be unicode
 DIVIDER_MAPPINGS = {'&' : '\u0026', '%' : '\u0025', '>' : '\u003E', '#' : '\u0023', '|' : '\u007c'}
+# Staging tables are deleted once a MERGE completes, the expiration only cleans up after interrupted runs
+STAGING_TABLE_EXPIRATION_HOURS = 24
+# Number of IDs sent per array query parameter, keeps each lookup query well under BigQuery's request size limit
+LABEL_LOOKUP_CHUNK_SIZE = 10000
+# Default number of table rows read and uploaded at a time by create_data_rows_from_table(stream=True)
+STREAM_PAGE_SIZE = 20000
+# Default number of data row upload batches sent to Labelbox concurrently
+UPLOAD_BATCHES_IN_FLIGHT = 4
+# Global keys sent per dataRowsForGlobalKeys job, and the number of those jobs run concurrently
+GLOBAL_KEY_CHECK_CHUNK_SIZE = 5000
+GLOBAL_KEY_CHECK_WORKERS = 4
+# Default number of seconds a fetched Labelbox metadata ontology is reused
+ONTOLOGY_CACHE_TTL = 300
+# Number of Labelbox metadata schemas created concurrently during a metadata sync
+SCHEMA_CREATE_WORKERS = 4
+# Labelbox trims metadata schema and enum option names and rejects them when empty or longer than this
+METADATA_NAME_MAX_LENGTH = 100
+# Exported data rows and labels written to BigQuery at a time by create_table_from_dataset and export_to_BigQuery
+EXPORT_CHUNK_ROWS = 50000
+# Data rows exported, compared and upserted together by upsert_labelbox_metadata, and the number of chunks in flight
+METADATA_CHUNK_SIZE = 5000
+METADATA_WORKERS = 4
+# Fingerprinted syncs look up changed rows by global key while at most this share of rows changed, above it they read the table once
+FINGERPRINT_LOOKUP_SHARE = 0.2
+
+# Connections kept open per host by each Labelbox and BigQuery HTTP session, sized for the upload, key check, metadata and load job thread pools
+HTTP_POOL_SIZE = 32
+
+# Authorized BigQuery HTTP sessions shared by every Client in a process, keyed by (process ID, service account key file)
+_BQ_SESSIONS = {}
+_BQ_SESSIONS_LOCK = threading.Lock()
+
+def _pooled_adapter():
+    """ Returns a requests HTTPAdapter that keeps HTTP_POOL_SIZE connections open per host """
+    return requests_adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+
+def _get_bq_session(google_key):
+    """ Returns the credentials and pooled, authorized HTTP session for a service account key file, creating them on first use
+    Args:
+        google_key          :   Required (str or None) - Service account key file, None uses application default credentials
+    Returns:
+        Tuple of (google.auth.credentials.Credentials, google.auth.transport.requests.AuthorizedSession)
+    """
+    # Forked worker processes must not reuse their parent's open connections, so sessions are per process
+    key = (os.getpid(), google_key)
+    with _BQ_SESSIONS_LOCK:
+        if key not in _BQ_SESSIONS:
+            if google_key:
+                credentials = service_account.Credentials.from_service_account_file(google_key, scopes=bigquery.Client.SCOPE)
+            else:
+                credentials, _ = google_auth.default(scopes=bigquery.Client.SCOPE)
+            session = google_auth_transport.AuthorizedSession(credentials)
+            session.mount("https://", _pooled_adapter())
+            _BQ_SESSIONS[key] = (credentials, session)
+        return _BQ_SESSIONS[key]
+
+def _count_calls(function, *counter_names):
+    """ Wraps an SDK method so every call adds to counters of the current run report
+    Args:
+        function            :   Required (callable) - SDK method that sends one request per call, such as labelbox.Client.execute
+        counter_names       :   Required (str) - Names of the counters to add 1 to per call
+    Returns:
+        Callable that counts each call, then runs function
+    """
+    @functools.wraps(function)
+    def call(*args, **kwargs):
+        report = current_report()
+        for counter_name in counter_names:
+            report.count(counter_name)
+        return function(*args, **kwargs)
+    return call
+
+def _query_parameter_type(bq_table, column_name):
+    """ Returns the query parameter type matching a BigQuery table column's type
+    Args:
+        bq_table            :   Required (google.cloud.bigquery.table.Table) - BigQuery Table
+        column_name         :   Required (str) - Column name
+    Returns:
+        Standard SQL type name to use for a ScalarQueryParameter or ArrayQueryParameter on that column
+    """
+    field_type = {schema_field.name.lower() : schema_field.field_type for schema_field in bq_table.schema}.get(column_name.lower(), "STRING")
+    return TYPE_ALIASES.get(field_type, field_type)
+
+def _metadata_values_equal(current_value, new_value, kind=None):
+    """ Compares a Labelbox metadata value with a table value the way Labelbox stores values of the field's kind
+    Args:
+        current_value       :   Required - Value currently stored in Labelbox
+        new_value           :   Required - Value read from the BigQuery table
+        kind                :   Optional (labelbox.schema.data_row_metadata.DataRowMetadataKind) - Kind of the metadata field - only number values are compared as numbers and only datetime values as timestamps
+    Returns:
+        True if both values represent the same metadata value, False if not
+    """
+    metadata_kind = labelbox.schema.data_row_metadata.DataRowMetadataKind
+    if kind == metadata_kind.number:
+        # Booleans are not numbers to Labelbox, True must not match 1
+        if isinstance(current_value, bool) or isinstance(new_value, bool):
+            return type(current_value) == type(new_value) and current_value == new_value
+        try:
+            return float(current_value) == float(new_value)
+        except (TypeError, ValueError):
+            return False
+    if kind == metadata_kind.datetime:
+        try:
+            return parse_timestamp(current_value) == parse_timestamp(new_value)
+        except (TypeError, ValueError):
+            return False
+    # Strings and enum option IDs must match exactly, so "007" and "7" differ
+    return str(current_value) == str(new_value)
 
 class Client:
     """ A LabelBigQuery Client, containing a Labelbox Client and BigQuery Client Object
@@ -21,10 +150,14 @@ class Client:
         lb_endpoint                 :   Optinoal (bool) - Labelbox GraphQL endpoint
         lb_enable_experimental      :   Optional (bool) - If `True` enables experimental Labelbox SDK features
         lb_app_url                  :   Optional (str) - Labelbox web app URL
+        ontology_ttl                :   Optional (int) - Seconds a fetched Labelbox metadata ontology is reused before it is fetched again
+        state_path                  :   Optional (str) - SQLite file that stores sync state such as incremental watermarks, defaults to ~/.labelboxbigquery/state.db
+        metrics_sink                :   Optional (callable) - Called as metrics_sink(metric_name, value, tags) with stage timings and counters from every Key Function call
         
     Attributes:
-        lb_client                   :   labelbox.Client object
-        bq_client                   :   bigquery.Client object
+        lb_client                   :   labelbox.Client object, created on first use
+        bq_client                   :   bigquery.Client object, created on first use on an HTTP session shared by Clients with the same google_key
+        last_run_report             :   labelboxbigquery.metrics.RunReport object with per-stage timings and counters from the most recent Key Function call
         
     Key Functions:
         create_data_rows_from_table :   Creates Labelbox data rows (and metadata) given a BigQuery table
@@ -39,12 +172,91 @@ class Client:
         google_key=None,
         lb_endpoint='https://api.labelbox.com/graphql', 
         lb_enable_experimental=False, 
-        lb_app_url="https://app.labelbox.com"):  
+        lb_app_url="https://app.labelbox.com",
+        ontology_ttl=ONTOLOGY_CACHE_TTL,
+        state_path=None,
+        metrics_sink=None):  
 
-        self.lb_client = labelboxClient(lb_api_key, endpoint=lb_endpoint, enable_experimental=lb_enable_experimental, app_url=lb_app_url)
-        self.bq_creds = service_account.Credentials.from_service_account_file(google_key) if google_key else None
-        self.bq_client = bigquery.Client(project=google_project_name, credentials=self.bq_creds)
+        # Sharded runs rebuild the Client in each worker process from these arguments
+        self._init_kwargs = dict(
+            lb_api_key=lb_api_key, google_project_name=google_project_name, google_key=google_key, lb_endpoint=lb_endpoint,
+            lb_enable_experimental=lb_enable_experimental, lb_app_url=lb_app_url, ontology_ttl=ontology_ttl, state_path=state_path
+        )
+        # SDK clients are created on first use, so constructing a Client makes no network calls and imports neither SDK
+        self._lb_client = None
+        self._bq_client = None
+        self._sdk_lock = threading.Lock()
         self.google_project_name = google_project_name
+        # Global keys confirmed to be in use, absent keys are never remembered since any other upload can take them
+        self._global_key_index = set()
+        self.ontology_ttl = ontology_ttl
+        self._ontology_cache = None
+        self._ontology_lock = threading.Lock()
+        self.state_path = state_path if state_path else DEFAULT_STATE_PATH
+        self._state_store = None
+        self.metrics_sink = metrics_sink
+        self.last_run_report = None
+
+    @property
+    def lb_client(self):
+        """ labelbox.Client object, created on first use """
+        if self._lb_client is None:
+            with self._sdk_lock:
+                if self._lb_client is None:
+                    self._lb_client = self._create_lb_client()
+        return self._lb_client
+
+    @lb_client.setter
+    def lb_client(self, value):
+        self._lb_client = value
+
+    @property
+    def bq_client(self):
+        """ bigquery.Client object, created on first use """
+        if self._bq_client is None:
+            with self._sdk_lock:
+                if self._bq_client is None:
+                    self._bq_client = self._create_bq_client()
+        return self._bq_client
+
+    @bq_client.setter
+    def bq_client(self, value):
+        self._bq_client = value
+
+    @property
+    def bq_creds(self):
+        """ Service account credentials loaded from google_key, None when the Client uses application default credentials """
+        google_key = self._init_kwargs["google_key"]
+        return _get_bq_session(google_key)[0] if google_key else None
+
+    def _create_lb_client(self):
+        """ Creates the Labelbox Client, widening the connection pool of the HTTP session it keeps for every request
+        Returns:
+            labelbox.Client object
+        """
+        lb_client = labelbox.Client(
+            self._init_kwargs["lb_api_key"], endpoint=self._init_kwargs["lb_endpoint"], 
+            enable_experimental=self._init_kwargs["lb_enable_experimental"], app_url=self._init_kwargs["lb_app_url"]
+        )
+        # Upload, global key check and metadata threads share this session, the default pool of 10 connections would make them reconnect
+        session = getattr(getattr(lb_client, "_request_client", None), "_connection", None)
+        if session is not None:
+            session.mount("https://", _pooled_adapter())
+        # Every GraphQL request goes through execute, including the ones SDK helpers split a call into and their status polls
+        lb_client.execute = _count_calls(lb_client.execute, "lb_api_calls")
+        return lb_client
+
+    def _create_bq_client(self):
+        """ Creates the BigQuery Client on the pooled HTTP session shared by every Client with the same credentials
+        Returns:
+            bigquery.Client object
+        """
+        credentials, session = _get_bq_session(self._init_kwargs["google_key"])
+        bq_client = bigquery.Client(project=self.google_project_name, credentials=credentials, _http=session)
+        # Table, job, polling and row page requests all go through _call_api, load jobs upload their data through load_table_from_file
+        bq_client._call_api = _count_calls(bq_client._call_api, "bq_api_calls")
+        bq_client.load_table_from_file = _count_calls(bq_client.load_table_from_file, "bq_api_calls", "bq_load_jobs")
+        return bq_client
 
     def _validate_divider(self, divider):
         unicode_divider = ''
@@ -54,6 +266,66 @@ class Client:
             unicode_divider += DIVIDER_MAPPINGS[char]
         return unicode_divider
 
+    def _get_metadata_ontology(self, refresh=False):
+        """ Returns the Labelbox metadata ontology and its name key indexes, reusing a cached copy until ontology_ttl expires
+        Args:
+            refresh         :   Optional (bool) - If True, fetches the ontology even if the cached copy has not expired
+        Returns:
+            Tuple of (labelbox.schema.data_row_metadata.DataRowMetadataOntology, {key=metadata_schema_id: value=metadata_name_key}, {key=metadata_name_key: value=metadata_schema_id})
+        """
+        with self._ontology_lock:
+            if refresh or self._ontology_cache is None or time.monotonic() - self._ontology_cache[3] > self.ontology_ttl:
+                lb_mdo = self.lb_client.get_data_row_metadata_ontology()
+                metadata_schema_to_name_key = self.__get_metadata_schema_to_name_key(lb_mdo, invert=False)
+                metadata_name_key_to_schema = {v:k for k,v in metadata_schema_to_name_key.items()}
+                self._ontology_cache = (lb_mdo, metadata_schema_to_name_key, metadata_name_key_to_schema, time.monotonic())
+            return self._ontology_cache[:3]
+
+    def _get_state_store(self):
+        """ Opens the local sync state store on first use, so Clients that never sync incrementally never touch the file system
+        Returns:
+            labelboxbigquery.state.StateStore object
+        """
+        if self._state_store is None:
+            self._state_store = StateStore(self.state_path)
+        return self._state_store
+
+    def invalidate_metadata_ontology(self):
+        """ Drops the cached Labelbox metadata ontology, call this after changing metadata schemas outside of this Client """
+        with self._ontology_lock:
+            self._ontology_cache = None
+
+    def _table_exists(self, bq_table_id):
+        """ Checks whether a BigQuery table exists
+        Args:
+            bq_table_id     :   Required (str or google.cloud.bigquery.table.TableReference) - BigQuery Table ID or reference
+        Returns:
+            True if the table exists, False if not
+        """
+        try:
+            self.bq_client.get_table(bq_table_id)
+            return True
+        except api_exceptions.NotFound:
+            return False
+
+    def _load_staging_table(self, bq_table, rows, schema):
+        """ Creates a temporary staging table next to a BigQuery table and fills it with a single load job
+        Args:
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table the staging table is created next to
+            rows            :   Required (list) - List of JSON-serializable dictionaries where {key=column_name : value=column_value}
+            schema          :   Required (list) - List of bigquery.SchemaField objects for the staging table
+        Returns:
+            Staging table ID structured in the following format: "google_project_name.dataset_name.table_name"
+        """
+        staging_table_id = f"{bq_table.project}.{bq_table.dataset_id}.{bq_table.table_id}_lb_staging_{uuid4().hex}"
+        staging_table = bigquery.Table(staging_table_id, schema=schema)
+        staging_table.expires = datetime.now(timezone.utc) + timedelta(hours=STAGING_TABLE_EXPIRATION_HOURS)
+        self.bq_client.create_table(staging_table)
+        job_config = bigquery.LoadJobConfig(schema=schema, write_disposition="WRITE_TRUNCATE")
+        load_job = self.bq_client.load_table_from_json(rows, staging_table_id, job_config=job_config)
+        load_job.result()
+        return staging_table_id
+
     def _sync_metadata_fields(self, bq_table_id, metadata_index={}):
         """ Ensures Labelbox's Metadata Ontology has all necessary metadata fields given a metadata_index
         Args:
@@ -63,44 +335,105 @@ class Client:
             True if the sync is successful, False if not
         """
         # Get your metadata ontology
-        lb_mdo = self.lb_client.get_data_row_metadata_ontology()
+        lb_mdo, _, _ = self._get_metadata_ontology()
         bq_table = self.bq_client.get_table(bq_table_id)
         # Convert your meatdata_index values from strings into labelbox.schema.data_row_metadata.DataRowMetadataKind types
-        conversion = {"enum" : DataRowMetadataKind.enum, "string" : DataRowMetadataKind.string, "datetime" : DataRowMetadataKind.datetime, "number" : DataRowMetadataKind.number}
+        kind = labelbox.schema.data_row_metadata.DataRowMetadataKind
+        conversion = {"enum" : kind.enum, "string" : kind.string, "datetime" : kind.datetime, "number" : kind.number}
         # Grab all the metadata field names
-        lb_metadata_names = [field['name'] for field in lb_mdo._get_ontology()]
-        # Iterate over your metadata_index, if a metadata_index key is not an existing metadata_field, then create it in Labelbox
-        if metadata_index:
-            for column_name in metadata_index.keys():
-                metadata_type = metadata_index[column_name]
-                if metadata_type not in conversion.keys():
-                    print(f'Error: Invalid value for metadata_index field {column_name}: {metadata_type}')
-                    return False
-                if column_name not in lb_metadata_names:
-                    # For enum fields, grab all the unique values from that column as a list
-                    if metadata_type == "enum":
-                        query_job = self.bq_client.query(f"""SELECT DISTINCT {column_name} FROM {bq_table.table_id}""")
-                        enum_options = [row.values()[0] for row in query_job]
-                    else:
-                        enum_options = []
-                    lb_mdo.create_schema(name=column_name, kind=conversion[metadata_type], options=enum_options)
-                    lb_mdo = self.lb_client.get_data_row_metadata_ontology()
-                    lb_metadata_names = [field['name'] for field in lb_mdo._get_ontology()]
-        # Iterate over your metadata_index, if a metadata_index key is not an existing column name, then create it in BigQuery  
-        if metadata_index:
-            column_names = [schema_field.name for schema_field in bq_table.schema]
-            for metadata_field_name in metadata_index.keys():
-                if metadata_field_name not in column_names:
-                    original_schema = bq_table.schema
-                    new_schema = original_schema[:]
-                    new_schema.append(bigquery.SchemaField(metadata_field_name, "STRING"))
-                    bq_table.schema = new_schema
-                    bq_table = self.bq_client.update_table(bq_table, ["schema"])                   
+        lb_metadata_names = set(lb_mdo.reserved_by_name) | set(lb_mdo.custom_by_name)
+        for column_name in metadata_index.keys():
+            if metadata_index[column_name] not in conversion.keys():
+                print(f'Error: Invalid value for metadata_index field {column_name}: {metadata_index[column_name]}')
+                return False
+        # Collect every metadata_index key that is not an existing metadata_field, enum options for all of them come from one table scan
+        column_names = [schema_field.name for schema_field in bq_table.schema]
+        missing_fields = [column_name for column_name in metadata_index.keys() if column_name not in lb_metadata_names]
+        enum_columns = [column_name for column_name in missing_fields if metadata_index[column_name] == "enum" and column_name in column_names]
+        column_to_enum_options = self.__get_enum_options(bq_table, enum_columns)
+        schemas_to_create = [(column_name, conversion[metadata_index[column_name]], column_to_enum_options.get(column_name, [])) for column_name in missing_fields]
         # Track data rows loaded from BigQuery
         if "lb_integration_source" not in lb_metadata_names:
-            lb_mdo.create_schema(name="lb_integration_source", kind=DataRowMetadataKind.string)
+            schemas_to_create.append(("lb_integration_source", kind.string, []))
+        self.__create_metadata_schemas(schemas_to_create)
+        # If a metadata_index key is not an existing column name, then create it in BigQuery - all new columns go in one schema update
+        self._add_table_columns(bq_table, [metadata_field_name for metadata_field_name in metadata_index.keys() if metadata_field_name not in column_names])
         return True
 
+    def __get_enum_options(self, bq_table, column_names):
+        """ Grabs all the unique values for several columns with at most one table scan, reusing them until the table changes
+        Args:
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table
+            column_names    :   Required (list) - List of column names to grab unique values for
+        Returns:
+            Dictionary where {key=column_name : value=list of unique non-null values as strings}
+        """
+        if not column_names:
+            return {}
+        profiles = get_column_profiles_function(bq_table, column_names, self.bq_client)
+        return {column_name : profiles[column_name]["values"] for column_name in column_names}
+
+    def __create_metadata_schemas(self, schemas_to_create, max_workers=SCHEMA_CREATE_WORKERS):
+        """ Creates several Labelbox metadata schemas concurrently, then refreshes the cached ontology once
+        Args:
+            schemas_to_create   :   Required (list) - List of (name, labelbox.schema.data_row_metadata.DataRowMetadataKind, enum_options) tuples
+            max_workers         :   Optional (int) - Number of schemas created concurrently
+        """
+        schemas_to_create = self.__validate_metadata_schemas(schemas_to_create)
+        if not schemas_to_create:
+            return
+        # Same mutation as DataRowMetadataOntology.create_schema, without the ontology refresh it runs after every schema
+        mutation_str = """mutation UpsertCustomMetadataSchemaPyApi($data: UpsertCustomMetadataSchemaInput!) {
+                upsertCustomMetadataSchema(data: $data){id name kind options {id name kind}}}"""
+        def __create_schema(schema):
+            name, kind, options = schema
+            data = {"name" : name, "kind" : kind.value}
+            if options:
+                data["options"] = [{"name" : option, "kind" : labelbox.schema.data_row_metadata.DataRowMetadataKind.option.value} for option in options]
+            return self.lb_client.execute(mutation_str, {"data" : data})
+        # Each schema is its own one-item batch, the batcher only paces and retries them
+        batcher = AdaptiveBatcher(batch_rows=1, max_rows=1)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(bind_report(lambda schema: batcher.send([schema], lambda batch: __create_schema(batch[0]))), schemas_to_create))
+        # New schemas change the name key indexes, so the next lookup refetches the ontology once
+        self.invalidate_metadata_ontology()
+
+    def __validate_metadata_schemas(self, schemas_to_create):
+        """ Trims metadata schema and enum option names the way DataRowMetadataOntology.create_schema validates them, dropping names Labelbox would reject
+        Args:
+            schemas_to_create   :   Required (list) - List of (name, labelbox.schema.data_row_metadata.DataRowMetadataKind, enum_options) tuples
+        Returns:
+            List of (name, labelbox.schema.data_row_metadata.DataRowMetadataKind, enum_options) tuples with trimmed, valid, unique names
+        """
+        valid_schemas = []
+        for name, kind, options in schemas_to_create:
+            name = str(name).strip()
+            if not 0 < len(name) <= METADATA_NAME_MAX_LENGTH:
+                print(f'Warning: Metadata field name "{name}" must be 1 to {METADATA_NAME_MAX_LENGTH} characters - skipping this field')
+                continue
+            # Options that only differ by surrounding whitespace become one option
+            valid_options = {}
+            for option in options:
+                option = str(option).strip()
+                if not 0 < len(option) <= METADATA_NAME_MAX_LENGTH:
+                    print(f'Warning: Enum option "{option}" for metadata field {name} must be 1 to {METADATA_NAME_MAX_LENGTH} characters - skipping this option')
+                    continue
+                valid_options[option] = True
+            valid_schemas.append((name, kind, list(valid_options)))
+        return valid_schemas
+
+    def _add_table_columns(self, bq_table, column_names, field_type="STRING", column_types={}):
+        """ Adds several columns to a BigQuery table with a single schema update
+        Args:
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table
+            column_names    :   Required (list) - List of column names to add, names already in the table are ignored
+            field_type      :   Optional (str) - BigQuery type for the new columns
+            column_types    :   Optional (dict) - Dictionary where {key=column_name : value=BigQuery type} for new columns that should not get field_type
+        Returns:
+            Updated BigQuery Table
+        """
+        return add_columns_function(bq_table, column_names, self.bq_client, field_type=field_type, column_types=column_types)
+
     def __get_metadata_schema_to_name_key(self, lb_mdo:labelbox.schema.data_row_metadata.DataRowMetadataOntology, divider="///", invert=False):
         """ Creates a dictionary where {key=metadata_schema_id: value=metadata_name_key} 
         - name_key is name for all metadata fields, and for enum options, it is "parent_name{divider}child_name"
@@ -111,7 +444,7 @@ class Client:
         Returns:
             Dictionary where {key=metadata_schema_id: value=metadata_name_key}
         """
-        lb_metadata_dict = lb_mdo.reserved_by_name
+        lb_metadata_dict = dict(lb_mdo.reserved_by_name)
         lb_metadata_dict.update(lb_mdo.custom_by_name)
         metadata_schema_to_name_key = {}
         for metadata_field_name in lb_metadata_dict:
@@ -124,156 +457,483 @@ class Client:
         return_value = metadata_schema_to_name_key if not invert else {v:k for k,v in metadata_schema_to_name_key.items()}
         return return_value
     
-    def __batch_create_data_rows(self, client, dataset, global_key_to_upload_dict, skip_duplicates=True, batch_size=20000):
+    def __batch_create_data_rows(self, client, dataset, global_key_to_upload_dict, skip_duplicates=True, batch_size=BATCH_START_ROWS, batches_in_flight=UPLOAD_BATCHES_IN_FLIGHT, on_batch_uploaded=None, batcher=None):
         """ Checks to make sure no duplicate global keys are uploaded before batch uploading data rows
         Args:
             client                      : Required (labelbox.client.Client) : Labelbox Client object
             dataset                     : Required (labelbox.dataset.Dataset) : Labelbox Dataset object
-            global_key_to_upload_dict   : Required (dict) : Dictionary where {key=global_key : value=data_row_dict to-be-uploaded to Labelbox}
+            global_key_to_upload_dict   : Required (dict) : Dictionary where {key=global_key : value=labelboxbigquery.transform.CompactDataRow to-be-uploaded to Labelbox}
             skip_duplicates             : Optional (bool) - If True, will skip duplicate global_keys, otherwise will generate a unique global_key with a suffix "_1", "_2" and so on
-            batch_size                  : Optional (int) : Upload batch size, 20,000 is recommended
+            batch_size                  : Optional (int) : Size of the first upload batch when no batcher is given, later batches are sized by payload bytes and latency
+            batches_in_flight           : Optional (int) : Number of batches uploaded to Labelbox concurrently
+            on_batch_uploaded           : Optional (callable) : Called in batch order with each successfully uploaded batch
+            batcher                     : Optional (labelboxbigquery.batching.AdaptiveBatcher) : Batcher shared with other uploads of the same call
         Returns:
-            A concatenated list of upload results for all batch uploads
+            Tuple of (concatenated list of upload results for all successful batches, concatenated list of errors from all failed batches)
         """
-        def __check_global_keys(client, global_keys):
-            """ Checks if data rows exist for a set of global keys
-            Args:
-                client                  : Required (labelbox.client.Client) : Labelbox Client object
-                global_keys             : Required (list(str)) : List of global key strings
-            Returns:
-                True if global keys are available, False if not
-            """
-            query_keys = [str(x) for x in global_keys]
-            # Create a query job to get data row IDs given global keys
-            query_str_1 = """query get_datarow_with_global_key($global_keys:[ID!]!){dataRowsForGlobalKeys(where:{ids:$global_keys}){jobId}}"""
-            query_job_id = client.execute(query_str_1, {"global_keys":global_keys})['dataRowsForGlobalKeys']['jobId']
-            # Get the results of this query job
-            query_str_2 = """query get_job_result($job_id:ID!){dataRowsForGlobalKeysResult(jobId:{id:$job_id}){data{
-                            accessDeniedGlobalKeys\ndeletedDataRowGlobalKeys\nfetchedDataRows{id}\nnotFoundGlobalKeys}jobStatus}}"""
-            res = client.execute(query_str_2, {"job_id":query_job_id})['dataRowsForGlobalKeysResult']['data']
-            return res
-        global_keys_list = list(global_key_to_upload_dict.keys())
-        payload = __check_global_keys(client, global_keys_list)
+        report = current_report()
+        # Only re-check the keys that changed in the previous round - renamed keys when skip_duplicates is False
+        pending_keys = list(global_key_to_upload_dict.keys())
         loop_counter = 0
-        if payload:
-            while len(payload['notFoundGlobalKeys']) != len(global_keys_list):
-                loop_counter += 1
-                if payload['deletedDataRowGlobalKeys']:
-                    client.clear_global_keys(payload['deletedDataRowGlobalKeys'])
-                    payload = __check_global_keys(client, global_keys_list)
-                    continue
-                if payload['fetchedDataRows']:
-                    for i in range(0, len(payload['fetchedDataRows'])):
-                        if payload['fetchedDataRows'][i] != "":
-                            if skip_duplicates:
-                                global_key = str(global_keys_list[i])
-                                del global_key_to_upload_dict[str(global_key)]
-                            else:
-                                global_key = str(global_keys_list[i])
-                                new_upload_dict = global_key_to_upload_dict[str(global_key)]
-                                del global_key_to_upload_dict[str(global_key)]
-                                new_global_key = f"{global_key}_{loop_counter}"
-                                new_upload_dict['global_key'] = new_global_key
-                                global_key_to_upload_dict[new_global_key] = new_upload_dict
-                    global_keys_list = list(global_key_to_upload_dict.keys())
-                    payload = __check_global_keys(client, global_keys_list)
-        upload_list = list(global_key_to_upload_dict.values())
+        while pending_keys:
+            with report.stage("key_check"):
+                key_status = self.__check_global_keys(client, pending_keys)
+            if key_status['deleted']:
+                # Keys held by deleted data rows can be reclaimed, after clearing them they are free to upload
+                client.clear_global_keys(list(key_status['deleted']))
+            taken_keys = [global_key for global_key in pending_keys if global_key in key_status['found'] or global_key in key_status['access_denied']]
+            if not taken_keys:
+                break
+            loop_counter += 1
+            pending_keys = []
+            for global_key in taken_keys:
+                if skip_duplicates:
+                    del global_key_to_upload_dict[global_key]
+                else:
+                    data_row = global_key_to_upload_dict.pop(global_key)
+                    new_global_key = f"{global_key}_{loop_counter}"
+                    data_row.global_key = new_global_key
+                    global_key_to_upload_dict[new_global_key] = data_row
+                    pending_keys.append(new_global_key)
+        batcher = batcher if batcher else AdaptiveBatcher(batch_rows=batch_size)
         upload_results = []
-        for i in range(0,len(upload_list),batch_size):
-            batch = upload_list[i:] if i + batch_size >= len(upload_list) else upload_list[i:i+batch_size]
-            task = dataset.create_data_rows(batch)
-            errors = task.errors
+        upload_errors = []
+        pending_batches = deque()
+        def __finish_batch():
+            batch, batch_future = pending_batches.popleft()
+            errors, results = batch_future.result()
             if errors:
                 print(f'Data Row Creation Error: {errors}')
-                return errors
+                upload_errors.extend(errors)
+            else:
+                upload_results.extend(results)
+                if on_batch_uploaded:
+                    on_batch_uploaded(batch)
+        # Keep several batches in flight so Labelbox processes one task while the next is submitted, results come back in batch order
+        # Batches are cut as they are submitted, so each one is sized by what the batches before it observed
+        with report.stage("upload"), ThreadPoolExecutor(max_workers=max(1, batches_in_flight)) as executor:
+            for batch in batcher.batches(global_key_to_upload_dict.values(), size_of=CompactDataRow.approx_bytes):
+                pending_batches.append((batch, executor.submit(bind_report(self.__upload_batch), dataset, batch, batcher)))
+                while len(pending_batches) >= max(1, batches_in_flight):
+                    __finish_batch()
+            while pending_batches:
+                __finish_batch()
+        return upload_results, upload_errors
+
+    def __get_checkpointed_query_job(self, query, job_config, run_checkpoint):
+        """ Runs a query, or picks up the query job a checkpointed run already ran if its results have not expired
+        Args:
+            query           :   Required (str) - SQL query
+            job_config      :   Required (bigquery.QueryJobConfig or None) - Query job configuration
+            run_checkpoint  :   Required (labelboxbigquery.state.Checkpoint or None) - Checkpoint of the current run
+        Returns:
+            Tuple of (bigquery.QueryJob, True if the job was reused from the checkpoint)
+        """
+        if run_checkpoint and run_checkpoint.get("query_job_id"):
+            # Query results are kept in a temporary table for about a day, reading it again scans nothing
+            try:
+                query_job = self.bq_client.get_job(run_checkpoint.get("query_job_id"), location=run_checkpoint.get("query_job_location"))
+                if query_job.destination and self._table_exists(query_job.destination):
+                    return query_job, True
+            except api_exceptions.NotFound:
+                pass
+        query_job = self.bq_client.query(query, job_config=job_config)
+        if run_checkpoint:
+            run_checkpoint.set("query_job_id", query_job.job_id)
+            run_checkpoint.set("query_job_location", query_job.location)
+            run_checkpoint.set("rows_done", 0)
+        return query_job, False
+
+    def __read_query_pages(self, query_job, page_size=None, start_index=None, record_job=True):
+        """ Reads a query job's results page by page, timing each page fetch as the bq_query stage
+        Args:
+            query_job       :   Required (bigquery.QueryJob) - Query job to read
+            page_size       :   Optional (int) - Number of rows fetched per page
+            start_index     :   Optional (int) - Row offset to start reading from
+            record_job      :   Optional (bool) - If True, adds the job's bytes processed and slot-ms to the run report once every page is read
+        Returns:
+            Generator of lists of google.cloud.bigquery.table.Row objects
+        """
+        report = current_report()
+        with report.stage("bq_query"):
+            pages = iter(query_job.result(page_size=page_size, start_index=start_index).pages)
+        while True:
+            with report.stage("bq_query"):
+                page = next(pages, None)
+                page = list(page) if page is not None else None
+            if page is None:
+                break
+            report.count("bq_rows_read", len(page))
+            yield page
+        if record_job:
+            report.record_query_job(query_job)
+
+    def __check_global_keys(self, client, global_keys, chunk_size=GLOBAL_KEY_CHECK_CHUNK_SIZE, max_workers=GLOBAL_KEY_CHECK_WORKERS):
+        """ Checks which of a list of global keys are already in use, in parallel chunks, skipping keys already in the local global key index
+        Args:
+            client                      : Required (labelbox.client.Client) : Labelbox Client object
+            global_keys                 : Required (list(str)) : List of global key strings
+            chunk_size                  : Optional (int) : Number of global keys sent per lookup job
+            max_workers                 : Optional (int) : Number of lookup jobs run concurrently
+        Returns:
+            Dictionary where {"found" / "deleted" / "access_denied" / "not_found" : set of global keys in that state}
+        """
+        key_status = {"found" : set(), "deleted" : set(), "access_denied" : set(), "not_found" : set()}
+        unknown_keys = []
+        for global_key in [str(x) for x in global_keys]:
+            if global_key in self._global_key_index:
+                key_status["found"].add(global_key)
             else:
-                upload_results.extend(task.result)
-        return upload_results   
+                unknown_keys.append(global_key)
+        chunks = [unknown_keys[i:i+chunk_size] for i in range(0, len(unknown_keys), chunk_size)]
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for chunk, res in zip(chunks, executor.map(bind_report(lambda chunk: self.__get_global_key_job_result(client, chunk)), chunks)):
+                not_found = set(res['notFoundGlobalKeys'])
+                deleted = set(res['deletedDataRowGlobalKeys'])
+                access_denied = set(res['accessDeniedGlobalKeys'])
+                key_status["not_found"].update(not_found)
+                key_status["deleted"].update(deleted)
+                key_status["access_denied"].update(access_denied)
+                key_status["found"].update(set(chunk) - not_found - deleted - access_denied)
+        # Remember keys in use so repeat runs skip their lookup - absent, deleted and access-denied keys are re-checked on every call
+        self._global_key_index.update(key_status["found"])
+        return key_status
+
+    def __get_global_key_job_result(self, client, global_keys):
+        """ Starts a Labelbox job that looks up data rows for a set of global keys and polls it until it completes
+        Args:
+            client                      : Required (labelbox.client.Client) : Labelbox Client object
+            global_keys                 : Required (list(str)) : List of global key strings
+        Returns:
+            Dictionary with the job's accessDeniedGlobalKeys, deletedDataRowGlobalKeys, fetchedDataRows and notFoundGlobalKeys
+        """
+        # Create a query job to get data row IDs given global keys
+        query_str_1 = """query get_datarow_with_global_key($global_keys:[ID!]!){dataRowsForGlobalKeys(where:{ids:$global_keys}){jobId}}"""
+        report = current_report()
+        query_job_id = client.execute(query_str_1, {"global_keys":global_keys})['dataRowsForGlobalKeys']['jobId']
+        # Poll the results of this query job until it is no longer in progress
+        query_str_2 = """query get_job_result($job_id:ID!){dataRowsForGlobalKeysResult(jobId:{id:$job_id}){data{
+                        accessDeniedGlobalKeys\ndeletedDataRowGlobalKeys\nfetchedDataRows{id}\nnotFoundGlobalKeys}jobStatus}}"""
+        sleep_time = 0.5
+        while True:
+            res = client.execute(query_str_2, {"job_id":query_job_id})['dataRowsForGlobalKeysResult']
+            if res['jobStatus'] == "COMPLETE":
+                return res['data']
+            if res['jobStatus'] == "FAILED":
+                raise RuntimeError(f"Global key lookup job {query_job_id} failed")
+            time.sleep(sleep_time)
+            sleep_time = min(sleep_time * 2, 10)
+
+    def clear_global_key_index(self):
+        """ Forgets which global keys were confirmed in use, so the next upload re-checks every key with Labelbox """
+        self._global_key_index = set()
+
+    def __upload_batch(self, dataset, batch, batcher):
+        """ Uploads one batch of data rows and waits for the Labelbox task to finish, retrying the submission or the polling on rate limits and failed requests
+        Args:
+            dataset                     : Required (labelbox.dataset.Dataset) : Labelbox Dataset object
+            batch                       : Required (list) : List of labelboxbigquery.transform.CompactDataRow objects to-be-uploaded to Labelbox
+            batcher                     : Required (labelboxbigquery.batching.AdaptiveBatcher) : Batcher that paces and retries the upload
+        Returns:
+            Tuple of (list of errors, list of upload results) - exactly one of the two is empty
+        """
+        report = current_report()
+        task = None
+        def __send(batch):
+            nonlocal task
+            # A batch is submitted once - after its task exists, a retry only polls that same task again, so the data rows are never created twice
+            if task is None:
+                # Payload dicts only exist while their batch is being sent
+                task = dataset.create_data_rows([data_row.to_dict() for data_row in batch])
+            task.wait_till_done()
+            return task
+        try:
+            task = batcher.send(batch, __send)
+            errors = task.errors
+        except Exception as e:
+            return [{"message" : str(e), "batch_size" : len(batch)}], []
+        if errors:
+            return errors if type(errors) == list else [errors], []
+        self._global_key_index.update(data_row.global_key for data_row in batch)
+        report.count("rows_uploaded", len(batch))
+        return [], task.result
     
+    @instrumented
     def export_to_BigQuery(self, project, bq_dataset_id:str, bq_table_name:str, create_table:bool=False,
                            include_metadata:bool=False, include_performance:bool=False, include_agreement:bool=False,
                            include_label_details:bool=False, verbose:bool=False, mask_method:str="png", divider="|||",
-                           export_filters:dict=None):
-        
+                           export_filters:dict=None, writer="load", chunk_size:int=EXPORT_CHUNK_ROWS, column_types:dict=None, infer_types:bool=False,
+                           partition_col:str=None, cluster_cols:list=None):
+        """ Exports and flattens the labels of a Labelbox project into a BigQuery table, only writing new and updated labels to an existing table
+        Args:
+            project                 :   Required (labelbox.schema.project.Project) - Labelbox project to export labels from
+            bq_dataset_id           :   Required (str) - BigQuery Dataset ID, without the google project name
+            bq_table_name           :   Required (str) - BigQuery Table name
+            create_table            :   Optional (bool) - If True, creates the table, otherwise writes to an existing table
+            include_metadata        :   Optional (bool) - If True, includes data row metadata columns
+            include_performance     :   Optional (bool) - If True, includes label performance columns
+            include_agreement       :   Optional (bool) - If True, includes label agreement columns
+            include_label_details   :   Optional (bool) - If True, includes label detail columns
+            verbose                 :   Optional (bool) - If True, prints progress
+            mask_method             :   Optional (str) - How segmentation masks are exported
+            divider                 :   Optional (str) - String delimiter for nested column names
+            export_filters          :   Optional (dict) - Filters passed to the Labelbox project export
+            writer                  :   Optional (str or writer) - How rows are written to a new table - "load" (NDJSON load jobs), "parquet" (Parquet load jobs), "stream" (streaming inserts) or a custom writer object
+            chunk_size              :   Optional (int) - Number of flattened labels converted and written at a time, labels are released from the export as they are converted
+            column_types            :   Optional (dict) - Dictionary where {key=column_name : value=BigQuery type} for columns this call creates, other columns are STRING
+            infer_types             :   Optional (bool) - If True, columns this call creates that are not in column_types get a type inferred from the exported values - updated_at becomes TIMESTAMP, numbers become INT64 or FLOAT64
+            partition_col           :   Optional (str) - If create_table, TIMESTAMP or DATE column to partition the new table by day, such as "updated_at"
+            cluster_cols            :   Optional (list) - If create_table, up to 4 columns to cluster the new table by, such as ["label_id"]
+        Returns:
+            List of errors from writing to BigQuery - if successful, is an empty list
+        """
+        report = current_report()
         divider = self._validate_divider(divider)
-        flattened_labels_dict = export_and_flatten_labels(
-            client=self.lb_client, project=project, include_metadata=include_metadata, 
-            include_performance=include_performance, include_agreement=include_agreement,
-            include_label_details=include_label_details, mask_method=mask_method, verbose=verbose, divider=divider,
-            export_filters=export_filters
-        )
-        if len(flattened_labels_dict) == 0:
-            if verbose:
-                print("No labels were found in the project export")
-            return
-
-        #Make sure all 
-        flattened_labels_dict = [{key: str(val) for key, val in dict.items()} for dict in flattened_labels_dict]
-
-        table = pd.DataFrame.from_dict(flattened_labels_dict)
-        label_ids = table['label_id'].to_numpy()
-        labels_str = ""
-        for label_id in label_ids:
-            labels_str += "'" + label_id + "',"
-        labels_str = labels_str[:-1]
-        columns = table.columns.values.tolist()
-        table_schema = [bigquery.SchemaField(col, "STRING") for col in columns]
+        # Invalid table options fail before the export starts
+        column_types = get_column_types(column_types, partition_col if create_table else None, cluster_cols if create_table else None)
+        with report.stage("lb_export"):
+            flattened_labels = downloader.export_and_flatten_labels(
+                client=self.lb_client, project=project, include_metadata=include_metadata, 
+                include_performance=include_performance, include_agreement=include_agreement,
+                include_label_details=include_label_details, mask_method=mask_method, verbose=verbose, divider=divider,
+                export_filters=export_filters
+            )
+        label_chunks = self.__iter_label_chunks(flattened_labels, chunk_size)
+        # Column names in the order they first appear, with their types, filled in as chunks are read
+        columns = {}
         bq_table_name = bq_table_name.replace("-","_") # BigQuery tables shouldn't have "-" in them, as this causes errors when performing SQL updates
-        
+        bq_table_id = f"{self.google_project_name}.{bq_dataset_id}.{bq_table_name}"
         if create_table:
-            bq_table = self.bq_client.create_table(bigquery.Table(f"{self.google_project_name}.{bq_dataset_id}.{bq_table_name}", schema=table_schema))
-            if verbose:
-                print(f'Created BigQuery Table with ID {bq_table.table_id}')
-            labels_to_insert = flattened_labels_dict
+            errors, rows_written = self.__write_label_chunks(bq_table_id, label_chunks, columns, column_types, infer_types, partition_col, cluster_cols, writer, verbose)
         else:
-            bq_table = self.bq_client.get_table(bigquery.Table(f"{self.google_project_name}.{bq_dataset_id}.{bq_table_name}"))
-            query = """
-                SELECT updated_at, label_id
-                FROM {0}
-                WHERE label_id in ({1})
-            """
-            query = query.format(f"{self.google_project_name}.{bq_dataset_id}.{bq_table_name}", labels_str)
-            query_job = self.bq_client.query(query)
-            rows = list(query_job.result())
-            labels_to_update = []
-            labels_to_insert = []
-            for label in flattened_labels_dict:
-                label_in_table = False
-                for row in rows:
-                    if label['label_id'] == row[1]:
-                        label_in_table = True
-                        row_time = datetime.strptime(row[0], "%Y-%m-%dT%H:%M:%S.%f%z")
-                        label_time = datetime.strptime(label["updated_at"], "%Y-%m-%dT%H:%M:%S.%f%z")
-                        if label_time > row_time:
-                            labels_to_update.append(label)
-                if not label_in_table:
-                    labels_to_insert.append(label)
-            if len(labels_to_update) > 0:
-                job_config = bigquery.LoadJobConfig(
-                    schema=table_schema,
-                    write_disposition="WRITE_TRUNCATE",
-                )
-                job = self.bq_client.load_table_from_json(
-                    flattened_labels_dict, f"{self.google_project_name}.{bq_dataset_id}.{bq_table_name}", job_config=job_config
-                ) 
-                errors = job.result().errors
-                if not errors and verbose:
-                    print(f'Successfully updated table. {len(labels_to_update)} rows were updated and {len(labels_to_insert)} new rows were inserted')
-                elif verbose:
-                    print(errors)
-                return errors
-        if verbose:
-            print(f"inserting {len(labels_to_insert)} data rows to table")
-        errors = self.bq_client.insert_rows_json(bq_table, labels_to_insert)
+            errors, rows_written = self.__merge_label_chunks(bq_table_id, label_chunks, columns, column_types, infer_types, verbose)
+        if rows_written is None:
+            if verbose:
+                print("No labels were found in the project export")
+            return
         if not errors and verbose:
-            print(f'Insert job successful')
+            print(f'Successfully wrote {rows_written} rows to table {bq_table_id}')
         elif verbose:
             print(f"There are errors present:\n {errors}")
         return errors
 
+    def __iter_label_chunks(self, flattened_labels, chunk_size):
+        """ Reads flattened labels one chunk at a time, so the export is never copied whole
+        Args:
+            flattened_labels    :   Required (list or iterable) - Flattened labels from export_and_flatten_labels - a list is emptied as it is read
+            chunk_size          :   Required (int) - Number of labels per chunk
+        Returns:
+            Generator of lists of flattened label dictionaries, converted in place by __convert_label_chunk
+        """
+        report = current_report()
+        if isinstance(flattened_labels, list):
+            # Reversing once lets each label be popped off the end in constant time, so the list only holds labels not read yet
+            flattened_labels.reverse()
+            labels = (flattened_labels.pop() for _ in range(len(flattened_labels)))
+        else:
+            labels = iter(flattened_labels)
+        while True:
+            chunk = list(itertools.islice(labels, chunk_size))
+            if not chunk:
+                return
+            report.count("lb_rows_read", len(chunk))
+            yield chunk
+
+    def __convert_label_chunk(self, chunk, columns, column_types, infer_types):
+        """ Types the columns a chunk adds, then converts the chunk's values in place to match their column types
+        Args:
+            chunk           :   Required (list) - List of flattened label dictionaries, converted in place
+            columns         :   Required (dict) - Dictionary where {key=column_name : value=standard SQL type} for every column seen so far, updated in place
+            column_types    :   Required (dict) - Dictionary where {key=column_name : value=standard SQL type} for columns with a set type
+            infer_types     :   Required (bool) - If True, new columns without a set type get one inferred from the chunk's values, otherwise they are STRING
+        Returns:
+            List of column names the chunk added, in the order they first appear
+        """
+        report = current_report()
+        with report.stage("row_transform"):
+            new_columns = []
+            for label in chunk:
+                for key in label:
+                    if key not in columns:
+                        columns[key] = None
+                        new_columns.append(key)
+            inferred_types = infer_column_types(chunk, [col for col in new_columns if col not in column_types]) if infer_types else {}
+            for col in new_columns:
+                columns[col] = column_types.get(col) or inferred_types.get(col, "STRING")
+            # STRING columns keep the str() form of every exported value, typed columns get values BigQuery loads as that type
+            for label in chunk:
+                for key, value in label.items():
+                    label[key] = str(value) if columns[key] == "STRING" else convert_value(value, columns[key])
+        return new_columns
+
+    def __write_label_chunks(self, bq_table_id, label_chunks, columns, column_types, infer_types, partition_col, cluster_cols, writer, verbose):
+        """ Creates a BigQuery table from the first chunk of labels and appends every chunk to it, widening the schema when a chunk has new columns
+        Args:
+            bq_table_id     :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
+            label_chunks    :   Required (iterable) - Chunks of flattened label dictionaries from __iter_label_chunks
+            columns         :   Required (dict) - Dictionary where {key=column_name : value=standard SQL type} for every column seen so far, updated in place
+            column_types    :   Required (dict) - Dictionary where {key=column_name : value=standard SQL type} for columns with a set type
+            infer_types     :   Required (bool) - If True, columns without a set type get one inferred from their values
+            partition_col   :   Required (str) - Column to partition the table by, or None
+            cluster_cols    :   Required (list) - Columns to cluster the table by, or None
+            writer          :   Required (str or writer) - Writer name or object passed to get_writer
+            verbose         :   Required (bool) - If True, prints progress
+        Returns:
+            Tuple of (list of errors, number of rows written) - the number of rows is None if there were no labels
+        """
+        report = current_report()
+        bq_writer = get_writer(writer)
+        bq_table = None
+        errors = []
+        rows_written = 0
+        pending_write = None
+        def __write_chunk(bq_table, chunk, offset):
+            with report.stage("write"):
+                chunk_errors = bq_writer.write(self.bq_client, bq_table, chunk)
+            # Row indexes from the writer are relative to the chunk
+            return [dict(error, index=error["index"] + offset) if "index" in error else error for error in chunk_errors]
+        # Convert the next chunk while the previous one is written
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for chunk in label_chunks:
+                new_columns = self.__convert_label_chunk(chunk, columns, column_types, infer_types)
+                if bq_table is None:
+                    # Typed, partitioning and clustering columns missing from the first chunk are created up front
+                    for col in list(column_types) + list(cluster_cols or []):
+                        columns.setdefault(col, column_types.get(col, "STRING"))
+                    table_schema = [bigquery.SchemaField(col, field_type) for col, field_type in columns.items()]
+                    bq_table = self.bq_client.create_table(new_table(bq_table_id, table_schema, partition_col, cluster_cols))
+                    if verbose:
+                        print(f'Created BigQuery Table with ID {bq_table.table_id}')
+                elif new_columns:
+                    # Rows already written must not race the schema update
+                    if pending_write:
+                        errors.extend(pending_write.result())
+                        pending_write = None
+                    bq_table = self._add_table_columns(bq_table, new_columns, column_types=columns)
+                if pending_write:
+                    errors.extend(pending_write.result())
+                pending_write = executor.submit(bind_report(__write_chunk), bq_table, chunk, rows_written)
+                rows_written += len(chunk)
+            if pending_write:
+                errors.extend(pending_write.result())
+        return errors, rows_written if bq_table is not None else None
+
+    def __merge_label_chunks(self, bq_table_id, label_chunks, columns, column_types, infer_types, verbose):
+        """ Stages the new and updated labels of each chunk in one staging table, then applies them to a BigQuery table with a single MERGE on label_id
+        Args:
+            bq_table_id     :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
+            label_chunks    :   Required (iterable) - Chunks of flattened label dictionaries from __iter_label_chunks
+            columns         :   Required (dict) - Dictionary where {key=column_name : value=standard SQL type} for every column seen so far, updated in place
+            column_types    :   Required (dict) - Dictionary where {key=column_name : value=standard SQL type} for new columns with a set type
+            infer_types     :   Required (bool) - If True, new columns without a set type get one inferred from their values
+            verbose         :   Required (bool) - If True, prints progress
+        Returns:
+            Tuple of (list of errors, number of rows written) - the number of rows is None if there were no labels
+        """
+        report = current_report()
+        bq_table = self.bq_client.get_table(bigquery.Table(bq_table_id))
+        # Columns the table already has keep their type, values are converted to it
+        column_types = dict(column_types, **{schema_field.name : TYPE_ALIASES.get(schema_field.field_type, schema_field.field_type) for schema_field in bq_table.schema})
+        staging_table_id = None
+        staging_schema = []
+        labels_read = 0
+        labels_to_update = 0
+        labels_to_insert = 0
+        try:
+            for chunk in label_chunks:
+                labels_read += len(chunk)
+                self.__convert_label_chunk(chunk, columns, column_types, infer_types)
+                # Only labels missing from the table or updated since it was written are staged
+                label_id_to_updated_at = self.__get_label_updated_at(bq_table_id, [label['label_id'] for label in chunk])
+                changed_labels = []
+                with report.stage("row_transform"):
+                    for label in chunk:
+                        if label['label_id'] not in label_id_to_updated_at:
+                            labels_to_insert += 1
+                            changed_labels.append(label)
+                        elif parse_timestamp(label["updated_at"]) > label_id_to_updated_at[label['label_id']]:
+                            labels_to_update += 1
+                            changed_labels.append(label)
+                if not changed_labels:
+                    continue
+                with report.stage("write"):
+                    # Widen the table first so the MERGE can write every exported column
+                    bq_table = self._add_table_columns(bq_table, list(columns), column_types=columns)
+                    name_to_field = {schema_field.name.lower() : schema_field for schema_field in bq_table.schema}
+                    chunk_schema = [bigquery.SchemaField(col, name_to_field[col.lower()].field_type) for col in columns]
+                    if staging_table_id is None:
+                        staging_table_id = self._load_staging_table(bq_table, changed_labels, chunk_schema)
+                    else:
+                        if len(chunk_schema) > len(staging_schema):
+                            self.bq_client.update_table(bigquery.Table(staging_table_id, schema=chunk_schema), ["schema"])
+                        job_config = bigquery.LoadJobConfig(schema=chunk_schema, write_disposition="WRITE_APPEND")
+                        self.bq_client.load_table_from_json(changed_labels, staging_table_id, job_config=job_config).result()
+                    staging_schema = chunk_schema
+            if labels_read == 0:
+                return [], None
+            if staging_table_id is None:
+                if verbose:
+                    print('Table is up to date, no rows were updated or inserted')
+                return [], 0
+            with report.stage("write"):
+                # Columns first seen in chunks with nothing to stage were never added to either table
+                errors = self.__merge_labels(bq_table, staging_table_id, [schema_field.name for schema_field in staging_schema])
+            report.count("rows_written", labels_to_update + labels_to_insert)
+            if not errors and verbose:
+                print(f'Successfully updated table. {labels_to_update} rows were updated and {labels_to_insert} new rows were inserted')
+            return errors, labels_to_update + labels_to_insert
+        finally:
+            if staging_table_id is not None:
+                self.bq_client.delete_table(staging_table_id, not_found_ok=True)
+
+    def __get_label_updated_at(self, bq_table_id, label_ids, chunk_size=LABEL_LOOKUP_CHUNK_SIZE):
+        """ Looks up which labels already exist in a BigQuery table using chunked array-parameter queries
+        Args:
+            bq_table_id     :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
+            label_ids       :   Required (list) - List of label IDs to look up
+            chunk_size      :   Optional (int) - Number of label IDs sent per query
+        Returns:
+            Dictionary where {key=label_id : value=most recent updated_at in the table as a datetime}
+        """
+        label_id_to_updated_at = {}
+        query_str = f"""SELECT label_id, updated_at FROM `{bq_table_id}` WHERE label_id IN UNNEST(@label_ids)"""
+        for i in range(0, len(label_ids), chunk_size):
+            job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter("label_ids", "STRING", label_ids[i:i+chunk_size])])
+            for row in itertools.chain.from_iterable(self.__read_query_pages(self.bq_client.query(query_str, job_config=job_config))):
+                row_time = parse_timestamp(row[1]) if row[1] else datetime.min.replace(tzinfo=timezone.utc)
+                if row[0] not in label_id_to_updated_at or row_time > label_id_to_updated_at[row[0]]:
+                    label_id_to_updated_at[row[0]] = row_time
+        return label_id_to_updated_at
+
+    def __merge_labels(self, bq_table, staging_table_id, columns):
+        """ Applies new and changed labels from a staging table to a BigQuery table with a single MERGE on label_id
+        Args:
+            bq_table            :   Required (google.cloud.bigquery.table.Table) - BigQuery Table to write to, already holding every column in columns
+            staging_table_id    :   Required (str) - Staging table ID holding the flattened labels to insert or update
+            columns             :   Required (list) - List of column names in the staging table
+        Returns:
+            List of errors from the MERGE - if successful, is an empty list
+        """
+        bq_table_id = f"{bq_table.project}.{bq_table.dataset_id}.{bq_table.table_id}"
+        set_str = ", ".join([f"`{col}` = source.`{col}`" for col in columns if col != "label_id"])
+        insert_cols_str = ", ".join([f"`{col}`" for col in columns])
+        insert_values_str = ", ".join([f"source.`{col}`" for col in columns])
+        merge_str = f"""MERGE `{bq_table_id}` AS target
+            USING `{staging_table_id}` AS source
+            ON target.label_id = source.label_id
+            WHEN MATCHED THEN UPDATE SET {set_str}
+            WHEN NOT MATCHED THEN INSERT ({insert_cols_str}) VALUES ({insert_values_str})"""
+        merge_job = self.bq_client.query(merge_str)
+        merge_job.result()
+        current_report().record_query_job(merge_job)
+        return merge_job.errors or []
+
+    @instrumented
     def create_data_rows_from_table(
             self, bq_table_id:str="", lb_dataset:labelbox.schema.dataset.Dataset=None, row_data_col:str="", global_key_col:str=None, 
-            external_id_col:str=None, metadata_index:dict={}, attachment_index:dict={}, skip_duplicates:bool=False, divider:str="|||"):
+            external_id_col:str=None, metadata_index:dict={}, attachment_index:dict={}, skip_duplicates:bool=False, divider:str="|||",
+            stream:bool=False, page_size:int=STREAM_PAGE_SIZE, batches_in_flight:int=UPLOAD_BATCHES_IN_FLIGHT, watermark_col:str=None,
+            checkpoint:bool=False, shard_count:int=1, shard_index:int=0, legacy_global_key:bool=False):
         """ Creates Labelbox data rows given a BigQuery table and a Labelbox Dataset
         Args:
             bq_table_id       : Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
@@ -285,270 +945,788 @@ class Client:
             attachment_index  : Optional (dict) - Dictionary where {key=column_name : value=attachment_type} - attachment_type must be one of "IMAGE", "VIDEO", "TEXT", "HTML"
             skip_duplicates   : Optional (bool) - If True, will skip duplicate global_keys, otherwise will generate a unique global_key with a suffix "_1", "_2" and so on
             divider           : Optional (str) - String delimiter for schema name keys and suffix added to duplocate global keys
+            stream            : Optional (bool) - If True, reads the query results page by page and uploads each page before reading the next, keeping memory bounded
+            page_size         : Optional (int) - Number of table rows read and uploaded per page when stream=True
+            batches_in_flight : Optional (int) - Number of upload batches (or pages when stream=True) sent to Labelbox concurrently
+            watermark_col     : Optional (str) - Column that only grows for new rows, such as an ingestion timestamp or increasing ID - if provided, only rows above the last synced watermark for this table and dataset are read, and tables partitioned on this column only scan the newer partitions
+            checkpoint        : Optional (bool) - If True, records finished batches in the local state store so rerunning the same call after a failure skips uploaded rows and reuses the BigQuery query results
+            shard_count       : Optional (int) - Number of disjoint shards the table is split into by a BigQuery fingerprint of the global key
+            shard_index       : Optional (int) - Shard processed by this call, from 0 to shard_count - 1 - run one call per shard, on any number of processes or nodes
+            legacy_global_key : Optional (bool) - If True, uploads the row_data value as each data row's global key like versions up to 0.1.8 did, instead of the global_key_col value - keeps reruns against datasets created by those versions from adding duplicate data rows
         Returns:
             List of errors from data row upload - if successful, is an empty list
         """
-        
+        report = current_report()
         divider = self._validate_divider(divider)
+        if shard_count < 1 or not 0 <= shard_index < shard_count:
+            print(f'Error: "shard_index" must be between 0 and shard_count - 1, got shard_index {shard_index} with shard_count {shard_count}')
+            return None
         # Sync metadata index keys with metadata ontology
-        check = self._sync_metadata_fields(bq_table_id, metadata_index)
-        if not check:
-          return None
-        # Create a metadata_schema_dict where {key=metadata_field_name : value=metadata_schema_id}
-        lb_mdo = self.lb_client.get_data_row_metadata_ontology()
-        metadata_name_key_to_schema = self.__get_metadata_schema_to_name_key(lb_mdo, invert=True)
+        with report.stage("ontology_sync"):
+            check = self._sync_metadata_fields(bq_table_id, metadata_index)
+            if not check:
+              return None
+            # Create a metadata_schema_dict where {key=metadata_field_name : value=metadata_schema_id}
+            _, _, metadata_name_key_to_schema = self._get_metadata_ontology()
         # Ensure your row_data, external_id, global_key and metadata_index keys are in your BigQery table, build your query
         bq_table = self.bq_client.get_table(bq_table_id)
-        column_names = [schema_field.name for schema_field in bq_table.schema]
-        if row_data_col not in column_names:
-            print(f'Error: No column matching provided "row_data_col" column value {row_data_col}')
+        if not self.__validate_data_row_columns(bq_table, row_data_col, global_key_col, external_id_col, metadata_index, attachment_index, watermark_col):
             return None
-        else:
-            index_value = 0
-            query_lookup = {row_data_col:index_value}
-            col_query = row_data_col
-            index_value += 1
-        if global_key_col:
-            if global_key_col not in column_names:
-                 print(f'Error: No column matching provided "global_key_col" column value {global_key_col}')
-                 return None
-            else:
-                col_query += f", {global_key_col}"
-                query_lookup[global_key_col] = index_value
-                index_value += 1
-        else:
+        index_value = 0
+        query_lookup = {row_data_col:index_value}
+        col_query = row_data_col
+        index_value += 1
+        if not global_key_col:
             print(f'No global_key_col provided, will default global_key_col to {row_data_col} column')
             global_key_col = row_data_col
-            col_query += f", {global_key_col}"
-            query_lookup[global_key_col] = index_value
-            index_value += 1
+        col_query += f", {global_key_col}"
+        query_lookup[global_key_col] = index_value
+        index_value += 1
         if external_id_col:
-            if external_id_col not in column_names:
-                print(f'Error: No column matching provided "gloabl_key" column value {external_id_col}')
-                return None
-            else:
-                col_query+= f", {external_id_col}"    
-                query_lookup[external_id_col] = index_value            
-                index_value += 1    
-        if metadata_index:
-            for metadata_field_name in metadata_index:
-                mdf = metadata_field_name.replace(" ", "_")
-                if mdf not in column_names:
-                    print(f'Error: No column matching metadata_index key {metadata_field_name}')
-                    return None
-                else:
-                    col_query+=f', {mdf}'
-                    query_lookup[mdf] = index_value
-                    index_value += 1
-        if attachment_index:
-            attachment_whitelist = ["IMAGE", "VIDEO", "RAW_TEXT", "HTML", "TEXT_URL"]
-            for attachment_field_name in attachment_index:
-                atf = attachment_field_name.replace(" ", "_")
-                if attachment_index[attachment_field_name] not in attachment_whitelist:
-                    print(f'Error: Invalid value for attachment_index key {attachment_field_name} : {attachment_index[attachment_field_name]}\n must be one of {attachment_whitelist}')
-                    return None
-                if atf not in column_names:
-                    print(f'Error: No column matching attachment_index key {attachment_field_name}')
-                    return None
-                else:
-                    col_query+=f', {atf}'
-                    query_lookup[atf] = index_value
-                    index_value += 1                
+            col_query+= f", {external_id_col}"    
+            query_lookup[external_id_col] = index_value            
+            index_value += 1    
+        for metadata_field_name in metadata_index:
+            mdf = metadata_field_name.replace(" ", "_")
+            col_query+=f', {mdf}'
+            query_lookup[mdf] = index_value
+            index_value += 1
+        for attachment_field_name in attachment_index:
+            atf = attachment_field_name.replace(" ", "_")
+            col_query+=f', {atf}'
+            query_lookup[atf] = index_value
+            index_value += 1                
+        if watermark_col:
+            watermark_type = _query_parameter_type(bq_table, watermark_col)
+            col_query += f", {watermark_col}"
+            watermark_index = index_value
+            index_value += 1
         # Query your row_data, external_id, global_key and metadata_index key columns from 
         query = f"""SELECT {col_query} FROM {bq_table.project}.{bq_table.dataset_id}.{bq_table.table_id}"""
-        query_job = self.bq_client.query(query)
-        # Iterate over your query payload to construct a list of data row dictionaries in Labelbox format
-        global_key_to_upload_dict = {}
-        for row in query_job:
-            if len(row[query_lookup[row_data_col]]) <= 200:
-                global_key = row[query_lookup[row_data_col]]
-            else:
-                print("Global key too long (>200 characters). Replacing with randomly generated global key.")
-                global_key = str(uuid4())
-            data_row_upload_dict = {
-                "row_data" : row[query_lookup[row_data_col]],
-                "metadata_fields" : [{"schema_id":metadata_name_key_to_schema['lb_integration_source'],"value":"BigQuery"}],
-                "global_key" : str(global_key)
-            }
-            if external_id_col:
-                data_row_upload_dict['external_id'] = row[query_lookup[external_id_col]]
-            if metadata_index:
-                for metadata_field_name in metadata_index:
-                    mdf = metadata_field_name.replace(" ", "_")
-                    metadata_schema_id = metadata_name_key_to_schema[metadata_field_name]
-                    mdx_value = f"{metadata_field_name}///{row[query_lookup[mdf]]}"
-                    if mdx_value in metadata_name_key_to_schema.keys():
-                        metadata_value = metadata_name_key_to_schema[mdx_value]
-                    else:
-                        metadata_value = row[query_lookup[mdf]]
-                    data_row_upload_dict['metadata_fields'].append({
-                        "schema_id" : metadata_schema_id,
-                        "value" : metadata_value
-                    })
-            if attachment_index:
-                data_row_upload_dict['attachments'] = [{"type" : attachment_index[attachment_field_name], "value" : row[query_lookup[attachment_field_name]]} for attachment_field_name in attachment_index]
-            global_key_to_upload_dict[row[query_lookup[global_key_col]]] = data_row_upload_dict
-        # Batch upload your list of data row dictionaries in Labelbox format
         if type(lb_dataset) == str:
             lb_dataset = self.lb_client.get_dataset(lb_dataset)
-        upload_results = self.__batch_create_data_rows(client=self.lb_client, dataset=lb_dataset, global_key_to_upload_dict=global_key_to_upload_dict)
+        conditions = []
+        query_parameters = []
+        if shard_count > 1:
+            # Every row lands in exactly one shard - MOD before ABS, since ABS overflows on the smallest INT64 fingerprint
+            conditions.append(f"""ABS(MOD(FARM_FINGERPRINT(CAST({global_key_col} AS STRING)), @shard_count)) = @shard_index""")
+            query_parameters += [bigquery.ScalarQueryParameter("shard_count", "INT64", shard_count), bigquery.ScalarQueryParameter("shard_index", "INT64", shard_index)]
+        # Each shard keeps its own watermark, so a failed shard never loses rows below another shard's watermark
+        watermark_key = lb_dataset.uid if shard_count == 1 else f"{lb_dataset.uid}/shard-{shard_index}-of-{shard_count}"
+        if watermark_col:
+            # Only read rows newer than the last synced watermark - a filter on the partitioning column also prunes partitions
+            last_watermark = self._get_state_store().get_watermark(bq_table_id, watermark_key, watermark_col)
+            if last_watermark:
+                conditions.append(f"""{watermark_col} > @watermark""")
+                query_parameters.append(bigquery.ScalarQueryParameter("watermark", last_watermark[0], last_watermark[1]))
+            max_watermark = [last_watermark[1] if last_watermark else None]
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters) if query_parameters else None
+        run_checkpoint = None
+        if checkpoint:
+            run_checkpoint = self._get_state_store().checkpoint(
+                "create_data_rows_from_table", bq_table_id=bq_table_id, dataset_id=lb_dataset.uid, query=query, shard_count=shard_count, shard_index=shard_index,
+                watermark=last_watermark if watermark_col else None, metadata_index=metadata_index, attachment_index=attachment_index, legacy_global_key=legacy_global_key
+            )
+        with report.stage("bq_query"):
+            query_job, resumed_query = self.__get_checkpointed_query_job(query, job_config, run_checkpoint)
+        completed_keys = run_checkpoint.completed_keys() if run_checkpoint else set()
+        on_batch_uploaded = None
+        if run_checkpoint:
+            batch_indexes = itertools.count(max(run_checkpoint.completed_batches(), default=-1) + 1)
+            on_batch_uploaded = lambda batch: run_checkpoint.commit_batch(next(batch_indexes), [data_row.global_key for data_row in batch])
+        # Column positions, schema IDs and enum option tables are resolved once here instead of once per row
+        plan = DataRowPlan(
+            query_lookup, row_data_col, row_data_col if legacy_global_key else global_key_col, external_id_col=external_id_col, metadata_index=metadata_index, 
+            attachment_index=attachment_index, metadata_name_key_to_schema=metadata_name_key_to_schema
+        )
+        # One batcher for the whole call, so every page and upload thread shares its batch size and rate limit backoff
+        batcher = AdaptiveBatcher()
+        def __transform_page(page):
+            """ Converts a page of BigQuery rows into compact data rows, tracking the highest watermark seen
+            Args:
+                page                    : Required (list) : Rows from the query above
+            Returns:
+                List of labelboxbigquery.transform.CompactDataRow objects
+            """
+            if watermark_col:
+                page_watermark = max((row[watermark_index] for row in page if row[watermark_index] is not None), default=None)
+                if page_watermark is not None and (max_watermark[0] is None or page_watermark > max_watermark[0]):
+                    max_watermark[0] = page_watermark
+            return [plan.transform(row) for row in page]
+        if stream:
+            # Upload each page while the next one is read, keeping at most batches_in_flight pages in memory
+            upload_results = []
+            upload_errors = []
+            pending_pages = deque()
+            # A resumed query skips the rows of every page that finished before the failure
+            rows_done = run_checkpoint.get("rows_done", 0) if resumed_query else 0
+            def __finish_page():
+                nonlocal rows_done
+                page_future, page_row_count = pending_pages.popleft()
+                page_results, page_errors = page_future.result()
+                upload_results.extend(page_results)
+                upload_errors.extend(page_errors)
+                if run_checkpoint and not upload_errors:
+                    rows_done += page_row_count
+                    run_checkpoint.set("rows_done", rows_done)
+            with ThreadPoolExecutor(max_workers=max(1, batches_in_flight)) as executor:
+                for page in self.__read_query_pages(query_job, page_size=page_size, start_index=rows_done if rows_done else None, record_job=not resumed_query):
+                    with report.stage("row_transform"):
+                        page_uploads = __transform_page(page)
+                        global_key_to_upload_dict = {data_row.global_key : data_row for data_row in page_uploads if data_row.global_key not in completed_keys}
+                    pending_pages.append((executor.submit(
+                        bind_report(self.__batch_create_data_rows), client=self.lb_client, dataset=lb_dataset, global_key_to_upload_dict=global_key_to_upload_dict,
+                        batches_in_flight=1, on_batch_uploaded=on_batch_uploaded, batcher=batcher
+                    ), len(page_uploads)))
+                    while len(pending_pages) >= max(1, batches_in_flight) or (pending_pages and pending_pages[0][0].done()):
+                        __finish_page()
+                while pending_pages:
+                    __finish_page()
+        else:
+            # Iterate over your query payload to construct a list of data row dictionaries in Labelbox format
+            global_key_to_upload_dict = {}
+            for page in self.__read_query_pages(query_job, record_job=not resumed_query):
+                with report.stage("row_transform"):
+                    global_key_to_upload_dict.update((data_row.global_key, data_row) for data_row in __transform_page(page) if data_row.global_key not in completed_keys)
+            # Batch upload your list of data row dictionaries in Labelbox format
+            upload_results, upload_errors = self.__batch_create_data_rows(
+                client=self.lb_client, dataset=lb_dataset, global_key_to_upload_dict=global_key_to_upload_dict,
+                batches_in_flight=batches_in_flight, on_batch_uploaded=on_batch_uploaded, batcher=batcher
+            )
+        if upload_errors:
+            print(f'Data Row Creation Errors in {len(upload_errors)} upload(s)')
+            report.count("upload_errors", len(upload_errors))
+            return upload_errors
+        # Only move the watermark forward once every row up to it has been uploaded
+        if watermark_col and max_watermark[0] is not None:
+            self._get_state_store().set_watermark(bq_table_id, watermark_key, watermark_col, watermark_type, max_watermark[0])
+        if run_checkpoint:
+            run_checkpoint.finish()
+        print(f'Success')
+        return upload_results
 
+    def __validate_data_row_columns(self, bq_table, row_data_col, global_key_col=None, external_id_col=None, metadata_index={}, attachment_index={}, watermark_col=None):
+        """ Checks that every column create_data_rows_from_table reads exists in the BigQuery table and has a usable type, printing the first problem found
+        Args:
+            bq_table          : Required (google.cloud.bigquery.table.Table) - BigQuery Table to read data rows from
+            row_data_col      : Required (str) - Column name where the data row row data URL is located
+            global_key_col    : Optional (str) - Column name where the data row global key is located
+            external_id_col   : Optional (str) - Column name where the data row external ID is located
+            metadata_index    : Optional (dict) - Dictionary where {key=column_name : value=metadata_type}
+            attachment_index  : Optional (dict) - Dictionary where {key=column_name : value=attachment_type}
+            watermark_col     : Optional (str) - Column that only grows for new rows
+        Returns:
+            True if the columns are valid, False if not
+        """
+        column_names = [schema_field.name for schema_field in bq_table.schema]
+        if row_data_col not in column_names:
+            print(f'Error: No column matching provided "row_data_col" column value {row_data_col}')
+            return False
+        if global_key_col and global_key_col not in column_names:
+            print(f'Error: No column matching provided "global_key_col" column value {global_key_col}')
+            return False
+        if external_id_col and external_id_col not in column_names:
+            print(f'Error: No column matching provided "gloabl_key" column value {external_id_col}')
+            return False
+        for metadata_field_name in metadata_index:
+            if metadata_field_name.replace(" ", "_") not in column_names:
+                print(f'Error: No column matching metadata_index key {metadata_field_name}')
+                return False
+        attachment_whitelist = ["IMAGE", "VIDEO", "RAW_TEXT", "HTML", "TEXT_URL"]
+        for attachment_field_name in attachment_index:
+            if attachment_index[attachment_field_name] not in attachment_whitelist:
+                print(f'Error: Invalid value for attachment_index key {attachment_field_name} : {attachment_index[attachment_field_name]}\n must be one of {attachment_whitelist}')
+                return False
+            if attachment_field_name.replace(" ", "_") not in column_names:
+                print(f'Error: No column matching attachment_index key {attachment_field_name}')
+                return False
+        if watermark_col:
+            if watermark_col not in column_names:
+                print(f'Error: No column matching provided "watermark_col" column value {watermark_col}')
+                return False
+            watermark_type = _query_parameter_type(bq_table, watermark_col)
+            if watermark_type not in WATERMARK_DECODERS:
+                print(f'Error: "watermark_col" column {watermark_col} has type {watermark_type}, must be one of {list(WATERMARK_DECODERS.keys())}')
+                return False
+        return True
 
-        print(f'Success')
+    @instrumented
+    def create_data_rows_from_table_sharded(self, shard_count:int, lb_dataset, max_workers:int=None, **kwargs):
+        """ Runs create_data_rows_from_table once per shard of the table, each shard in its own worker process, and merges the results
+        Args:
+            shard_count       : Required (int) - Number of disjoint shards to split the table into
+            lb_dataset        : Required (labelbox.schema.dataset.Dataset or str) - Labelbox dataset, or dataset ID, to add data rows to
+            max_workers       : Optional (int) - Number of worker processes - defaults to shard_count
+            kwargs            : Required - Every other create_data_rows_from_table argument, such as bq_table_id and row_data_col
+        Returns:
+            List of errors from data row upload across all shards if any shard failed, otherwise the upload results of every shard - None if the arguments are invalid, in which case no shard is started
+            - a shard that fails adds an error naming its shard_index, the other shards still finish and their data rows stay created
+        """
+        report = current_report()
+        # Arguments are checked once here, so an invalid call fails before any shard uploads data rows
+        self._validate_divider(kwargs.get("divider", "|||"))
+        if shard_count < 1:
+            print(f'Error: "shard_count" must be at least 1, got {shard_count}')
+            return None
+        if lb_dataset is None:
+            print('Error: "lb_dataset" must be a Labelbox dataset or dataset ID')
+            return None
+        # Create missing metadata schemas once, so shards do not race to create the same schema
+        with report.stage("ontology_sync"):
+            if not self._sync_metadata_fields(kwargs.get("bq_table_id", ""), kwargs.get("metadata_index", {})):
+                return None
+        bq_table = self.bq_client.get_table(kwargs.get("bq_table_id", ""))
+        if not self.__validate_data_row_columns(
+                bq_table, kwargs.get("row_data_col", ""), kwargs.get("global_key_col"), kwargs.get("external_id_col"),
+                kwargs.get("metadata_index", {}), kwargs.get("attachment_index", {}), kwargs.get("watermark_col")):
+            return None
+        kwargs["lb_dataset"] = lb_dataset if type(lb_dataset) == str else lb_dataset.uid
+        upload_results = []
+        upload_errors = []
+        failed_shards = 0
+        with process_pool.ProcessPoolExecutor(max_workers=max(1, max_workers or shard_count)) as executor:
+            futures = [executor.submit(_run_shard, self._init_kwargs, "create_data_rows_from_table", dict(kwargs, shard_count=shard_count, shard_index=shard_index)) for shard_index in range(shard_count)]
+            # Every shard is collected, a failed shard does not discard the data rows the others created
+            for shard_index, future in enumerate(futures):
+                try:
+                    shard_result, shard_report = future.result()
+                except Exception as e:
+                    failed_shards += 1
+                    upload_errors.append({"message" : str(e), "shard_index" : shard_index})
+                    continue
+                report.merge(shard_report, shard=shard_index)
+                if shard_result is None:
+                    failed_shards += 1
+                    upload_errors.append({"message" : "Shard stopped before uploading, see its printed error", "shard_index" : shard_index})
+                elif shard_report["counters"].get("upload_errors"):
+                    upload_errors.extend(shard_result)
+                else:
+                    upload_results.extend(shard_result)
+        if upload_errors:
+            print(f'Data Row Creation Errors in {len(upload_errors)} upload(s) across {shard_count} shards - {failed_shards} shard(s) failed, {len(upload_results)} data rows were created')
+            return upload_errors
+        print(f'Success - {shard_count} shards')
         return upload_results
 
-    def create_table_from_dataset(self, bq_dataset_id, bq_table_name, lb_dataset, metadata_index={}):
+    @instrumented
+    def create_table_from_dataset(
+            self, bq_dataset_id, bq_table_name, lb_dataset, metadata_index={}, writer="load", chunk_size:int=EXPORT_CHUNK_ROWS,
+            column_types:dict=None, infer_types:bool=False, partition_col:str=None, cluster_cols:list=None):
         """ Creates a BigQuery Table from a Labelbox dataset given a BigQuery Dataset ID, desired Table name, and optional metadata_index
         Args:
             bq_dataset_id   :   Required (str) - BigQuery Dataset ID structured in the following format: "google_project_name.dataset_name"
             bq_table_name   :   Required (str) - Desired BigQuery Table name
             lb_dataset      :   Required (labelbox.schema.dataset.Dataset) - Labelbox dataset to add data rows to
             metadata_index  :   Optional (dict) - Dictionary where {key=column_name : value=metadata_type} - metadata_type must be one of "enum", "string", "datetime" or "number"        
+            writer          :   Optional (str or writer) - How rows are written - "load" (NDJSON load jobs), "parquet" (Parquet load jobs), "stream" (streaming inserts) or a custom writer object
+            chunk_size      :   Optional (int) - Number of exported data rows written at a time, memory use stays flat at about one chunk being built and one being written
+            column_types    :   Optional (dict) - Dictionary where {key=column_name : value=BigQuery type} - other columns are STRING
+            infer_types     :   Optional (bool) - If True, metadata columns not in column_types are typed after their metadata_index type - "number" becomes FLOAT64 and "datetime" becomes TIMESTAMP
+            partition_col   :   Optional (str) - TIMESTAMP or DATE column to partition the table by day, such as a datetime metadata column
+            cluster_cols    :   Optional (list) - Up to 4 columns to cluster the table by, such as ["global_key"]
         Returns:
             If any, a list of errors from attempting to create BigQuery table rows from Labelbox data rows
         """
-        lb_mdo = self.lb_client.get_data_row_metadata_ontology()
+        report = current_report()
+        if infer_types:
+            metadata_to_column_type = {"number" : "FLOAT64", "datetime" : "TIMESTAMP"}
+            inferred_types = {metadata_field_name.replace(" ", "_") : metadata_to_column_type.get(metadata_type, "STRING") for metadata_field_name, metadata_type in metadata_index.items()}
+            column_types = dict(inferred_types, **(column_types or {}))
+        column_types = get_column_types(column_types, partition_col, cluster_cols)
+        typed_columns = {col : field_type for col, field_type in column_types.items() if field_type != "STRING"}
         # Create dictionary where {key = metadata_field_name : value = metadata_schema_id}
-        metadata_schema_to_name_key = self.__get_metadata_schema_to_name_key(lb_mdo, invert=False)
-        # Construct your BigQuery Table Schema with data_row_id and row_data columns
+        with report.stage("ontology_sync"):
+            _, metadata_schema_to_name_key, _ = self._get_metadata_ontology()
+        # Construct your BigQuery Table Schema with data_row_id and row_data columns, external_id and global_key columns are added once a data row has them
         table_schema = [bigquery.SchemaField("data_row_id", "STRING", mode="REQUIRED"), bigquery.SchemaField("row_data", "STRING", mode="REQUIRED")]
-        # If data rows have external IDs, add an external_id column
-        data_row_export = list(lb_dataset.export_data_rows(include_metadata=True))
-        if data_row_export[0].external_id:
-            table_schema.append(bigquery.SchemaField("external_id", "STRING"))
-        # If data rows have global_key IDs, add an global_key column            
-        if data_row_export[0].global_key:
-            table_schema.append(bigquery.SchemaField("global_key", "STRING"))
         if metadata_index:
             # For each key in the metadata_index, make a column
             for metadata_field_name in metadata_index.keys():
                 mdf = metadata_field_name.replace(" ", "_")
-                table_schema.append(bigquery.SchemaField(mdf, "STRING"))
+                table_schema.append(bigquery.SchemaField(mdf, column_types.get(mdf, "STRING")))
+        # Partitioning and clustering columns have to exist when the table is created
+        for column_name in ["external_id", "global_key"]:
+            if column_name in column_types or column_name in (cluster_cols or []):
+                table_schema.append(bigquery.SchemaField(column_name, column_types.get(column_name, "STRING")))
         # Make your BigQuery table
         bq_table_name = bq_table_name.replace("-","_") # BigQuery tables shouldn't have "-" in them, as this causes errors when performing SQL updates
-        bq_table = self.bq_client.create_table(bigquery.Table(f"{bq_dataset_id}.{bq_table_name}", schema=table_schema))
-        # Add your data rows as table rows
-        rows_to_insert = []
-        for lb_data_row in data_row_export:
-            row_dict = {"data_row_id" : lb_data_row.uid, "row_data" : lb_data_row.row_data}
-            if lb_data_row.external_id:
-                row_dict['external_id'] = lb_data_row.external_id
-            if lb_data_row.global_key:
-                row_dict['global_key'] = lb_data_row.global_key
-            if metadata_index:
-                field_to_value = {}
-                if lb_data_row.metadata_fields:
-                    for data_row_metadata in lb_data_row.metadata_fields:
-                        if data_row_metadata['value'] in metadata_schema_to_name_key.keys():
-                            field_to_value[data_row_metadata['name']] = metadata_schema_to_name_key[data_row_metadata['value']].split("///")[1]
-                        else:
-                            field_to_value[data_row_metadata['name']] = data_row_metadata['value']
-                for metadata_field_name in metadata_index:
-                    mdf = metadata_field_name.replace(" ", "_")
-                    if metadata_field_name in field_to_value.keys():
-                        row_dict[mdf] = field_to_value[metadata_field_name]
-            rows_to_insert.append(row_dict)
-        print(len(rows_to_insert))
-        errors = self.bq_client.insert_rows_json(bq_table, rows_to_insert)
+        bq_table = self.bq_client.create_table(new_table(f"{bq_dataset_id}.{bq_table_name}", table_schema, partition_col, cluster_cols))
+        bq_writer = get_writer(writer)
+        data_row_export = lb_dataset.export_data_rows(include_metadata=True)
+        errors = []
+        pending_write = None
+        def __write_chunk(bq_table, chunk):
+            with report.stage("write"):
+                return bq_writer.write(self.bq_client, bq_table, chunk)
+        # Build the next chunk from the export while the previous one is written
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while True:
+                with report.stage("lb_export"):
+                    chunk = [self.__get_table_row(lb_data_row, metadata_schema_to_name_key, metadata_index) for lb_data_row in itertools.islice(data_row_export, chunk_size)]
+                    if typed_columns:
+                        for row_dict in chunk:
+                            for column_name, field_type in typed_columns.items():
+                                if column_name in row_dict:
+                                    row_dict[column_name] = convert_value(row_dict[column_name], field_type)
+                if not chunk:
+                    break
+                report.count("lb_rows_read", len(chunk))
+                column_names = {schema_field.name for schema_field in bq_table.schema}
+                new_columns = [column_name for column_name in ["external_id", "global_key"] if column_name not in column_names and any(column_name in row_dict for row_dict in chunk)]
+                if new_columns:
+                    # Rows already written must not race the schema update
+                    if pending_write:
+                        errors.extend(pending_write.result())
+                        pending_write = None
+                    bq_table = self._add_table_columns(bq_table, new_columns, column_types=column_types)
+                if pending_write:
+                    errors.extend(pending_write.result())
+                pending_write = executor.submit(bind_report(__write_chunk), bq_table, chunk)
+            if pending_write:
+                errors.extend(pending_write.result())
         if not errors:
             print(f'Success\nCreated BigQuery Table with ID {bq_table.table_id}')
         else:
             print(errors)
         return errors
 
-    def upsert_table_metadata(self, bq_table_id, lb_dataset, global_key_col, metadata_index={}):
+    def __get_table_row(self, lb_data_row, metadata_schema_to_name_key, metadata_index):
+        """ Converts an exported Labelbox data row into a BigQuery table row
+        Args:
+            lb_data_row                 :   Required (labelbox.schema.data_row.DataRow) - Data row exported with metadata
+            metadata_schema_to_name_key :   Required (dict) - Dictionary where {key=metadata_schema_id: value=metadata_name_key}
+            metadata_index              :   Required (dict) - Dictionary where {key=column_name : value=metadata_type}
+        Returns:
+            Dictionary where {key=column_name : value=column_value}
+        """
+        row_dict = {"data_row_id" : lb_data_row.uid, "row_data" : lb_data_row.row_data}
+        if lb_data_row.external_id:
+            row_dict['external_id'] = lb_data_row.external_id
+        if lb_data_row.global_key:
+            row_dict['global_key'] = lb_data_row.global_key
+        if metadata_index:
+            field_to_value = {}
+            if lb_data_row.metadata_fields:
+                for data_row_metadata in lb_data_row.metadata_fields:
+                    if data_row_metadata['value'] in metadata_schema_to_name_key.keys():
+                        field_to_value[data_row_metadata['name']] = metadata_schema_to_name_key[data_row_metadata['value']].split("///")[1]
+                    else:
+                        field_to_value[data_row_metadata['name']] = data_row_metadata['value']
+            for metadata_field_name in metadata_index:
+                mdf = metadata_field_name.replace(" ", "_")
+                if metadata_field_name in field_to_value.keys():
+                    row_dict[mdf] = field_to_value[metadata_field_name]
+        return row_dict
+
+    @instrumented
+    def upsert_table_metadata(self, bq_table_id, lb_dataset, global_key_col, metadata_index={}, use_merge:bool=True, checkpoint:bool=False, use_fingerprints:bool=False):
         """ Upserts a BigQuery Table based on the most recent metadata in Labelbox, only updates columns provided via a metadata_index keys
         Args:
             bq_table_id     :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
             lb_dataset      :   Required (labelbox.schema.dataset.Dataset) - Labelbox dataset to add data rows to
             global_key_col  :   Required (str) - Global key column name to map Labelbox data rows to the BigQuery table rows
             metadata_index  :   Optional (dict) - Dictionary where {key=column_name : value=metadata_type} - metadata_type must be one of "enum", "string", "datetime" or "number"        
+            use_merge       :   Optional (bool) - If True, loads all metadata into a staging table and applies it with a single MERGE - if False, falls back to one UPDATE per data row
+            checkpoint      :   Optional (bool) - If True, records progress in the local state store so rerunning the same call after a failure reuses the loaded staging table or skips updated rows
+            use_fingerprints:   Optional (bool) - If True, only writes data rows whose Labelbox metadata or table values changed since the last fingerprinted sync of these columns - table values are fingerprinted in BigQuery
         Returns:
-            Updated BigQuery table
+            Dictionary where {"rows_staged" : number of data rows with metadata to write, "rows_matched" : number of table rows matching a global key, "rows_updated" : number of table rows changed, "rows_skipped" : number of data rows left out by fingerprint}
         """
+        report = current_report()
         # Sync metadata index keys with metadata ontology
-        check = self._sync_metadata_fields(bq_table_id, metadata_index)
-        if not check:
-          return None        
+        with report.stage("ontology_sync"):
+            check = self._sync_metadata_fields(bq_table_id, metadata_index)
+            if not check:
+              return None        
+            _, metadata_schema_to_name_key, _ = self._get_metadata_ontology()
         bq_table = self.bq_client.get_table(bq_table_id)
         data_rows = lb_dataset.export_data_rows(include_metadata=True)
-        metadata_schema_to_name_key = self.__get_metadata_schema_to_name_key(self.lb_client.get_data_row_metadata_ontology(), invert=False)
-        # If a new metadata column needs to be made, make it
-        if metadata_index:
-            column_names = [schema_field.name.lower() for schema_field in bq_table.schema]
-            for metadata_field_name in metadata_index.keys():
-                mdf = metadata_field_name.lower().replace(" ", "_")
-                if mdf not in column_names:
-                    new_schema = bq_table.schema[:]
-                    new_schema.append(bigquery.SchemaField(mdf, "STRING"))
-                    bq_table.schema = new_schema
-                    bq_table = self.bq_client.update_table(bq_table, ["schema"])
-        # Make one SQL update per data row
+        # If new metadata columns need to be made, make them
+        bq_table = self._add_table_columns(bq_table, [metadata_field_name.lower().replace(" ", "_") for metadata_field_name in metadata_index.keys()])
+        run_checkpoint = None
+        if checkpoint:
+            run_checkpoint = self._get_state_store().checkpoint(
+                "upsert_table_metadata", bq_table_id=bq_table_id, dataset_id=lb_dataset.uid, global_key_col=global_key_col, metadata_index=metadata_index, use_merge=use_merge
+            )
+        # A staging table loaded by an interrupted run already holds the export, so the export is skipped
+        staging_table_id = run_checkpoint.get("staging_table_id") if run_checkpoint and use_merge else None
+        if staging_table_id and self._table_exists(staging_table_id):
+            table_updates = None
+        else:
+            # The export is lazy, so this stage covers both reading data rows from Labelbox and converting them
+            with report.stage("lb_export"):
+                table_updates = self.__get_table_metadata_updates(data_rows, metadata_schema_to_name_key, metadata_index)
+        rows_skipped = 0
+        fingerprint_set = None
+        if use_fingerprints and table_updates:
+            fingerprint_set = self._get_state_store().fingerprints(
+                "upsert_table_metadata", bq_table_id=bq_table_id, dataset_id=lb_dataset.uid, global_key_col=global_key_col, metadata_index=metadata_index
+            )
+            fingerprint_cols = sorted({mdf for column_to_value in table_updates.values() for mdf in column_to_value})
+            table_updates, rows_skipped = self.__get_changed_table_updates(bq_table, global_key_col, fingerprint_cols, table_updates, fingerprint_set)
+            report.count("rows_skipped", rows_skipped)
+        with report.stage("write"):
+            if use_merge:
+                summary = self.__merge_table_metadata(bq_table, global_key_col, table_updates, run_checkpoint)
+            else:
+                summary = self.__update_table_metadata(bq_table_id, global_key_col, table_updates, run_checkpoint)
+        summary["rows_skipped"] = rows_skipped
+        if fingerprint_set and table_updates:
+            # Fingerprint what the table holds now, a row missing from the table gets no fingerprint and is written again next time
+            self.__record_table_fingerprints(bq_table, global_key_col, fingerprint_cols, table_updates, fingerprint_set)
+        report.count("rows_written", summary["rows_updated"])
+        if run_checkpoint:
+            run_checkpoint.finish()
+        print(f'Success - {summary["rows_matched"]} rows matched, {summary["rows_updated"]} rows updated')
+        return summary
+
+    def __get_changed_table_updates(self, bq_table, global_key_col, fingerprint_cols, table_updates, fingerprint_set):
+        """ Drops the updates of data rows whose Labelbox values and table values both match the fingerprints recorded by the last sync
+        Args:
+            bq_table            :   Required (google.cloud.bigquery.table.Table) - BigQuery Table to update
+            global_key_col      :   Required (str) - Global key column name
+            fingerprint_cols    :   Required (list) - Metadata column names the fingerprints cover
+            table_updates       :   Required (dict) - Dictionary where {key=global_key : value={key=column_name : value=metadata_value}}
+            fingerprint_set     :   Required (labelboxbigquery.state.FingerprintSet) - Fingerprints recorded by the last sync
+        Returns:
+            Tuple of (table_updates with only the changed data rows, number of data rows left out)
+        """
+        synced_fingerprints = fingerprint_set.get_all()
+        if not synced_fingerprints:
+            return table_updates, 0
+        # A row is skipped only if neither side changed - edits made directly to the table are overwritten like on a full sync
+        table_fingerprints = {str(global_key) : fingerprint for global_key, fingerprint in self.__read_table_metadata(bq_table, global_key_col, fingerprint_cols, fingerprint=True)}
+        changed_updates = {}
+        for global_key, column_to_value in table_updates.items():
+            if synced_fingerprints.get(str(global_key)) != f"{fingerprint_values(column_to_value)}:{table_fingerprints.get(str(global_key))}":
+                changed_updates[global_key] = column_to_value
+        return changed_updates, len(table_updates) - len(changed_updates)
+
+    def __record_table_fingerprints(self, bq_table, global_key_col, fingerprint_cols, table_updates, fingerprint_set):
+        """ Records the Labelbox and table fingerprints of data rows just written to the table
+        Args:
+            bq_table            :   Required (google.cloud.bigquery.table.Table) - BigQuery Table that was updated
+            global_key_col      :   Required (str) - Global key column name
+            fingerprint_cols    :   Required (list) - Metadata column names the fingerprints cover
+            table_updates       :   Required (dict) - Dictionary where {key=global_key : value={key=column_name : value=metadata_value}} that was written
+            fingerprint_set     :   Required (labelboxbigquery.state.FingerprintSet) - Fingerprints to update
+        """
+        key_to_values = {str(global_key) : column_to_value for global_key, column_to_value in table_updates.items()}
+        # A lookup by key is cheaper while few of the table's rows were written
+        lookup_keys = list(key_to_values.keys()) if len(key_to_values) <= (bq_table.num_rows or 0) * FINGERPRINT_LOOKUP_SHARE else None
+        key_to_fingerprint = {}
+        for global_key, table_fingerprint in self.__read_table_metadata(bq_table, global_key_col, fingerprint_cols, lookup_keys, fingerprint=True):
+            if str(global_key) in key_to_values:
+                key_to_fingerprint[str(global_key)] = f"{fingerprint_values(key_to_values[str(global_key)])}:{table_fingerprint}"
+        fingerprint_set.update(key_to_fingerprint)
+
+    def __get_table_metadata_updates(self, data_rows, metadata_schema_to_name_key, metadata_index):
+        """ Converts exported Labelbox data rows into the BigQuery column values to write for each global key
+        Args:
+            data_rows                   :   Required (iterable) - Labelbox data rows exported with metadata
+            metadata_schema_to_name_key :   Required (dict) - Dictionary where {key=metadata_schema_id: value=metadata_name_key}
+            metadata_index              :   Required (dict) - Dictionary where {key=column_name : value=metadata_type}
+        Returns:
+            Dictionary where {key=global_key : value={key=column_name : value=metadata_value}}, data rows without any metadata_index values are left out
+        """
+        table_updates = {}
+        if not metadata_index:
+            return table_updates
         for data_row in data_rows:
-            query = False
-            query_str = f"UPDATE {bq_table_id}\nSET"
+            current_report().count("lb_rows_read")
             field_to_value = {}
             if data_row.metadata_fields:
                 for drm in data_row.metadata_fields:
                     mdf = drm['name'].lower().replace(" ", "_")
                     field_to_value[mdf] = metadata_schema_to_name_key[drm['value']].split("///")[1] if drm['value'] in metadata_schema_to_name_key.keys() else drm['value']
-            if metadata_index:
-                for metadata_field_name in metadata_index.keys():
-                    mdf = metadata_field_name.lower().replace(" ", "_")
-                    if mdf in field_to_value.keys():
-                        query = True
-                        query_str += f'\n   {mdf} = "{field_to_value[mdf]}",'     
-            query_str = query_str[:-1]                
-            if query:
-                query_str += f'\nWHERE {global_key_col} = "{data_row.global_key}";'
-                query_job = self.bq_client.query(query_str)
-                query_job.result()
-        print(f'Success')
+            column_to_value = {}
+            for metadata_field_name in metadata_index.keys():
+                mdf = metadata_field_name.lower().replace(" ", "_")
+                if mdf in field_to_value.keys():
+                    column_to_value[mdf] = str(field_to_value[mdf])
+            if column_to_value:
+                table_updates[data_row.global_key] = column_to_value
+        return table_updates
 
-    def upsert_labelbox_metadata(self, bq_table_id, global_key_col, global_keys_list=[], metadata_index={}):
-        """ Updates Labelbox data row metadata based on the most recent metadata from a Databricks spark table, only updates metadata fields provided via a metadata_index keys
+    def __update_table_metadata(self, bq_table_id, global_key_col, table_updates, run_checkpoint=None):
+        """ Fallback path that runs one SQL UPDATE per data row
+        Args:
+            bq_table_id     :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
+            global_key_col  :   Required (str) - Global key column name to map Labelbox data rows to the BigQuery table rows
+            table_updates   :   Required (dict) - Dictionary where {key=global_key : value={key=column_name : value=metadata_value}}
+            run_checkpoint  :   Optional (labelboxbigquery.state.Checkpoint) - Checkpoint that records each updated global key
+        Returns:
+            Dictionary where {"rows_staged" : number of data rows with metadata to write, "rows_matched" : number of table rows matching a global key, "rows_updated" : number of table rows changed}
+        """
+        rows_matched = 0
+        completed_keys = run_checkpoint.completed_keys() if run_checkpoint else set()
+        for batch_index, (global_key, column_to_value) in enumerate(table_updates.items()):
+            if str(global_key) in completed_keys:
+                continue
+            query_str = f"UPDATE {bq_table_id}\nSET"
+            for mdf, value in column_to_value.items():
+                query_str += f'\n   {mdf} = "{value}",'
+            query_str = query_str[:-1]
+            query_str += f'\nWHERE {global_key_col} = "{global_key}";'
+            query_job = self.bq_client.query(query_str)
+            query_job.result()
+            current_report().record_query_job(query_job)
+            rows_matched += query_job.num_dml_affected_rows or 0
+            if run_checkpoint:
+                run_checkpoint.commit_batch(batch_index, [global_key])
+        return {"rows_staged" : len(table_updates), "rows_matched" : rows_matched, "rows_updated" : rows_matched}
+
+    def __merge_table_metadata(self, bq_table, global_key_col, table_updates, run_checkpoint=None):
+        """ Writes all metadata updates to a staging table with one load job and applies them with a single MERGE on global_key_col
+        Args:
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table to update
+            global_key_col  :   Required (str) - Global key column name to map Labelbox data rows to the BigQuery table rows
+            table_updates   :   Required (dict or None) - Dictionary where {key=global_key : value={key=column_name : value=metadata_value}} - None reuses the checkpoint's staging table
+            run_checkpoint  :   Optional (labelboxbigquery.state.Checkpoint) - Checkpoint that keeps the staging table until the MERGE succeeds
+        Returns:
+            Dictionary where {"rows_staged" : number of data rows with metadata to write, "rows_matched" : number of table rows matching a global key, "rows_updated" : number of table rows changed}
+        """
+        if table_updates is None:
+            staging_table = self.bq_client.get_table(run_checkpoint.get("staging_table_id"))
+            staging_table_id = f"{staging_table.project}.{staging_table.dataset_id}.{staging_table.table_id}"
+            update_cols = [schema_field.name for schema_field in staging_table.schema if schema_field.name.lower() != global_key_col.lower()]
+            summary = {"rows_staged" : staging_table.num_rows, "rows_matched" : 0, "rows_updated" : 0}
+        else:
+            summary = {"rows_staged" : len(table_updates), "rows_matched" : 0, "rows_updated" : 0}
+            if not table_updates:
+                return summary
+            # Staging columns take the type of the matching table column so the MERGE needs no casts
+            name_to_field = {schema_field.name.lower() : schema_field for schema_field in bq_table.schema}
+            update_cols = sorted({mdf for column_to_value in table_updates.values() for mdf in column_to_value})
+            staging_schema = [bigquery.SchemaField(global_key_col, name_to_field[global_key_col.lower()].field_type)]
+            staging_schema += [bigquery.SchemaField(mdf, name_to_field[mdf].field_type) for mdf in update_cols]
+            staging_rows = [dict(column_to_value, **{global_key_col : global_key}) for global_key, column_to_value in table_updates.items()]
+            staging_table_id = self._load_staging_table(bq_table, staging_rows, staging_schema)
+            if run_checkpoint:
+                run_checkpoint.set("staging_table_id", staging_table_id)
+        bq_table_id = f"{bq_table.project}.{bq_table.dataset_id}.{bq_table.table_id}"
+        merged = False
+        try:
+            # Only touch rows where at least one provided value differs, a NULL in staging keeps the current value
+            changed_str = " OR ".join([f"(source.`{mdf}` IS NOT NULL AND target.`{mdf}` IS DISTINCT FROM source.`{mdf}`)" for mdf in update_cols])
+            set_str = ", ".join([f"`{mdf}` = COALESCE(source.`{mdf}`, target.`{mdf}`)" for mdf in update_cols])
+            merge_str = f"""MERGE `{bq_table_id}` AS target
+                USING `{staging_table_id}` AS source
+                ON target.`{global_key_col}` = source.`{global_key_col}`
+                WHEN MATCHED AND ({changed_str}) THEN UPDATE SET {set_str}"""
+            merge_job = self.bq_client.query(merge_str)
+            merge_job.result()
+            current_report().record_query_job(merge_job)
+            merged = True
+            summary["rows_updated"] = merge_job.num_dml_affected_rows or 0
+            count_str = f"""SELECT COUNT(*) FROM `{bq_table_id}` AS target
+                JOIN `{staging_table_id}` AS source ON target.`{global_key_col}` = source.`{global_key_col}`"""
+            count_job = self.bq_client.query(count_str)
+            summary["rows_matched"] = list(count_job.result())[0][0]
+            current_report().record_query_job(count_job)
+        finally:
+            # A checkpointed run keeps its staging table until the MERGE succeeds, so a rerun can skip the export
+            if merged or not run_checkpoint:
+                self.bq_client.delete_table(staging_table_id, not_found_ok=True)
+        return summary
+
+    def __read_table_metadata(self, bq_table, global_key_col, metadata_fields, global_keys=None, chunk_size=LABEL_LOOKUP_CHUNK_SIZE, page_size=STREAM_PAGE_SIZE, fingerprint=False):
+        """ Streams global keys and metadata column values from a BigQuery table, pushing any global key filter into the query
+        Args:
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table to read from
+            global_key_col  :   Required (str) - Global key column name
+            metadata_fields :   Required (list) - List of metadata column names to read
+            global_keys     :   Optional (list) - List of global keys to read - reads the whole table if not provided
+            chunk_size      :   Optional (int) - Number of global keys sent per query as an array parameter
+            page_size       :   Optional (int) - Number of rows fetched per results page
+            fingerprint     :   Optional (bool) - If True, BigQuery fingerprints the metadata columns and only the fingerprint is returned for each row
+        Returns:
+            Generator of (global_key, tuple of metadata values in metadata_fields order) tuples, or of (global_key, fingerprint string) tuples if fingerprint is True
+        """
+        bq_table_id = f"{bq_table.project}.{bq_table.dataset_id}.{bq_table.table_id}"
+        if fingerprint:
+            # The fingerprint is computed in the warehouse, so only two narrow columns leave BigQuery however wide the metadata is
+            struct_query = ", ".join([f"`{col}`" for col in metadata_fields])
+            col_query = f"`{global_key_col}`, FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({struct_query}))) AS fingerprint"
+        else:
+            col_query = ", ".join([f"`{col}`" for col in [global_key_col] + metadata_fields])
+        if not global_keys:
+            queries = [(f"""SELECT {col_query} FROM `{bq_table_id}`""", None)]
+        else:
+            # Array parameters need the global key column's own type, so a key filter on an INT64 column still prunes
+            key_type = _query_parameter_type(bq_table, global_key_col)
+            query_str = f"""SELECT {col_query} FROM `{bq_table_id}` WHERE `{global_key_col}` IN UNNEST(@global_keys)"""
+            queries = [
+                (query_str, bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter("global_keys", key_type, global_keys[i:i+chunk_size])]))
+                for i in range(0, len(global_keys), chunk_size)
+            ]
+        for query_str, job_config in queries:
+            for page in self.__read_query_pages(self.bq_client.query(query_str, job_config=job_config), page_size=page_size):
+                for row in page:
+                    yield (row[0], str(row[1])) if fingerprint else (row[0], tuple(row[1:]))
+
+    @instrumented
+    def upsert_labelbox_metadata(self, bq_table_id, global_key_col, global_keys_list=[], metadata_index={}, chunk_size=METADATA_CHUNK_SIZE, max_workers=METADATA_WORKERS, use_fingerprints:bool=False):
+        """ Updates Labelbox data row metadata based on the most recent metadata from a BigQuery table, only updates metadata fields provided via a metadata_index keys
         Args:
             bq_table_id         :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
             global_key_col      :   Required (str) - Global key column name to map Labelbox data rows to the BigQuery table rows
             global_keys_list    :   Optional (list) - List of global keys you wish to upsert - defaults to the whole table
             metadata_index      :   Optional (dict) - Dictionary where {key=column_name : value=metadata_type} - metadata_type must be one of "enum", "string", "datetime" or "number"        
+            chunk_size          :   Optional (int) - Number of data rows exported, compared and upserted together
+            max_workers         :   Optional (int) - Number of chunks processed concurrently
+            use_fingerprints    :   Optional (bool) - If True, BigQuery fingerprints each row's metadata columns and only rows whose fingerprint changed since the last fingerprinted sync of these columns are read and pushed - changes made in Labelbox since then are not detected
         Returns:
-            List of errors from metadata ontology bulk upsert - if successful, is an empty list
+            Dictionary where {"unchanged" / "updated" / "failed" / "not_found" : number of data rows, "errors" : list of errors from metadata ontology bulk upserts} - rows skipped by fingerprint count as unchanged
         """
+        report = current_report()
         # Sync metadata index keys with metadata ontology
-        check = self._sync_metadata_fields(bq_table_id, metadata_index)
-        if not check:
-          return None        
-        lb_mdo = self.lb_client.get_data_row_metadata_ontology()
+        with report.stage("ontology_sync"):
+            check = self._sync_metadata_fields(bq_table_id, metadata_index)
+            if not check:
+              return None        
         bq_table = self.bq_client.get_table(bq_table_id)
-        metadata_schema_to_name_key = self.__get_metadata_schema_to_name_key(lb_mdo, invert=False)
-        metadata_name_key_to_schema = self.__get_metadata_schema_to_name_key(lb_mdo, invert=True)        
-        # Create a query to pull global key and metadata from BigQuery
-        col_query = f"""{global_key_col}, """
-        for metadata_field in list(metadata_index.keys()):
-            col_query += metadata_field
-        query_str = f"""SELECT {col_query} FROM {bq_table_id}"""            
-        query_job = self.bq_client.query(query_str)
-        query_job.result()          
-        query_dict = {x[global_key_col] : x for x in query_job}
-        # Either use global_keys provided or all the global keys in the provided global_key_col
-        global_keys = global_keys_list if global_keys_list else list(query_dict.keys())
-        # Grab data row IDs with global_key list
-        data_row_ids = self.lb_client.get_data_row_ids_for_global_keys(global_keys)['results']
-        drid_to_global_key = {data_row_ids[i]: global_keys[i] for i in range(len(global_keys))}
+        metadata_fields = list(metadata_index.keys())
+        summary = {"unchanged" : 0, "updated" : 0, "failed" : 0, "not_found" : 0, "errors" : []}
+        fingerprint_set = None
+        read_keys = global_keys_list
+        if use_fingerprints:
+            # Compare in-warehouse fingerprints with the ones recorded by the last sync, only changed rows are read in full
+            fingerprint_set = self._get_state_store().fingerprints("upsert_labelbox_metadata", bq_table_id=bq_table_id, global_key_col=global_key_col, metadata_fields=metadata_fields)
+            synced_fingerprints = fingerprint_set.get_all()
+            key_to_fingerprint = {}
+            rows_fingerprinted = 0
+            for global_key, fingerprint in self.__read_table_metadata(bq_table, global_key_col, metadata_fields, global_keys_list, fingerprint=True):
+                rows_fingerprinted += 1
+                if synced_fingerprints.get(str(global_key)) != fingerprint:
+                    key_to_fingerprint[global_key] = fingerprint
+            summary["unchanged"] = rows_fingerprinted - len(key_to_fingerprint)
+            report.count("rows_skipped", summary["unchanged"])
+            if not key_to_fingerprint:
+                print(f'Success - 0 data rows updated, {summary["unchanged"]} unchanged, 0 failed, 0 not found')
+                return summary
+            # Looking up a few changed keys beats rereading the table, once most rows changed one full read is cheaper
+            if len(key_to_fingerprint) <= rows_fingerprinted * FINGERPRINT_LOOKUP_SHARE:
+                read_keys = list(key_to_fingerprint.keys())
+        # Pull global key and metadata from BigQuery, only for the global keys provided if there are any
+        query_dict = {}
+        for global_key, values in self.__read_table_metadata(bq_table, global_key_col, metadata_fields, read_keys):
+            if fingerprint_set is None or global_key in key_to_fingerprint:
+                query_dict[global_key] = dict(zip(metadata_fields, values))
+        # Either use global_keys provided that exist in the table or all the global keys in the provided global_key_col
+        global_keys = [global_key for global_key in global_keys_list if global_key in query_dict] if global_keys_list else list(query_dict.keys())
+        # Export, compare and upsert chunks concurrently so one chunk's export overlaps another's upsert
+        chunks = [global_keys[i:i+chunk_size] for i in range(0, len(global_keys), chunk_size)]
+        # Chunks share one batcher, so a rate limit hit by one chunk's upsert also paces the others - batches are capped by payload bytes, not by the chunk size
+        batcher = AdaptiveBatcher(batch_rows=chunk_size)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for chunk_summary in executor.map(bind_report(lambda chunk: self.__upsert_metadata_chunk(chunk, query_dict, metadata_fields, batcher)), chunks):
+                for key in ["unchanged", "updated", "failed", "not_found"]:
+                    summary[key] += chunk_summary[key]
+                summary["errors"].extend(chunk_summary["errors"])
+                # Failed and not found rows keep their old fingerprint, so the next sync tries them again
+                if fingerprint_set:
+                    fingerprint_set.update({global_key : key_to_fingerprint[global_key] for global_key in chunk_summary["synced_keys"]})
+        print(f'Success - {summary["updated"]} data rows updated, {summary["unchanged"]} unchanged, {summary["failed"]} failed, {summary["not_found"]} not found')
+        return summary
+
+    def __upsert_metadata_chunk(self, global_keys, query_dict, metadata_fields, batcher):
+        """ Exports the current metadata for a chunk of global keys and upserts only the data rows whose metadata differs from the table
+        Args:
+            global_keys         :   Required (list) - List of global keys in this chunk
+            query_dict          :   Required (dict) - Dictionary where {key=global_key : value={key=metadata_field_name : value=table_value}}
+            metadata_fields     :   Required (list) - List of metadata field names to sync
+            batcher             :   Required (labelboxbigquery.batching.AdaptiveBatcher) - Batcher that sizes, paces and retries the bulk upserts
+        Returns:
+            Dictionary where {"unchanged" / "updated" / "failed" / "not_found" : number of data rows, "errors" : list of errors from the bulk upsert, "synced_keys" : list of global keys whose Labelbox metadata now matches the table}
+        """
+        report = current_report()
+        lb_mdo, metadata_schema_to_name_key, metadata_name_key_to_schema = self._get_metadata_ontology()
+        # Grab data row IDs with global_key list, keys without a data row come back as empty strings
+        with report.stage("key_check"):
+            data_row_ids = self.lb_client.get_data_row_ids_for_global_keys(global_keys)['results']
+        drid_to_global_key = {data_row_ids[i]: global_keys[i] for i in range(len(global_keys)) if data_row_ids[i]}
+        chunk_summary = {"unchanged" : 0, "updated" : 0, "failed" : 0, "not_found" : len(global_keys) - len(drid_to_global_key), "errors" : [], "synced_keys" : []}
+        if not drid_to_global_key:
+            return chunk_summary
         # Get data row metadata with list of data row IDs
-        data_row_metadata = lb_mdo.bulk_export(data_row_ids)
-        upload_metadata = []  
-        for data_row in data_row_metadata:
-            drid = data_row.data_row_id
-            new_metadata = data_row.fields[:]
-            for field in new_metadata:
-                field_name = metadata_schema_to_name_key[field.schema_id]
-                if field_name in list(metadata_index.keys()):
-                    ### Get the table value given a global key for each column in 
-                    table_value = query_dict[drid_to_global_key[drid]][field_name]
-                    name_key = f"{field_name}///{table_value}"
-                    field.value = metadata_name_key_to_schema[name_key] if name_key in metadata_name_key_to_schema.keys() else table_value
-            upload_metadata.append(labelbox.schema.data_row_metadata.DataRowMetadata(data_row_id=drid, fields=new_metadata))
-        results = lb_mdo.bulk_upsert(upload_metadata)
-        return results        
\ No newline at end of file
+        with report.stage("lb_export"):
+            data_row_metadata = lb_mdo.bulk_export(list(drid_to_global_key.keys()))
+        report.count("lb_rows_read", len(data_row_metadata))
+        upload_metadata = []
+        fields_by_id = lb_mdo.fields_by_id
+        with report.stage("row_transform"):
+            for data_row in data_row_metadata:
+                drid = data_row.data_row_id
+                table_values = query_dict[drid_to_global_key[drid]]
+                new_metadata = []
+                changed = False
+                synced_fields = set()
+                for field in data_row.fields:
+                    field_name = metadata_schema_to_name_key.get(field.schema_id)
+                    if field_name in table_values and table_values[field_name] is not None:
+                        synced_fields.add(field_name)
+                        new_value = self.__get_metadata_value(field_name, table_values[field_name], metadata_name_key_to_schema)
+                        if not _metadata_values_equal(field.value, new_value, fields_by_id[field.schema_id].kind if field.schema_id in fields_by_id else None):
+                            changed = True
+                            field = labelbox.schema.data_row_metadata.DataRowMetadataField(schema_id=field.schema_id, value=new_value)
+                    new_metadata.append(field)
+                # Table values for fields the data row does not have yet are added as new fields
+                for field_name in metadata_fields:
+                    if field_name not in synced_fields and table_values[field_name] is not None and field_name in metadata_name_key_to_schema:
+                        changed = True
+                        new_value = self.__get_metadata_value(field_name, table_values[field_name], metadata_name_key_to_schema)
+                        new_metadata.append(labelbox.schema.data_row_metadata.DataRowMetadataField(schema_id=metadata_name_key_to_schema[field_name], value=new_value))
+                if changed:
+                    upload_metadata.append(labelbox.schema.data_row_metadata.DataRowMetadata(data_row_id=drid, fields=new_metadata))
+                else:
+                    chunk_summary["unchanged"] += 1
+        failed_data_row_ids = set()
+        with report.stage("upload"):
+            for batch in batcher.batches(upload_metadata, size_of=metadata_approx_bytes):
+                try:
+                    errors = batcher.send(batch, lb_mdo.bulk_upsert)
+                    chunk_summary["failed"] += len(errors)
+                    # An error that does not name its data row could belong to any row of the batch
+                    error_data_row_ids = {getattr(error, "data_row_id", None) for error in errors}
+                    failed_data_row_ids.update(error_data_row_ids if None not in error_data_row_ids else [data_row_metadata.data_row_id for data_row_metadata in batch])
+                except Exception as e:
+                    # Only this batch failed after its retries, the rest of the chunk is still upserted
+                    errors = [{"message" : str(e), "batch_size" : len(batch)}]
+                    chunk_summary["failed"] += len(batch)
+                    failed_data_row_ids.update(data_row_metadata.data_row_id for data_row_metadata in batch)
+                chunk_summary["errors"].extend(errors)
+        chunk_summary["updated"] = len(upload_metadata) - chunk_summary["failed"]
+        chunk_summary["synced_keys"] = [global_key for drid, global_key in drid_to_global_key.items() if drid not in failed_data_row_ids]
+        report.count("rows_uploaded", chunk_summary["updated"])
+        return chunk_summary
+
+    def __get_metadata_value(self, field_name, table_value, metadata_name_key_to_schema, divider="///"):
+        """ Converts a table value into a Labelbox metadata value - enum values become the option's schema ID
+        Args:
+            field_name                  :   Required (str) - Metadata field name
+            table_value                 :   Required - Value from the BigQuery table
+            metadata_name_key_to_schema :   Required (dict) - Dictionary where {key=metadata_name_key: value=metadata_schema_id}
+            divider                     :   Optional (str) - String separating parent and enum option metadata values
+        Returns:
+            Value to upload to Labelbox
+        """
+        name_key = f"{field_name}{divider}{table_value}"
+        return metadata_name_key_to_schema[name_key] if name_key in metadata_name_key_to_schema else table_value
+
+def _run_shard(init_kwargs, method, kwargs):
+    """ Runs one shard of a sharded sync in a worker process, with a Client built from the parent Client's arguments
+    Args:
+        init_kwargs         :   Required (dict) - Client arguments
+        method              :   Required (str) - Client method name
+        kwargs              :   Required (dict) - Method arguments, including shard_count and shard_index
+    Returns:
+        Tuple of (method return value, run report as a dictionary)
+    """
+    client = Client(**init_kwargs)
+    # A forked worker inherits the parent's current report, so the shard collects into a report of its own
+    with report_run(method) as report:
+        result = getattr(client, method)(**kwargs)
+    return result, report.to_dict()
@@ -1,9 +1,18 @@
-from google.cloud.bigquery import SchemaField
-from google.cloud.bigquery.table import Table
-from google.cloud.bigquery import Client as bqClient
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from labelboxbigquery.lazy import lazy_import
+from labelboxbigquery.metrics import current_report
 
-def get_columns_function(table:Table):
-    """Grabs all column names from a Pandas DataFrame
+bigquery = lazy_import("google.cloud.bigquery")
+
+# Column profiles kept in memory per process, one entry per (table version, column, sampling options) - the oldest entries are dropped first
+PROFILE_CACHE_SIZE = 1024
+_PROFILE_CACHE = OrderedDict()
+_PROFILE_CACHE_LOCK = threading.Lock()
+
+def get_columns_function(table:bigquery.Table):
+    """Grabs all column names from a BigQuery Table
     Args:
         table               :   Required (google.cloud.bigquery.table.Table) - BigQuery Table
     Returns:
@@ -11,31 +20,120 @@ def get_columns_function(table:Table):
     """
     return [schema_field.name for schema_field in table.schema]
 
-def get_unique_values_function(table:Table, column_name:str, client:bqClient=None):
-    """ Grabs all unique values from a spark table column as strings
+def get_column_profiles_function(table:bigquery.Table, column_names:list, client:bigquery.Client=None, sample_percent:float=None, top_count:int=None, max_bytes_billed:int=None):
+    """ Profiles the distinct values and cardinality of several columns with at most one table scan, reusing profiles until the table changes
     Args:
-        table               :   Required (google.cloud.bigquery.table.Table) - BigQuery Table
-        column_name         :   Required (str) - Spark Table column name
-        client              :   Required (bigquery.Client) - BigQuery Client Object        
+        table               :   Required (google.cloud.bigquery.table.Table or str) - BigQuery Table or Table ID
+        column_names        :   Required (list) - Column names to profile
+        client              :   Required (bigquery.Client) - BigQuery Client Object
+        sample_percent      :   Optional (float) - If set, only scans this percent of the table's storage blocks with TABLESAMPLE, capping bytes scanned - values and counts may then miss rare values
+        top_count           :   Optional (int) - If set, only returns the top_count most frequent values of each column with their approximate counts, and an approximate cardinality, using APPROX_TOP_COUNT
+        max_bytes_billed    :   Optional (int) - If set, the profile query fails instead of billing more bytes than this
     Returns:
-        List of unique values from a spark table column as strings
+        Dictionary where {key=column_name : value={"distinct_count" : number of distinct non-null values, "values" : list of distinct values as strings, "counts" : {value : count} if top_count else None}}
     """
-    query_job = bq_client.query(f"""SELECT DISTINCT {column_name} FROM {table.table_id}""")
-    return [row.values()[0] for row in query_job]
+    # The table is fetched again so cached profiles are keyed by its current version - a metadata call, no bytes are scanned
+    table = client.get_table(table)
+    table_id = f"{table.project}.{table.dataset_id}.{table.table_id}"
+    streaming_buffer = table.streaming_buffer
+    table_version = (table.etag, table.modified, table.num_rows, streaming_buffer.estimated_rows if streaming_buffer else None)
+    profiles = {}
+    missing_columns = []
+    with _PROFILE_CACHE_LOCK:
+        for column_name in dict.fromkeys(column_names):
+            cache_key = (table_id, table_version, column_name.lower(), sample_percent, top_count)
+            if cache_key in _PROFILE_CACHE:
+                _PROFILE_CACHE.move_to_end(cache_key)
+                profiles[column_name] = _PROFILE_CACHE[cache_key]
+            else:
+                missing_columns.append(column_name)
+    if not missing_columns:
+        return profiles
+    select_strs = []
+    for i, column_name in enumerate(missing_columns):
+        if top_count:
+            select_strs.append(f"APPROX_TOP_COUNT(CAST(`{column_name}` AS STRING), {int(top_count)}) AS col_{i}, APPROX_COUNT_DISTINCT(`{column_name}`) AS count_{i}")
+        else:
+            select_strs.append(f"ARRAY_AGG(DISTINCT CAST(`{column_name}` AS STRING) IGNORE NULLS) AS col_{i}")
+    sample_str = f" TABLESAMPLE SYSTEM ({float(sample_percent)} PERCENT)" if sample_percent else ""
+    job_config = bigquery.QueryJobConfig(maximum_bytes_billed=max_bytes_billed) if max_bytes_billed else None
+    query_job = client.query(f"""SELECT {", ".join(select_strs)} FROM `{table_id}`{sample_str}""", job_config=job_config)
+    row = list(query_job.result())[0]
+    current_report().record_query_job(query_job)
+    with _PROFILE_CACHE_LOCK:
+        for i, column_name in enumerate(missing_columns):
+            if top_count:
+                # APPROX_TOP_COUNT counts NULL like any other value
+                counts = {entry["value"] : entry["count"] for entry in (row[f"col_{i}"] or []) if entry["value"] is not None}
+                profile = {"distinct_count" : row[f"count_{i}"], "values" : list(counts), "counts" : counts}
+            else:
+                values = list(row[f"col_{i}"] or [])
+                profile = {"distinct_count" : len(values), "values" : values, "counts" : None}
+            profiles[column_name] = profile
+            _PROFILE_CACHE[(table_id, table_version, column_name.lower(), sample_percent, top_count)] = profile
+        while len(_PROFILE_CACHE) > PROFILE_CACHE_SIZE:
+            _PROFILE_CACHE.popitem(last=False)
+    return profiles
 
-def add_column_function(table:Table, column_name:str, client:bqClient=None, default_value:str=""):
-    """ Adds a column of empty values to an existing Pandas DataFrame
+def get_unique_values_function(table:bigquery.Table, column_name:str, client:bigquery.Client=None, sample_percent:float=None, top_count:int=None, max_bytes_billed:int=None):
+    """ Grabs all unique values from a BigQuery table column as strings, reusing the last result until the table changes
     Args:
-        table               :   Required (google.cloud.bigquery.table.Table) - BigQuery Table
-        column_name         :   Required (str) - Spark Table column name
-        default_value       :   Optional (str) - Value to insert for every row in the newly created column
-        client              :   Required (bigquery.Client) - BigQuery Client Object        
+        table               :   Required (google.cloud.bigquery.table.Table or str) - BigQuery Table or Table ID
+        column_name         :   Required (str) - BigQuery Table column name
+        client              :   Required (bigquery.Client) - BigQuery Client Object
+        sample_percent      :   Optional (float) - If set, only scans this percent of the table with TABLESAMPLE
+        top_count           :   Optional (int) - If set, only returns the top_count most frequent values
+        max_bytes_billed    :   Optional (int) - If set, the query fails instead of billing more bytes than this
+    Returns:
+        List of unique non-null values from a BigQuery table column as strings
+    """
+    profiles = get_column_profiles_function(table, [column_name], client, sample_percent=sample_percent, top_count=top_count, max_bytes_billed=max_bytes_billed)
+    return profiles[column_name]["values"]
+
+def add_columns_function(table:bigquery.Table, column_names:list, client:bigquery.Client=None, field_type:str="STRING", column_types:dict={}):
+    """ Adds several columns to a BigQuery table with a single schema update - if every column already exists, makes no API calls
+    Args:
+        table               :   Required (google.cloud.bigquery.table.Table or str) - BigQuery Table or Table ID
+        column_names        :   Required (list) - Column names to add, names already in the table are ignored regardless of case
+        client              :   Required (bigquery.Client) - BigQuery Client Object
+        field_type          :   Optional (str) - BigQuery type for the new columns
+        column_types        :   Optional (dict) - Dictionary where {key=column_name : value=BigQuery type} for new columns that should not get field_type
+    Returns:
+        Your table with the new columns
+    """
+    if isinstance(table, bigquery.Table) and {column_name.lower() for column_name in column_names} <= {schema_field.name.lower() for schema_field in table.schema}:
+        return table
+    # Columns are added to the current schema, and the etag makes the update fail rather than drop a concurrent schema change
+    table = client.get_table(table)
+    existing_columns = {schema_field.name.lower() for schema_field in table.schema}
+    new_columns = []
+    for column_name in column_names:
+        if column_name.lower() not in existing_columns:
+            existing_columns.add(column_name.lower())
+            new_columns.append(bigquery.SchemaField(column_name, column_types.get(column_name, field_type)))
+    if not new_columns:
+        return table
+    table.schema = table.schema[:] + new_columns
+    return client.update_table(table, ["schema"])
+
+def add_column_function(table:bigquery.Table, column_name:str, client:bigquery.Client=None, default_value:str="", fill_existing_rows:bool=False):
+    """ Adds a column to an existing BigQuery table
+    Args:
+        table               :   Required (google.cloud.bigquery.table.Table or str) - BigQuery Table or Table ID
+        column_name         :   Required (str) - BigQuery Table column name
+        client              :   Required (bigquery.Client) - BigQuery Client Object
+        default_value       :   Optional (str) - Value written to every existing row of the new column, only used when fill_existing_rows is True
+        fill_existing_rows  :   Optional (bool) - If True, runs UPDATE ... WHERE TRUE to write default_value to every row - billed as DML over the whole table, and fails while the table has rows in its streaming buffer - if False, the new column is left NULL
     Returns:
-        Your table with a new column given the column_name and default_value  
+        Your table with a new column given the column_name and default_value
     """
-    original_schema = table.schema
-    new_schema = original_schema[:]
-    new_schema.append(SchemaField(column_name, "STRING"))
-    table.schema = new_schema
-    table = bq_client.update_table(table, ["schema"])   
+    table = client.get_table(table)
+    if column_name.lower() in {schema_field.name.lower() for schema_field in table.schema}:
+        return table
+    table = add_columns_function(table, [column_name], client)
+    if fill_existing_rows and default_value:
+        job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter("default_value", "STRING", default_value)])
+        query_job = client.query(f"""UPDATE `{table.project}.{table.dataset_id}.{table.table_id}` SET `{column_name}` = @default_value WHERE TRUE""", job_config=job_config)
+        query_job.result()
+        current_report().record_query_job(query_job)
     return table
@@ -0,0 +1,40 @@
+import importlib
+import threading
+
+class LazyModule:
+    """ Stands in for a module and imports it on first attribute access, so heavy dependencies load only when a code path needs them
+    Args:
+        name                :   Required (str) - Full module name, such as "google.cloud.bigquery"
+    """
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._load(), name)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}' ({'loaded' if self._module is not None else 'not loaded'})>"
+
+def lazy_import(name):
+    """ Returns a LazyModule for a module name
+    Args:
+        name                :   Required (str) - Full module name
+    Returns:
+        labelboxbigquery.lazy.LazyModule object
+    """
+    return LazyModule(name)
@@ -0,0 +1,173 @@
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# The report of the Client call running in the current context, worker threads pick it up through bind_report
+_CURRENT_REPORT = contextvars.ContextVar("labelboxbigquery_run_report", default=None)
+
+class RunReport:
+    """ Per-stage timings and counters collected during one Client call
+    Args:
+        method              :   Required (str) - Name of the Client method being measured
+        sink                :   Optional (callable) - Called as sink(metric_name, value, tags) for every stage timing and, when the run finishes, for every counter
+    Attributes:
+        method              :   Name of the Client method
+        stages              :   Dictionary where {key=stage_name : value=seconds} - stages running in parallel threads add up, so they can exceed the run duration
+        counters            :   Dictionary where {key=counter_name : value=number} - rows, bytes, BigQuery bytes processed and slot-ms, and every Labelbox and BigQuery HTTP request (lb_api_calls, bq_api_calls, bq_load_jobs)
+        duration            :   Seconds the call took, set when the run finishes
+    """
+    def __init__(self, method, sink=None):
+        self.method = method
+        self.sink = sink
+        self.stages = {}
+        self.counters = {}
+        self.duration = None
+        self._started_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """ Times a block of work and adds it to the named stage
+        Args:
+            name            :   Required (str) - Stage name, such as "bq_query" or "upload"
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started_at
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self._emit("stage_seconds", seconds, stage=name)
+
+    def count(self, name, value=1):
+        """ Adds to a counter
+        Args:
+            name            :   Required (str) - Counter name, such as "rows_read" or "lb_api_calls"
+            value           :   Optional (int or float) - Amount to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_query_job(self, query_job):
+        """ Adds a finished BigQuery job's statistics to the bq_jobs, bq_bytes_processed and bq_slot_ms counters
+        Args:
+            query_job       :   Required (bigquery.QueryJob) - Finished query job
+        """
+        self.count("bq_jobs")
+        self.count("bq_bytes_processed", getattr(query_job, "total_bytes_processed", None) or 0)
+        self.count("bq_slot_ms", getattr(query_job, "slot_millis", None) or 0)
+
+    def merge(self, report_dict, **tags):
+        """ Adds the stages and counters of another run, such as a shard run in a worker process
+        Args:
+            report_dict     :   Required (dict) - Report as returned by RunReport.to_dict()
+            tags            :   Optional - Tags sent to the sink with each merged stage timing, such as shard=0
+        """
+        for name, seconds in report_dict["stages"].items():
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self._emit("stage_seconds", seconds, stage=name, **tags)
+        for name, value in report_dict["counters"].items():
+            self.count(name, value)
+
+    def finish(self):
+        """ Stops the run clock and sends the duration and every counter to the sink """
+        self.duration = time.perf_counter() - self._started_at
+        self._emit("run_seconds", self.duration)
+        for name, value in dict(self.counters).items():
+            self._emit(name, value)
+
+    def to_dict(self):
+        """ Returns the report as a plain dictionary
+        Returns:
+            Dictionary where {"method" : str, "duration" : seconds, "stages" : dict, "counters" : dict}
+        """
+        with self._lock:
+            return {"method" : self.method, "duration" : self.duration, "stages" : dict(self.stages), "counters" : dict(self.counters)}
+
+    def _emit(self, name, value, **tags):
+        if self.sink:
+            self.sink(name, value, dict(tags, method=self.method))
+
+    def __repr__(self):
+        return f"RunReport({self.to_dict()})"
+
+class _NullReport(RunReport):
+    """ Report used outside of an instrumented call, it accepts every measurement and keeps none """
+    def __init__(self):
+        super().__init__(method=None)
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def count(self, name, value=1):
+        pass
+
+    def record_query_job(self, query_job):
+        pass
+
+_NULL_REPORT = _NullReport()
+
+def current_report():
+    """ Returns the report of the Client call running in this context
+    Returns:
+        labelboxbigquery.metrics.RunReport object - a report that keeps nothing when no instrumented call is running
+    """
+    return _CURRENT_REPORT.get() or _NULL_REPORT
+
+def bind_report(function):
+    """ Wraps a function so it reports to the current call's report when run in a worker thread
+    Args:
+        function            :   Required (callable) - Function to submit to a thread pool
+    Returns:
+        Callable that runs function with the current report set
+    """
+    report = _CURRENT_REPORT.get()
+    @functools.wraps(function)
+    def run(*args, **kwargs):
+        token = _CURRENT_REPORT.set(report)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _CURRENT_REPORT.reset(token)
+    return run
+
+@contextmanager
+def report_run(method, sink=None):
+    """ Collects a RunReport for a block of work, instrumented calls made inside the block add to it
+    Args:
+        method              :   Required (str) - Name of the work being measured
+        sink                :   Optional (callable) - Called as sink(metric_name, value, tags) for every measurement
+    Returns:
+        Context manager that yields the RunReport and finishes it when the block exits
+    """
+    report = RunReport(method, sink=sink)
+    token = _CURRENT_REPORT.set(report)
+    try:
+        yield report
+    finally:
+        _CURRENT_REPORT.reset(token)
+        report.finish()
+
+def instrumented(function):
+    """ Decorates a Client method so each call gets a RunReport, stored on the Client as last_run_report and sent to its metrics_sink
+    Args:
+        function            :   Required (callable) - Client method
+    Returns:
+        Decorated Client method
+    """
+    @functools.wraps(function)
+    def run(self, *args, **kwargs):
+        # Calls nested inside another instrumented call add to the outer report
+        if _CURRENT_REPORT.get() is not None:
+            return function(self, *args, **kwargs)
+        with report_run(function.__name__, sink=getattr(self, "metrics_sink", None)) as report:
+            try:
+                return function(self, *args, **kwargs)
+            finally:
+                self.last_run_report = report
+    return run
@@ -0,0 +1,157 @@
+import re
+from datetime import datetime, date, timezone
+from labelboxbigquery.lazy import lazy_import
+
+bigquery = lazy_import("google.cloud.bigquery")
+
+# Column types tables can be created with - legacy SQL names are accepted and mapped to their standard SQL names
+COLUMN_TYPES = ("STRING", "INT64", "FLOAT64", "NUMERIC", "BOOL", "TIMESTAMP", "DATE")
+TYPE_ALIASES = {"INTEGER" : "INT64", "FLOAT" : "FLOAT64", "BOOLEAN" : "BOOL"}
+# Column types a table can be partitioned by, partitions are one day each
+PARTITION_TYPES = ("TIMESTAMP", "DATE")
+PARTITION_GRANULARITY = "DAY"
+# BigQuery clusters by at most this many columns
+MAX_CLUSTER_COLS = 4
+# Columns that hold Labelbox timestamps, inferred as TIMESTAMP even when a chunk has no values for them
+TIMESTAMP_COLUMNS = ("updated_at", "created_at")
+# Strings are only inferred as timestamps if they start like one, other strings are never parsed
+TIMESTAMP_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+# Values read per column when inferring its type
+INFER_SAMPLE_SIZE = 1000
+
+def parse_timestamp(value):
+    """ Parses an updated_at value that may be stored as a Labelbox export string or as a BigQuery TIMESTAMP
+    Args:
+        value               :   Required (str or datetime) - Timestamp value
+    Returns:
+        Timezone-aware datetime object
+    """
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        # Before Python 3.11, fromisoformat only reads the format isoformat writes
+        try:
+            return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+        except ValueError:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def normalize_type(field_type):
+    """ Returns the standard SQL name of a column type
+    Args:
+        field_type          :   Required (str) - BigQuery column type, such as "INTEGER" or "int64"
+    Returns:
+        Standard SQL type name, one of COLUMN_TYPES
+    """
+    name = TYPE_ALIASES.get(str(field_type).upper(), str(field_type).upper())
+    if name not in COLUMN_TYPES:
+        raise ValueError(f"Invalid column type {field_type} - must be one of {list(COLUMN_TYPES)}")
+    return name
+
+def get_column_types(column_types=None, partition_col=None, cluster_cols=None):
+    """ Validates the typing, partitioning and clustering options of a table to be created
+    Args:
+        column_types        :   Optional (dict) - Dictionary where {key=column_name : value=BigQuery column type}
+        partition_col       :   Optional (str) - Column to partition the table by, TIMESTAMP unless column_types makes it a DATE
+        cluster_cols        :   Optional (list) - Up to MAX_CLUSTER_COLS columns to cluster the table by
+    Returns:
+        Dictionary where {key=column_name : value=standard SQL type} holding every column that must be created with a set type
+    """
+    column_types = {column_name : normalize_type(field_type) for column_name, field_type in (column_types or {}).items()}
+    if partition_col:
+        column_types.setdefault(partition_col, "TIMESTAMP")
+        if column_types[partition_col] not in PARTITION_TYPES:
+            raise ValueError(f"Invalid partition_col {partition_col} of type {column_types[partition_col]} - must be one of {list(PARTITION_TYPES)}")
+    if cluster_cols and len(cluster_cols) > MAX_CLUSTER_COLS:
+        raise ValueError(f"Invalid cluster_cols {cluster_cols} - BigQuery clusters by at most {MAX_CLUSTER_COLS} columns")
+    return column_types
+
+def infer_column_types(rows, column_names):
+    """ Infers column types from the Python values in a sample of rows - strings are never inferred as numbers, only as timestamps
+    Args:
+        rows                :   Required (list) - List of dictionaries where {key=column_name : value=column_value}
+        column_names        :   Required (list) - Column names to infer types for
+    Returns:
+        Dictionary where {key=column_name : value=standard SQL type}
+    """
+    column_to_type = {}
+    for column_name in column_names:
+        values = []
+        for row in rows:
+            value = row.get(column_name)
+            if value is not None and value != "":
+                values.append(value)
+                if len(values) >= INFER_SAMPLE_SIZE:
+                    break
+        column_to_type[column_name] = _infer_type(column_name, values)
+    return column_to_type
+
+def _infer_type(column_name, values):
+    if not values:
+        return "TIMESTAMP" if column_name in TIMESTAMP_COLUMNS else "STRING"
+    if all(isinstance(value, bool) for value in values):
+        return "BOOL"
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return "INT64"
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return "FLOAT64"
+    if all(isinstance(value, datetime) or (isinstance(value, str) and TIMESTAMP_PATTERN.match(value)) for value in values):
+        try:
+            for value in values:
+                parse_timestamp(value)
+            return "TIMESTAMP"
+        except (TypeError, ValueError):
+            return "STRING"
+    if all(isinstance(value, date) and not isinstance(value, datetime) for value in values):
+        return "DATE"
+    return "STRING"
+
+def convert_value(value, field_type):
+    """ Converts a value to the JSON form BigQuery loads into a column type - values that do not convert are returned as strings so BigQuery reports them
+    Args:
+        value               :   Required - Value to convert
+        field_type          :   Required (str) - Standard SQL type of the column, one of COLUMN_TYPES
+    Returns:
+        Converted value, or None for missing and empty values
+    """
+    if value is None or value == "":
+        return None
+    try:
+        if field_type == "INT64":
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            return value if isinstance(value, int) and not isinstance(value, bool) else int(str(value))
+        if field_type == "FLOAT64":
+            return float(value)
+        if field_type == "NUMERIC":
+            return str(value)
+        if field_type == "BOOL":
+            return value if isinstance(value, bool) else {"true" : True, "false" : False}[str(value).lower()]
+        if field_type == "TIMESTAMP":
+            return parse_timestamp(value).isoformat()
+        if field_type == "DATE":
+            if isinstance(value, datetime):
+                return value.date().isoformat()
+            return value.isoformat() if isinstance(value, date) else date.fromisoformat(str(value)[:10]).isoformat()
+    except (TypeError, ValueError, KeyError):
+        return str(value)
+    return value
+
+def new_table(bq_table_id, schema, partition_col=None, cluster_cols=None):
+    """ Builds a BigQuery Table to create, partitioned and clustered if asked
+    Args:
+        bq_table_id         :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
+        schema              :   Required (list) - List of bigquery.SchemaField objects
+        partition_col       :   Optional (str) - TIMESTAMP or DATE column to partition the table by
+        cluster_cols        :   Optional (list) - Columns to cluster the table by
+    Returns:
+        google.cloud.bigquery.table.Table object, not yet created
+    """
+    bq_table = bigquery.Table(bq_table_id, schema=schema)
+    if partition_col:
+        bq_table.time_partitioning = bigquery.TimePartitioning(type_=PARTITION_GRANULARITY, field=partition_col)
+    if cluster_cols:
+        bq_table.clustering_fields = list(cluster_cols)
+    return bq_table
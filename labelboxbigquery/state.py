@@ -0,0 +1,226 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime, date, timezone
+from decimal import Decimal
+
+# Sync state lives next to the user's other tool state unless a path is given to the Client
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser("~"), ".labelboxbigquery", "state.db")
+
+# How watermark values of each BigQuery type are written to and read back from SQLite text columns
+WATERMARK_DECODERS = {
+    "TIMESTAMP" : lambda value: datetime.fromisoformat(value),
+    "DATETIME" : lambda value: datetime.fromisoformat(value),
+    "DATE" : lambda value: date.fromisoformat(value),
+    "INT64" : int,
+    "FLOAT64" : float,
+    "NUMERIC" : Decimal,
+    "BIGNUMERIC" : Decimal,
+    "STRING" : str,
+}
+
+class StateStore:
+    """ Local SQLite store for sync state that has to outlive a single Client call - incremental watermarks and checkpoints of long-running syncs
+    Args:
+        path                :   Optional (str) - SQLite file path - ":memory:" keeps state only for the life of the process
+    """
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS watermarks (
+                table_id TEXT NOT NULL, dataset_id TEXT NOT NULL, watermark_col TEXT NOT NULL,
+                watermark_type TEXT NOT NULL, watermark_value TEXT NOT NULL, synced_at TEXT NOT NULL,
+                PRIMARY KEY (table_id, dataset_id))""")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS checkpoint_values (
+                run_id TEXT NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (run_id, name))""")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS checkpoint_batches (
+                run_id TEXT NOT NULL, batch_index INTEGER NOT NULL, row_count INTEGER NOT NULL, completed_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, batch_index))""")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS checkpoint_keys (
+                run_id TEXT NOT NULL, global_key TEXT NOT NULL, PRIMARY KEY (run_id, global_key))""")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS fingerprints (
+                sync_id TEXT NOT NULL, global_key TEXT NOT NULL, fingerprint TEXT NOT NULL, PRIMARY KEY (sync_id, global_key))""")
+
+    def get_watermark(self, table_id, dataset_id, watermark_col):
+        """ Returns the last synced watermark for a (table, dataset) pair
+        Args:
+            table_id        :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
+            dataset_id      :   Required (str) - Labelbox Dataset ID
+            watermark_col   :   Required (str) - Watermark column name - a watermark stored for a different column is ignored
+        Returns:
+            Tuple of (BigQuery type of the watermark, watermark value) or None if the pair has not been synced with this column
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark_col, watermark_type, watermark_value FROM watermarks WHERE table_id = ? AND dataset_id = ?", (table_id, dataset_id)
+            ).fetchone()
+        if not row or row[0] != watermark_col:
+            return None
+        return row[1], WATERMARK_DECODERS[row[1]](row[2])
+
+    def set_watermark(self, table_id, dataset_id, watermark_col, watermark_type, watermark_value):
+        """ Records the highest watermark synced for a (table, dataset) pair
+        Args:
+            table_id        :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
+            dataset_id      :   Required (str) - Labelbox Dataset ID
+            watermark_col   :   Required (str) - Watermark column name
+            watermark_type  :   Required (str) - BigQuery query parameter type of the watermark, one of the WATERMARK_DECODERS keys
+            watermark_value :   Required - Highest watermark value synced
+        """
+        if watermark_type not in WATERMARK_DECODERS:
+            raise ValueError(f"Invalid watermark type {watermark_type} - must be one of {list(WATERMARK_DECODERS.keys())}")
+        encoded_value = watermark_value.isoformat() if isinstance(watermark_value, (datetime, date)) else str(watermark_value)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?, ?, ?)",
+                (table_id, dataset_id, watermark_col, watermark_type, encoded_value, datetime.now(timezone.utc).isoformat())
+            )
+
+    def clear_watermark(self, table_id, dataset_id):
+        """ Forgets the watermark for a (table, dataset) pair so the next incremental sync reads the whole table
+        Args:
+            table_id        :   Required (str) - BigQuery Table ID structured in the following format: "google_project_name.dataset_name.table_name"
+            dataset_id      :   Required (str) - Labelbox Dataset ID
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM watermarks WHERE table_id = ? AND dataset_id = ?", (table_id, dataset_id))
+
+    def checkpoint(self, method, **params):
+        """ Opens the checkpoint for a sync run - calling the same method with the same parameters returns the same checkpoint
+        Args:
+            method          :   Required (str) - Name of the Client method being checkpointed
+            params          :   Optional - JSON-serializable parameters that identify the run
+        Returns:
+            labelboxbigquery.state.Checkpoint object
+        """
+        run_key = json.dumps({"method" : method, "params" : params}, sort_keys=True, default=str)
+        return Checkpoint(self, hashlib.sha256(run_key.encode("utf-8")).hexdigest())
+
+    def fingerprints(self, method, **params):
+        """ Opens the fingerprints recorded by previous syncs - calling the same method with the same parameters returns the same fingerprints
+        Args:
+            method          :   Required (str) - Name of the Client method that syncs the rows
+            params          :   Optional - JSON-serializable parameters that identify the synced table, dataset and columns
+        Returns:
+            labelboxbigquery.state.FingerprintSet object
+        """
+        sync_key = json.dumps({"method" : method, "params" : params}, sort_keys=True, default=str)
+        return FingerprintSet(self, hashlib.sha256(sync_key.encode("utf-8")).hexdigest())
+
+def fingerprint_values(values):
+    """ Returns a short, stable fingerprint of a row's synced values
+    Args:
+        values              :   Required (dict) - Dictionary where {key=column_name : value=column_value}
+    Returns:
+        Hex string fingerprint
+    """
+    encoded = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=8).hexdigest()
+
+class Checkpoint:
+    """ Records the progress of one sync run in a StateStore, so a rerun of the same call can skip completed work
+    Args:
+        store               :   Required (labelboxbigquery.state.StateStore) - Store the checkpoint is written to
+        run_id              :   Required (str) - Identifier of the sync run
+    """
+    def __init__(self, store, run_id):
+        self.store = store
+        self.run_id = run_id
+
+    def get(self, name, default=None):
+        """ Returns a value saved for this run, such as a BigQuery job ID or a row offset
+        Args:
+            name            :   Required (str) - Value name
+            default         :   Optional - Returned when the value was never saved
+        Returns:
+            The JSON-decoded value, or default
+        """
+        with self.store._lock:
+            row = self.store._conn.execute("SELECT value FROM checkpoint_values WHERE run_id = ? AND name = ?", (self.run_id, name)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, name, value):
+        """ Saves a JSON-serializable value for this run
+        Args:
+            name            :   Required (str) - Value name
+            value           :   Required - JSON-serializable value
+        """
+        with self.store._lock, self.store._conn:
+            self.store._conn.execute("INSERT OR REPLACE INTO checkpoint_values VALUES (?, ?, ?)", (self.run_id, name, json.dumps(value)))
+
+    def completed_keys(self):
+        """ Returns every global key committed by this run
+        Returns:
+            Set of global key strings
+        """
+        with self.store._lock:
+            rows = self.store._conn.execute("SELECT global_key FROM checkpoint_keys WHERE run_id = ?", (self.run_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def completed_batches(self):
+        """ Returns the indexes of every batch committed by this run
+        Returns:
+            Set of batch indexes
+        """
+        with self.store._lock:
+            rows = self.store._conn.execute("SELECT batch_index FROM checkpoint_batches WHERE run_id = ?", (self.run_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def commit_batch(self, batch_index, global_keys):
+        """ Records a finished batch and its global keys in one transaction
+        Args:
+            batch_index     :   Required (int) - Index of the batch within the run
+            global_keys     :   Required (list) - Global keys written by the batch
+        """
+        with self.store._lock, self.store._conn:
+            self.store._conn.execute(
+                "INSERT OR REPLACE INTO checkpoint_batches VALUES (?, ?, ?, ?)",
+                (self.run_id, batch_index, len(global_keys), datetime.now(timezone.utc).isoformat())
+            )
+            self.store._conn.executemany("INSERT OR IGNORE INTO checkpoint_keys VALUES (?, ?)", [(self.run_id, str(global_key)) for global_key in global_keys])
+
+    def finish(self):
+        """ Deletes everything recorded for this run, call this once the run has completed without errors """
+        with self.store._lock, self.store._conn:
+            for table in ["checkpoint_values", "checkpoint_batches", "checkpoint_keys"]:
+                self.store._conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (self.run_id,))
+
+class FingerprintSet:
+    """ Per-row fingerprints of the values a sync last wrote, so the next sync of the same columns only processes rows whose fingerprint changed
+    Args:
+        store               :   Required (labelboxbigquery.state.StateStore) - Store the fingerprints are written to
+        sync_id             :   Required (str) - Identifier of the synced table, dataset and columns
+    """
+    def __init__(self, store, sync_id):
+        self.store = store
+        self.sync_id = sync_id
+
+    def get_all(self):
+        """ Returns every recorded fingerprint
+        Returns:
+            Dictionary where {key=global_key : value=fingerprint}
+        """
+        with self.store._lock:
+            rows = self.store._conn.execute("SELECT global_key, fingerprint FROM fingerprints WHERE sync_id = ?", (self.sync_id,)).fetchall()
+        return dict(rows)
+
+    def update(self, key_to_fingerprint):
+        """ Records fingerprints for rows that were synced
+        Args:
+            key_to_fingerprint  :   Required (dict) - Dictionary where {key=global_key : value=fingerprint}
+        """
+        with self.store._lock, self.store._conn:
+            self.store._conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?)", [(self.sync_id, str(global_key), str(fingerprint)) for global_key, fingerprint in key_to_fingerprint.items()]
+            )
+
+    def clear(self):
+        """ Forgets every fingerprint, so the next sync processes every row """
+        with self.store._lock, self.store._conn:
+            self.store._conn.execute("DELETE FROM fingerprints WHERE sync_id = ?", (self.sync_id,))
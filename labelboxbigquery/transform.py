@@ -0,0 +1,110 @@
+from uuid import uuid4
+
+# Labelbox rejects global keys longer than this, longer keys are replaced with a random one
+MAX_GLOBAL_KEY_LENGTH = 200
+# Approximate JSON bytes a data row payload adds around its values - per row, and per metadata field or attachment (keys, quotes and a schema ID)
+ROW_OVERHEAD_BYTES = 120
+FIELD_OVERHEAD_BYTES = 60
+
+def metadata_approx_bytes(data_row_metadata):
+    """ Returns an estimate of a metadata upsert's payload size in bytes without building the payload
+    Args:
+        data_row_metadata           :   Required (labelbox.schema.data_row_metadata.DataRowMetadata) - Data row ID and metadata fields to upsert
+    Returns:
+        Estimated payload bytes
+    """
+    size = ROW_OVERHEAD_BYTES + len(data_row_metadata.data_row_id or "")
+    for field in data_row_metadata.fields:
+        size += FIELD_OVERHEAD_BYTES + len(str(field.value))
+    return size
+
+class DataRowPlan:
+    """ Precompiled transform from BigQuery query rows to data rows, built once per call so the per-row work is only tuple indexing and dict lookups
+    Args:
+        query_lookup                :   Required (dict) - Dictionary where {key=column_name : value=position of the column in the query rows}
+        row_data_col                :   Required (str) - Column name where the data row row data URL is located
+        global_key_col              :   Required (str) - Column name where the data row global key is located
+        external_id_col             :   Optional (str) - Column name where the data row external ID is located
+        metadata_index              :   Optional (dict) - Dictionary where {key=column_name : value=metadata_type}
+        attachment_index            :   Optional (dict) - Dictionary where {key=column_name : value=attachment_type}
+        metadata_name_key_to_schema :   Required (dict) - Dictionary where {key=metadata_name_key : value=metadata_schema_id}
+        divider                     :   Optional (str) - String separating parent and enum option metadata values
+    """
+    __slots__ = ("row_data_position", "global_key_position", "external_id_position", "source_schema_id", "metadata_fields", "attachments")
+
+    def __init__(self, query_lookup, row_data_col, global_key_col, external_id_col=None, metadata_index={}, attachment_index={}, metadata_name_key_to_schema={}, divider="///"):
+        self.row_data_position = query_lookup[row_data_col]
+        self.global_key_position = query_lookup[global_key_col]
+        self.external_id_position = query_lookup[external_id_col] if external_id_col else None
+        self.source_schema_id = metadata_name_key_to_schema["lb_integration_source"]
+        # One (column position, schema ID, {enum option name : option schema ID}) entry per metadata column, enum tables are empty for other types
+        metadata_fields = []
+        for metadata_field_name in metadata_index:
+            prefix = f"{metadata_field_name}{divider}"
+            options = {name_key[len(prefix):] : schema_id for name_key, schema_id in metadata_name_key_to_schema.items() if name_key.startswith(prefix)}
+            metadata_fields.append((query_lookup[metadata_field_name.replace(" ", "_")], metadata_name_key_to_schema[metadata_field_name], options))
+        self.metadata_fields = tuple(metadata_fields)
+        self.attachments = tuple((query_lookup[attachment_field_name.replace(" ", "_")], attachment_type) for attachment_field_name, attachment_type in attachment_index.items())
+
+    def transform(self, row):
+        """ Converts a query row into a CompactDataRow
+        Args:
+            row                     :   Required (google.cloud.bigquery.table.Row or tuple) - Row from the plan's query
+        Returns:
+            labelboxbigquery.transform.CompactDataRow object
+        """
+        global_key = str(row[self.global_key_position])
+        if len(global_key) > MAX_GLOBAL_KEY_LENGTH:
+            print(f"Global key too long (>{MAX_GLOBAL_KEY_LENGTH} characters). Replacing with randomly generated global key.")
+            global_key = str(uuid4())
+        metadata_values = []
+        for position, _, options in self.metadata_fields:
+            value = row[position]
+            metadata_values.append(options.get(str(value), value) if options else value)
+        return CompactDataRow(
+            self, global_key, row[self.row_data_position], row[self.external_id_position] if self.external_id_position is not None else None,
+            tuple(metadata_values), tuple(row[position] for position, _ in self.attachments) if self.attachments else ()
+        )
+
+class CompactDataRow:
+    """ A data row waiting to be uploaded, holding only its values - the Labelbox payload dict is built by to_dict() when the row is sent
+    Args:
+        plan                        :   Required (DataRowPlan) - Plan the row was transformed with, holds the schema IDs and attachment types
+        global_key                  :   Required (str) - Global key
+        row_data                    :   Required - Row data URL or value
+        external_id                 :   Optional - External ID, None if the plan has no external ID column
+        metadata_values             :   Required (tuple) - Metadata values in the order of plan.metadata_fields, enum values already mapped to option schema IDs
+        attachment_values           :   Required (tuple) - Attachment values in the order of plan.attachments
+    """
+    __slots__ = ("plan", "global_key", "row_data", "external_id", "metadata_values", "attachment_values")
+
+    def __init__(self, plan, global_key, row_data, external_id, metadata_values, attachment_values):
+        self.plan = plan
+        self.global_key = global_key
+        self.row_data = row_data
+        self.external_id = external_id
+        self.metadata_values = metadata_values
+        self.attachment_values = attachment_values
+
+    def approx_bytes(self):
+        """ Returns an estimate of the row's payload size in bytes without building the payload """
+        size = ROW_OVERHEAD_BYTES + len(self.global_key) + len(str(self.row_data))
+        if self.external_id is not None:
+            size += len(str(self.external_id))
+        for value in self.metadata_values:
+            size += FIELD_OVERHEAD_BYTES + len(str(value))
+        for value in self.attachment_values:
+            size += FIELD_OVERHEAD_BYTES + len(str(value))
+        return size
+
+    def to_dict(self):
+        """ Returns the data row dictionary in Labelbox format """
+        plan = self.plan
+        metadata_fields = [{"schema_id" : plan.source_schema_id, "value" : "BigQuery"}]
+        metadata_fields.extend({"schema_id" : schema_id, "value" : value} for (_, schema_id, _), value in zip(plan.metadata_fields, self.metadata_values))
+        data_row_dict = {"row_data" : self.row_data, "metadata_fields" : metadata_fields, "global_key" : self.global_key}
+        if plan.external_id_position is not None:
+            data_row_dict["external_id"] = self.external_id
+        if plan.attachments:
+            data_row_dict["attachments"] = [{"type" : attachment_type, "value" : value} for (_, attachment_type), value in zip(plan.attachments, self.attachment_values)]
+        return data_row_dict
@@ -0,0 +1,187 @@
+import io
+import json
+from datetime import date
+from decimal import Decimal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from labelboxbigquery.lazy import lazy_import
+from labelboxbigquery.metrics import current_report, bind_report
+from labelboxbigquery.schema import parse_timestamp
+
+# Only load jobs need the BigQuery SDK's own classes, the import waits until the first one is configured
+bigquery = lazy_import("google.cloud.bigquery")
+
+# Load jobs accept much larger files, these defaults keep each chunk quick to upload and retry
+LOAD_CHUNK_BYTES = 64 * 1024 * 1024
+LOAD_CHUNK_ROWS = 500000
+LOAD_WORKERS = 4
+# insert_rows_json requests are capped at 10MB, stay well below it
+STREAM_CHUNK_BYTES = 5 * 1024 * 1024
+STREAM_CHUNK_ROWS = 10000
+
+def get_writer(writer="load"):
+    """ Returns a writer object given a writer name or an existing writer
+    Args:
+        writer              :   Optional (str or writer) - One of "load" (NDJSON load jobs), "parquet" (Parquet load jobs) or "stream" (streaming inserts), or any object with a write(bq_client, bq_table, rows) method
+    Returns:
+        Writer object with a write(bq_client, bq_table, rows) method
+    """
+    if hasattr(writer, "write"):
+        return writer
+    writers = {"load" : lambda: LoadJobWriter(), "parquet" : lambda: LoadJobWriter(source_format="PARQUET"), "stream" : lambda: StreamingWriter()}
+    if writer not in writers:
+        raise ValueError(f"Invalid writer {writer} - must be one of {list(writers.keys())} or an object with a write(bq_client, bq_table, rows) method")
+    return writers[writer]()
+
+def chunk_rows(rows, max_chunk_bytes, max_chunk_rows):
+    """ Splits rows into chunks capped by serialized byte size and row count
+    Args:
+        rows                :   Required (iterable) - Iterable of JSON-serializable row dictionaries, can be a generator
+        max_chunk_bytes     :   Required (int) - Maximum size of a chunk as newline-delimited JSON
+        max_chunk_rows      :   Required (int) - Maximum number of rows in a chunk
+    Returns:
+        Generator of (list of row dictionaries, list of encoded NDJSON lines) tuples
+    """
+    chunk, lines, chunk_bytes = [], [], 0
+    for row in rows:
+        line = json.dumps(row, default=str).encode("utf-8")
+        if chunk and (chunk_bytes + len(line) + 1 > max_chunk_bytes or len(chunk) >= max_chunk_rows):
+            yield chunk, lines
+            chunk, lines, chunk_bytes = [], [], 0
+        chunk.append(row)
+        lines.append(line)
+        chunk_bytes += len(line) + 1
+    if chunk:
+        yield chunk, lines
+
+class StreamingWriter:
+    """ Writes rows with streaming inserts - lowest latency, best suited to small writes that must be queryable right away
+    Args:
+        max_chunk_bytes     :   Optional (int) - Maximum size of one insert_rows_json request
+        max_chunk_rows      :   Optional (int) - Maximum number of rows in one insert_rows_json request
+    """
+    def __init__(self, max_chunk_bytes=STREAM_CHUNK_BYTES, max_chunk_rows=STREAM_CHUNK_ROWS):
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_chunk_rows = max_chunk_rows
+
+    def write(self, bq_client, bq_table, rows):
+        """ Streams rows into a BigQuery table in size-capped insert_rows_json requests
+        Args:
+            bq_client       :   Required (bigquery.Client) - BigQuery Client Object
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table to write to
+            rows            :   Required (iterable) - Iterable of JSON-serializable row dictionaries
+        Returns:
+            List of errors from insert_rows_json, with row indexes relative to all rows - if successful, is an empty list
+        """
+        report = current_report()
+        errors = []
+        offset = 0
+        for chunk, lines in chunk_rows(rows, self.max_chunk_bytes, self.max_chunk_rows):
+            chunk_errors = bq_client.insert_rows_json(bq_table, chunk)
+            for error in chunk_errors:
+                errors.append(dict(error, index=error.get("index", 0) + offset))
+            offset += len(chunk)
+            report.count("rows_written", len(chunk) - len({error.get("index") for error in chunk_errors}))
+            report.count("bytes_written", sum(len(line) + 1 for line in lines))
+        return errors
+
+class LoadJobWriter:
+    """ Writes rows with batched load jobs, chunked by byte size and row count and loaded in parallel
+    Load jobs are free, atomic per chunk, and leave no streaming buffer behind, so MERGE and UPDATE statements can touch the rows right away
+    Args:
+        source_format       :   Optional (str) - Either "NEWLINE_DELIMITED_JSON" or "PARQUET" - Parquet requires pyarrow
+        max_chunk_bytes     :   Optional (int) - Maximum size of one load job as newline-delimited JSON
+        max_chunk_rows      :   Optional (int) - Maximum number of rows in one load job
+        max_workers         :   Optional (int) - Number of load jobs run concurrently
+    """
+    def __init__(self, source_format="NEWLINE_DELIMITED_JSON", max_chunk_bytes=LOAD_CHUNK_BYTES, max_chunk_rows=LOAD_CHUNK_ROWS, max_workers=LOAD_WORKERS):
+        if source_format not in ("NEWLINE_DELIMITED_JSON", "PARQUET"):
+            raise ValueError(f"Invalid source_format {source_format} - must be one of ['NEWLINE_DELIMITED_JSON', 'PARQUET']")
+        self.source_format = source_format
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_chunk_rows = max_chunk_rows
+        self.max_workers = max_workers
+
+    def write(self, bq_client, bq_table, rows):
+        """ Appends rows to a BigQuery table with one load job per chunk, keeping at most max_workers chunks in memory
+        Args:
+            bq_client       :   Required (bigquery.Client) - BigQuery Client Object
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table to write to
+            rows            :   Required (iterable) - Iterable of JSON-serializable row dictionaries, can be a generator
+        Returns:
+            List of errors from the load jobs - if successful, is an empty list
+        """
+        errors = []
+        pending_loads = deque()
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            for chunk_index, (chunk, lines) in enumerate(chunk_rows(rows, self.max_chunk_bytes, self.max_chunk_rows)):
+                pending_loads.append(executor.submit(bind_report(self._load_chunk), bq_client, bq_table, chunk, lines, chunk_index))
+                while len(pending_loads) >= max(1, self.max_workers):
+                    errors.extend(pending_loads.popleft().result())
+            while pending_loads:
+                errors.extend(pending_loads.popleft().result())
+        return errors
+
+    def _load_chunk(self, bq_client, bq_table, chunk, lines, chunk_index):
+        """ Runs one load job for a chunk of rows and waits for it to finish
+        Args:
+            bq_client       :   Required (bigquery.Client) - BigQuery Client Object
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table to write to
+            chunk           :   Required (list) - List of row dictionaries
+            lines           :   Required (list) - The same rows encoded as NDJSON lines
+            chunk_index     :   Required (int) - Position of this chunk, reported with any errors
+        Returns:
+            List of errors from the load job - if successful, is an empty list
+        """
+        job_config = bigquery.LoadJobConfig(
+            schema=bq_table.schema,
+            source_format=self.source_format,
+            write_disposition="WRITE_APPEND",
+        )
+        try:
+            if self.source_format == "PARQUET":
+                file_obj = self._to_parquet(bq_table, chunk)
+            else:
+                file_obj = io.BytesIO(b"\n".join(lines))
+            load_job = bq_client.load_table_from_file(file_obj, bq_table, job_config=job_config, rewind=True)
+            load_job.result()
+        except ImportError:
+            raise
+        except Exception as e:
+            return [{"chunk" : chunk_index, "rows" : len(chunk), "message" : str(e)}]
+        if not load_job.errors:
+            current_report().count("rows_written", len(chunk))
+            current_report().count("bytes_written", file_obj.getbuffer().nbytes)
+        return [dict(error, chunk=chunk_index) for error in (load_job.errors or [])]
+
+    def _to_parquet(self, bq_table, chunk):
+        """ Serializes a chunk of rows to an in-memory Parquet file typed after the table schema
+        Args:
+            bq_table        :   Required (google.cloud.bigquery.table.Table) - BigQuery Table the rows are written to
+            chunk           :   Required (list) - List of row dictionaries
+        Returns:
+            io.BytesIO object holding the Parquet file
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet load jobs require pyarrow - install it with `pip install pyarrow` or use the NDJSON writer")
+        type_conversion = {
+            "STRING" : pyarrow.string(), "INTEGER" : pyarrow.int64(), "INT64" : pyarrow.int64(), "FLOAT" : pyarrow.float64(), "FLOAT64" : pyarrow.float64(),
+            "BOOLEAN" : pyarrow.bool_(), "BOOL" : pyarrow.bool_(), "TIMESTAMP" : pyarrow.timestamp("us", tz="UTC"), "DATE" : pyarrow.date32(),
+            "NUMERIC" : pyarrow.decimal128(38, 9)
+        }
+        # Typed rows carry timestamps, dates and numerics as JSON strings, Parquet needs the Python values
+        parsers = {"TIMESTAMP" : parse_timestamp, "DATE" : date.fromisoformat, "NUMERIC" : Decimal}
+        parsed_fields = [(schema_field.name, parsers[schema_field.field_type]) for schema_field in bq_table.schema if schema_field.field_type in parsers]
+        if parsed_fields:
+            chunk = [dict(row, **{name : parse(row[name]) for name, parse in parsed_fields if isinstance(row.get(name), str)}) for row in chunk]
+        arrow_schema = pyarrow.schema([
+            pyarrow.field(schema_field.name, type_conversion.get(schema_field.field_type, pyarrow.string()), nullable=schema_field.mode != "REQUIRED")
+            for schema_field in bq_table.schema
+        ])
+        file_obj = io.BytesIO()
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(chunk, schema=arrow_schema), file_obj)
+        file_obj.seek(0)
+        return file_obj